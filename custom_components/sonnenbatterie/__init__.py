@@ -13,6 +13,7 @@ from sonnenbatterie import AsyncSonnenBatterie
 
 from .const import *
 from .coordinator import SonnenbatterieCoordinator
+from .scheduler import SetpointScheduler
 from .sensor_list import SonnenbatterieSensorEntityDescription
 from .service import SonnenbatterieService
 
@@ -51,6 +52,143 @@ SCHEMA_SET_TOU_SCHEDULE_STRING = vol.Schema(
     {
         **cv.ENTITY_SERVICE_FIELDS,
         vol.Required(CONF_SERVICE_SCHEDULE): cv.string_with_no_html,
+        vol.Optional(CONF_SERVICE_DRY_RUN, default=False): cv.boolean,
+    }
+)
+
+SCHEMA_ADD_TOU_WINDOW = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Required(CONF_TOU_START): cv.time,
+        vol.Required(CONF_TOU_STOP): cv.time,
+        vol.Required(CONF_TOU_MAX_POWER): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_SERVICE_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_SERVICE_DRY_RUN, default=False): cv.boolean,
+    }
+)
+
+SCHEMA_REMOVE_TOU_WINDOW = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Required(CONF_TOU_START): cv.time,
+        vol.Optional(CONF_SERVICE_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_SERVICE_DRY_RUN, default=False): cv.boolean,
+    }
+)
+
+SCHEMA_MODIFY_TOU_WINDOW = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Required(CONF_TOU_START): cv.time,
+        vol.Optional(CONF_TOU_NEW_START): cv.time,
+        vol.Optional(CONF_TOU_STOP): cv.time,
+        vol.Optional(CONF_TOU_MAX_POWER): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_SERVICE_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_SERVICE_DRY_RUN, default=False): cv.boolean,
+    }
+)
+
+_POWER_FORECAST = vol.All(cv.ensure_list, [vol.All(vol.Coerce(float), vol.Range(min=0))])
+
+SCHEMA_OPTIMIZE_TOU_SCHEDULE = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Required(CONF_OPT_PRICES): vol.All(cv.ensure_list, vol.Length(min=1), [vol.Coerce(float)]),
+        vol.Optional(CONF_OPT_SLOT_MINUTES, default=60): vol.All(vol.Coerce(int), vol.In([15, 30, 60])),
+        vol.Optional(CONF_OPT_START): cv.datetime,
+        vol.Optional(CONF_OPT_LOAD): _POWER_FORECAST,
+        vol.Optional(CONF_OPT_PV): _POWER_FORECAST,
+        vol.Optional(CONF_OPT_FEED_IN_PRICE, default=0.0): vol.Coerce(float),
+        vol.Optional(CONF_OPT_EFFICIENCY, default=0.95): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=1)),
+        vol.Optional(CONF_OPT_APPLY, default=False): cv.boolean,
+        vol.Optional(CONF_SERVICE_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    }
+)
+
+SCHEMA_BACKTEST = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Optional(CONF_BT_START): cv.datetime,
+        vol.Optional(CONF_BT_END): cv.datetime,
+        vol.Optional(CONF_BT_PERIOD, default="hour"): vol.In(["5minute", "hour"]),
+        vol.Optional(CONF_BT_RESERVES): vol.All(cv.ensure_list, [vol.All(vol.Coerce(float), vol.Range(min=0, max=100))]),
+        vol.Optional(CONF_BT_SCHEDULES): vol.All(cv.ensure_list, [vol.Any(cv.string_with_no_html, list)]),
+        vol.Required(CONF_OPT_PRICES): vol.All(cv.ensure_list, vol.Any(vol.Length(min=1, max=1), vol.Length(min=24, max=24)), [vol.Coerce(float)]),
+        vol.Optional(CONF_OPT_FEED_IN_PRICE, default=0.0): vol.Coerce(float),
+        vol.Optional(CONF_OPT_EFFICIENCY, default=0.95): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=1)),
+    }
+)
+
+SCHEMA_SET_GRID_CONTROLLER = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Optional("enabled"): cv.boolean,
+        vol.Optional("target"): vol.Coerce(float),
+        vol.Optional("deadband"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional("kp"): vol.All(vol.Coerce(float), vol.Range(min=0, max=2)),
+        vol.Optional("ki"): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+        vol.Optional("max_step"): vol.All(vol.Coerce(float), vol.Range(min=10)),
+    }
+)
+
+# one segment of a setpoint timeline: from start (to end) charge or discharge
+SCHEMA_SETPOINT_SEGMENT = vol.All(
+    vol.Schema(
+        {
+            vol.Required("start"): vol.Any(cv.datetime, cv.time),
+            vol.Optional("end"): vol.Any(cv.datetime, cv.time),
+            vol.Exclusive("charge", "setpoint"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Exclusive("discharge", "setpoint"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        }
+    ),
+    cv.has_at_least_one_key("charge", "discharge"),
+)
+
+SCHEMA_SET_SETPOINT_SCHEDULE = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Optional(CONF_SETPOINT_TIMELINE): vol.All(cv.ensure_list, [SCHEMA_SETPOINT_SEGMENT]),
+    }
+)
+
+SCHEMA_GET_LOAD_FORECAST = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Optional(CONF_FORECAST_HOURS, default=24): vol.All(vol.Coerce(int), vol.Range(min=1, max=168)),
+    }
+)
+
+SCHEMA_DEVICE_ONLY = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+    }
+)
+
+SCHEMA_GET_CONFIGURATION = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Optional(CONF_SERVICE_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    }
+)
+
+# one operation of the "apply" service: exactly one of the keys
+SCHEMA_APPLY_OPERATION = vol.All(
+    vol.Schema(
+        {
+            vol.Exclusive("operating_mode", "operation"): vol.In(CONF_OPERATING_MODES),
+            vol.Exclusive("battery_reserve", "operation"): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+            vol.Exclusive("charge", "operation"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Exclusive("discharge", "operation"): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Exclusive("tou_schedule", "operation"): cv.string_with_no_html,
+        }
+    ),
+    vol.Length(min=1, max=1),
+)
+
+SCHEMA_APPLY = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Required(CONF_SERVICE_OPERATIONS): vol.All(cv.ensure_list, vol.Length(min=1), [SCHEMA_APPLY_OPERATION]),
     }
 )
 
@@ -91,6 +229,9 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     # init the master coordinator
     sb_coordinator = SonnenbatterieCoordinator(hass, config_entry, serial_number)
 
+    # before the first sample is integrated
+    await sb_coordinator.async_restore_energy()
+
     # calls SonnenbatterieCoordinator._async_update_data()
     await sb_coordinator.async_refresh()
     if not sb_coordinator.last_update_success:
@@ -100,9 +241,11 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     # save coordinator as early as possible
     hass.data[DOMAIN][config_entry.entry_id] = {}
     hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR] = sb_coordinator
+    # keep the energy counters over a reload or restart
+    config_entry.async_on_unload(sb_coordinator.async_listen_stop())
 
-    inverter_power = sb_coordinator.latestData['battery_system']['battery_system']['system']['inverter_capacity']
-    max_tou_power = sb_coordinator.latestData.get('commissioning_settings',{}).get('data', {}).get('attributes', {}).get('tou_max_power_limit', '22000')
+    inverter_power = sb_coordinator.snapshot.battery_system.inverter_capacity
+    max_tou_power = sb_coordinator.snapshot.commissioning_settings.tou_max_power_limit or '22000'
     LOGGER.debug(f"inverter_power: {inverter_power}, tou_power: {max_tou_power}")
     hass.data[DOMAIN][config_entry.entry_id][CONF_INVERTER_MAX] = inverter_power
     hass.data[DOMAIN][config_entry.entry_id][CONF_TOU_MAX] = int(max_tou_power)
@@ -122,7 +265,13 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     # Setup our sensors, services and whatnot
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
 
-    if sb_coordinator.latestData.get('api_configuration',{}).get('IN_LocalAPIWriteActive', '0') == '1':
+    if sb_coordinator.snapshot.api_configuration.write_active:
+        # timed setpoints, resumed from storage
+        scheduler = SetpointScheduler(hass, sb_coordinator, config_entry)
+        config_entry.async_on_unload(scheduler.async_shutdown)
+        await scheduler.async_load()
+        hass.data[DOMAIN][config_entry.entry_id][CONF_SCHEDULER] = scheduler
+
         # service registration
         hass.services.async_register(
             DOMAIN,
@@ -180,10 +329,67 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
             supports_response=SupportsResponse.OPTIONAL,
         )
 
+        hass.services.async_register(
+            DOMAIN,
+            "add_tou_window",
+            services.add_tou_window,
+            schema=SCHEMA_ADD_TOU_WINDOW,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        hass.services.async_register(
+            DOMAIN,
+            "remove_tou_window",
+            services.remove_tou_window,
+            schema=SCHEMA_REMOVE_TOU_WINDOW,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        hass.services.async_register(
+            DOMAIN,
+            "modify_tou_window",
+            services.modify_tou_window,
+            schema=SCHEMA_MODIFY_TOU_WINDOW,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        hass.services.async_register(
+            DOMAIN,
+            "optimize_tou_schedule",
+            services.optimize_tou_schedule,
+            schema=SCHEMA_OPTIMIZE_TOU_SCHEDULE,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        hass.services.async_register(
+            DOMAIN,
+            "set_grid_controller",
+            services.set_grid_controller,
+            schema=SCHEMA_SET_GRID_CONTROLLER,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        hass.services.async_register(
+            DOMAIN,
+            "set_setpoint_schedule",
+            services.set_setpoint_schedule,
+            schema=SCHEMA_SET_SETPOINT_SCHEDULE,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        hass.services.async_register(
+            DOMAIN,
+            "apply",
+            services.apply,
+            schema=SCHEMA_APPLY,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
         hass.services.async_register(
             DOMAIN,
             "get_tou_schedule",
             services.get_tou_schedule,
+            schema=SCHEMA_GET_CONFIGURATION,
             supports_response=SupportsResponse.OPTIONAL,
         )
 
@@ -191,6 +397,7 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
             DOMAIN,
             "get_battery_reserve",
             services.get_battery_reserve,
+            schema=SCHEMA_GET_CONFIGURATION,
             supports_response=SupportsResponse.OPTIONAL,
         )
 
@@ -198,6 +405,7 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
             DOMAIN,
             "get_operating_mode",
             services.get_operating_mode,
+            schema=SCHEMA_GET_CONFIGURATION,
             supports_response=SupportsResponse.OPTIONAL,
         )
 
@@ -205,12 +413,38 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
             DOMAIN,
             "get_operating_mode_num",
             services.get_operating_mode_num,
+            schema=SCHEMA_GET_CONFIGURATION,
             supports_response=SupportsResponse.OPTIONAL,
         )
 
     else:
         LOGGER.info(f"JSON-API write access not enabled - disabling SERVICE functions")
 
+    # read-only, work without write access
+    hass.services.async_register(
+        DOMAIN,
+        "get_command_stats",
+        services.get_command_stats,
+        schema=SCHEMA_DEVICE_ONLY,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        "backtest",
+        services.backtest,
+        schema=SCHEMA_BACKTEST,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        "get_load_forecast",
+        services.get_load_forecast,
+        schema=SCHEMA_GET_LOAD_FORECAST,
+        supports_response=SupportsResponse.ONLY,
+    )
+
     # Done setting up the entry
     return True
 
@@ -0,0 +1,104 @@
+"""Expected consumption and production by hour of the week.
+
+Per hour of the (local) week and quantity, three exponentially decayed sums
+are kept: weight, weighted sum and weighted sum of squares. Their mean and
+variance are the baseline, in fixed-size arrays of 168 x 2. Every sample
+goes into the sums of its hour, weighted by the time it stands for. Before
+that, the hour's sums decay by the time since it was last updated (half-life
+four weeks), so a change of habits or season takes over within a month or
+two. A forecast is a lookup of the hours ahead - nothing is rebuilt from the
+recorded history.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from homeassistant.util import dt as dt_util
+
+HOURS = 7 * 24
+QUANTITIES = ("consumption", "production")
+# s after which the past of an hour of the week counts half
+HALF_LIFE = 4 * 7 * 86400.0
+# longest time (s) a single sample stands for
+MAX_WEIGHT = 300.0
+
+
+def hour_of_week(moment: datetime) -> int:
+    local = dt_util.as_local(moment)
+    return local.weekday() * 24 + local.hour
+
+
+class Baseline:
+    __slots__ = ("_weight", "_sum", "_squares", "_updated", "_last")
+
+    def __init__(self) -> None:
+        self._weight = np.zeros(HOURS)
+        # per hour: weighted sums of consumption, production (W) / their squares
+        self._sum = np.zeros((HOURS, len(QUANTITIES)))
+        self._squares = np.zeros((HOURS, len(QUANTITIES)))
+        # per hour: last update (UTC timestamp)
+        self._updated = np.zeros(HOURS)
+        # time of the previous sample
+        self._last: float | None = None
+
+    def sample(self, consumption: float, production: float, at: float) -> None:
+        last, self._last = self._last, at
+        if last is None or at <= last:
+            return
+        weight = min(at - last, MAX_WEIGHT)
+        hour = hour_of_week(dt_util.utc_from_timestamp(at))
+        if self._updated[hour]:
+            decay = 0.5 ** ((at - self._updated[hour]) / HALF_LIFE)
+            self._weight[hour] *= decay
+            self._sum[hour] *= decay
+            self._squares[hour] *= decay
+        self._updated[hour] = at
+        values = np.array((consumption, max(production, 0.0)))
+        self._weight[hour] += weight
+        self._sum[hour] += weight * values
+        self._squares[hour] += weight * values * values
+
+    @property
+    def complete(self) -> bool:
+        """Whether every hour of the week has been seen"""
+        return bool(self._weight.all())
+
+    def mean_std(self) -> tuple[np.ndarray, np.ndarray]:
+        """Mean and standard deviation (W) per hour of the week and quantity,
+        NaN for hours not seen yet."""
+        weight = self._weight[:, np.newaxis]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._sum / weight
+            variance = self._squares / weight - mean * mean
+        return mean, np.sqrt(np.maximum(variance, 0.0))
+
+    def forecast(self, start: datetime, slots: int, slot: timedelta) -> dict[str, np.ndarray]:
+        """Expected mean and standard deviation per slot from `start`: the
+        values of the hour of the week each slot starts in."""
+        mean, std = self.mean_std()
+        hours = np.fromiter(
+            (hour_of_week(start + index * slot) for index in range(slots)), dtype=np.int64, count=slots
+        )
+        result = {}
+        for index, quantity in enumerate(QUANTITIES):
+            result[quantity] = mean[hours, index]
+            result[f"{quantity}_std"] = std[hours, index]
+        return result
+
+    def as_stored(self) -> dict:
+        return {
+            "weight": self._weight.tolist(),
+            "sum": self._sum.tolist(),
+            "squares": self._squares.tolist(),
+            "updated": self._updated.tolist(),
+        }
+
+    def restore(self, data: dict) -> None:
+        try:
+            weight = np.asarray(data["weight"], dtype=float)
+            sums = np.asarray(data["sum"], dtype=float)
+            squares = np.asarray(data["squares"], dtype=float)
+            updated = np.asarray(data["updated"], dtype=float)
+        except (KeyError, TypeError, ValueError):
+            return
+        if weight.shape == (HOURS,) and sums.shape == squares.shape == (HOURS, len(QUANTITIES)) and updated.shape == (HOURS,):
+            self._weight, self._sum, self._squares, self._updated = weight, sums, squares, updated
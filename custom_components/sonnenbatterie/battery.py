@@ -0,0 +1,48 @@
+"""Energy flows of a Sonnenbatterie within one time step.
+
+The model shared by the TOU optimizer and the backtesting simulator. All
+arguments may be NumPy arrays of matching (or broadcastable) shapes, so one
+call covers many states of charge or many candidate strategies at once.
+
+Operating-mode semantics:
+- self-consumption (automatic mode, and timeofuse mode outside its windows):
+  PV surplus charges the battery, demand is covered from it down to the
+  backup reserve (EM_USOC); whatever's left goes to or comes from the grid.
+- inside a TOU window: the battery charges from PV and grid, drawing at most
+  threshold_p_max from the grid in total, and doesn't cover demand.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Flows(NamedTuple):
+    # state of charge at the end of the step (Wh)
+    soc: np.ndarray
+    # energy drawn from (> 0) or fed into (< 0) the grid (Wh)
+    grid: np.ndarray
+    # energy taken out of the battery (Wh)
+    discharged: np.ndarray
+
+
+def self_consumption(soc, net, capacity, floor, max_energy, efficiency) -> Flows:
+    """`net` is the PV surplus of the step in Wh (negative: demand), `floor`
+    the backup reserve and `max_energy` the inverter limit, both in Wh."""
+    surplus = np.maximum(net, 0.0)
+    deficit = np.maximum(-net, 0.0)
+    stored = np.minimum(np.minimum(surplus, max_energy) * efficiency, capacity - soc)
+    delivered = np.minimum(np.minimum(deficit, max_energy), np.maximum(soc - floor, 0.0) * efficiency)
+    discharged = delivered / efficiency
+    return Flows(
+        soc + stored - discharged,
+        (deficit - delivered) - (surplus - stored / efficiency),
+        discharged,
+    )
+
+
+def grid_charge(soc, net, capacity, grid_energy, max_energy, efficiency) -> Flows:
+    """Charging inside a TOU window; `grid_energy` is threshold_p_max over
+    the step (Wh)."""
+    allowed = np.clip(grid_energy + net, 0.0, max_energy)
+    charged = np.minimum(allowed * efficiency, capacity - soc)
+    return Flows(soc + charged, charged / efficiency - net, np.zeros_like(charged))
@@ -14,6 +14,13 @@ from custom_components.sonnenbatterie.coordinator import SonnenbatterieCoordinat
 class SonnenbatterieBinarySensorEntityDescription(BinarySensorEntityDescription):
     """Describes a Sonnenbatterie binary sensor entity."""
     _attr_has_entity_name: bool = True
+    # the coordinator section (endpoint) the value is read from
+    section: str | None = None
+    # seconds the last value is served without a successful fetch of the
+    # section before the entity turns unavailable (None: coordinator default)
+    max_age: float | None = None
+    # extra condition for the entity to be available (besides fresh data)
+    available_fn: Callable[[SonnenbatterieCoordinator], bool] | None = None
     value_fn: Callable[[SonnenbatterieCoordinator], bool | None]
 
 
@@ -22,59 +29,49 @@ BINARY_SENSORS: tuple[SonnenbatterieBinarySensorEntityDescription, ...] = (
     # fault flags, from /api/v2/latestdata (ic_status.DC Shutdown Reason)
     SonnenbatterieBinarySensorEntityDescription(
         key="latestdata_inverter_over_temperature",
+        section="latestdata",
         icon="mdi:thermometer-alert",
         device_class=BinarySensorDeviceClass.PROBLEM,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("latestdata", {})
-        .get("ic_status", {})
-        .get("DC Shutdown Reason", {})
-        .get("Inverter Over Temperature"),
+        value_fn=lambda coordinator: coordinator.snapshot.latestdata.inverter_over_temperature,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieBinarySensorEntityDescription(
         key="latestdata_critical_bms_alarm",
+        section="latestdata",
         icon="mdi:alert-octagon-outline",
         device_class=BinarySensorDeviceClass.PROBLEM,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("latestdata", {})
-        .get("ic_status", {})
-        .get("DC Shutdown Reason", {})
-        .get("Critical BMS Alarm"),
+        value_fn=lambda coordinator: coordinator.snapshot.latestdata.critical_bms_alarm,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieBinarySensorEntityDescription(
         key="latestdata_hw_shutdown",
+        section="latestdata",
         icon="mdi:power-plug-off-outline",
         device_class=BinarySensorDeviceClass.PROBLEM,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("latestdata", {})
-        .get("ic_status", {})
-        .get("DC Shutdown Reason", {})
-        .get("HW_Shutdown"),
+        value_fn=lambda coordinator: coordinator.snapshot.latestdata.hw_shutdown,
         entity_registry_enabled_default=False,
     ),
     ###
     # grid connection flags, from /api/v2/latestdata (ic_status.Droop mode status)
     SonnenbatterieBinarySensorEntityDescription(
         key="latestdata_grid_abnormal",
+        section="latestdata",
         icon="mdi:transmission-tower-off",
         device_class=BinarySensorDeviceClass.PROBLEM,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("latestdata", {})
-        .get("ic_status", {})
-        .get("Droop mode status", {})
-        .get("Grid abnormal"),
+        value_fn=lambda coordinator: coordinator.snapshot.latestdata.grid_abnormal,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieBinarySensorEntityDescription(
         key="latestdata_grid_detached",
+        section="latestdata",
         icon="mdi:transmission-tower-off",
         device_class=BinarySensorDeviceClass.PROBLEM,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("latestdata", {})
-        .get("ic_status", {})
-        .get("Droop mode status", {})
-        .get("Grid detached"),
+        value_fn=lambda coordinator: coordinator.snapshot.latestdata.grid_detached,
         entity_registry_enabled_default=False,
     ),
 )
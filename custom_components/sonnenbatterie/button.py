@@ -13,7 +13,7 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     LOGGER.debug(f"BUTTON async_setup_entry - {config_entry}")
     coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
 
-    if coordinator.latestData.get('api_configuration', {}).get('IN_LocalAPIWriteActive', '0') == '1':
+    if coordinator.snapshot.api_configuration.write_active:
         entities = []
         for description in BUTTON_ENTITIES:
             if description.tag.type == Platform.BUTTON:
@@ -34,12 +34,11 @@ class SonnenbatterieButton(SonnenButtonEntity, ButtonEntity):
         tag = self.entity_description.tag
         match tag.key:
             case "button_reset_all":
-                await self.coordinator.sbconn.sb2.charge_battery(0)
-                await self.coordinator.sbconn.sb2.discharge_battery(0)
+                await self.coordinator.async_execute("charge", 0)
+                await self.coordinator.async_execute("discharge", 0)
             case "button_reset_charge":
-                await self.coordinator.sbconn.sb2.charge_battery(0)
+                await self.coordinator.async_execute("charge", 0)
             case "button_reset_discharge":
-                await self.coordinator.sbconn.sb2.discharge_battery(0)
+                await self.coordinator.async_execute("discharge", 0)
 
-        await self.coordinator.async_request_refresh()
         return None
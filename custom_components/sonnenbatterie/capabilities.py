@@ -0,0 +1,86 @@
+"""Firmware capability probe for the Sonnenbatterie's local API.
+
+Older models lack some of the v2 endpoints. Instead of running into the same
+failures on every poll cycle, the endpoints are probed ONCE per firmware
+version; the result is persisted with the config entry and decides which
+endpoints get polled. Payloads in a different shape (e.g. the powermeter as
+dictionary instead of a list) are normalized by their shape alone, so that
+works before the probe has succeeded, too.
+"""
+from typing import Any
+
+from .model import BatterySystemData, SystemData
+
+# Sections that always have to be available - the integration can't work
+# without them, so they're never marked as unsupported.
+REQUIRED_SECTIONS = ("battery_system", "system_data", "status")
+
+# Polled every cycle
+FAST_SECTIONS = ("battery", "inverter", "powermeter", "status", "v2_status")
+# Polled every SLOW_POLL_EVERY cycles only
+SLOW_SECTIONS = (
+    "battery_system",
+    "system_data",
+    "configurations",
+    "api_configuration",
+    "latestdata",
+    "commissioning_settings",
+)
+
+# HTTP status codes meaning "this firmware doesn't know that endpoint". Anything
+# else (timeouts, 401, 5xx while busy) is transient and must not be persisted.
+_UNSUPPORTED_STATUS = (400, 404, 405, 501)
+# HTTP status codes meaning the session isn't (or no longer) accepted
+_AUTH_STATUS = (401, 403)
+
+def firmware_version(battery_system: BatterySystemData, system_data: SystemData) -> str:
+    """The firmware identifier capabilities are keyed on."""
+    version = battery_system.software_version or system_data.software_version
+    return f"{version or 'unknown'} ({battery_system.firmware_version or 'unknown'})"
+
+
+def is_unsupported_error(err: BaseException) -> bool:
+    """True if the error says the endpoint doesn't exist on this firmware."""
+    return getattr(err, "status", None) in _UNSUPPORTED_STATUS
+
+
+def is_auth_error(err: BaseException) -> bool:
+    """True if the error says the session has to be renewed."""
+    return getattr(err, "status", None) in _AUTH_STATUS
+
+
+def normalize(section: str, payload: Any) -> Any:
+    """Bring a payload into the shape the integration works with."""
+    if section == "powermeter" and isinstance(payload, dict):
+        # some firmware sends a dictionary keyed by position - the
+        # values are the same meter records the list form holds
+        return tuple(payload.values())
+    return payload
+
+
+class Capabilities:
+    """What the connected firmware supports. Immutable once probed."""
+
+    __slots__ = ("firmware", "unsupported")
+
+    def __init__(self, firmware: str, unsupported=()):
+        self.firmware = firmware
+        self.unsupported = frozenset(unsupported)
+
+    def supports(self, section: str) -> bool:
+        return section not in self.unsupported
+
+    def as_dict(self) -> dict:
+        return {
+            "firmware": self.firmware,
+            "unsupported": sorted(self.unsupported),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "Capabilities | None":
+        if not data or "firmware" not in data:
+            return None
+        return cls(
+            firmware=data["firmware"],
+            unsupported=data.get("unsupported", ()),
+        )
@@ -0,0 +1,70 @@
+"""The mutating operations the integration performs on the battery.
+
+Every write - from entities and services alike - goes through
+SonnenbatterieCoordinator.async_execute(), which looks the operation up here.
+All of them are calls on an AsyncSonnenBatterieV2 client (the session's sb2
+or the static Auth-Token client), so the pipeline can pick either one.
+"""
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from .reconcile import reaches
+from .snapshot import Snapshot
+
+
+class Command(NamedTuple):
+    # performs the request on a v2 client
+    call: Callable[..., Awaitable[Any]]
+    # sections whose values change by the command (read back later)
+    verify: tuple[str, ...]
+    # the battery answers with the configuration items it has set
+    returns_config: bool = False
+    # sets the charge (1) or discharge (-1) setpoint given as first argument
+    setpoint: int = 0
+    # whether a snapshot shows the command has taken effect, called with the
+    # command's arguments (timed by the latency tracker)
+    effect: Callable[..., bool] | None = None
+
+
+def _power_reached(snapshot: Snapshot, target: int) -> bool:
+    pac = snapshot.status.pac_total_w
+    # Pac_total_W is > 0 while discharging
+    return pac is not None and reaches(-pac, target)
+
+
+COMMANDS: dict[str, Command] = {
+    "charge": Command(
+        lambda client, watts: client.charge_battery(int(watts)),
+        verify=("status",),
+        setpoint=1,
+        effect=lambda snapshot, watts: _power_reached(snapshot, int(watts)),
+    ),
+    "discharge": Command(
+        lambda client, watts: client.discharge_battery(int(watts)),
+        verify=("status",),
+        setpoint=-1,
+        effect=lambda snapshot, watts: _power_reached(snapshot, -int(watts)),
+    ),
+    "battery_reserve": Command(
+        lambda client, percent: client.set_battery_reserve(int(percent)),
+        verify=("configurations",),
+        returns_config=True,
+    ),
+    "operating_mode": Command(
+        # set_config_item() instead of set_operating_mode(): the latter drops
+        # the answer down to a bare number
+        lambda client, mode: client.set_config_item("EM_OperatingMode", mode),
+        verify=("configurations", "status"),
+        returns_config=True,
+        effect=lambda snapshot, mode: str(snapshot.status.operating_mode) == str(mode),
+    ),
+    "tou_schedule": Command(
+        lambda client, schedule: client.set_tou_schedule_string(schedule),
+        verify=("configurations",),
+        returns_config=True,
+    ),
+    "config_item": Command(
+        lambda client, item, value: client.set_config_item(item, value),
+        verify=("configurations",),
+        returns_config=True,
+    ),
+}
@@ -32,6 +32,7 @@ class SonnenbatterieFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             # set, setpoint writes use it (no login, no session-token 401s).
             vol.Optional(CONF_AUTH_TOKEN, default=""): str,
             vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): int,
+            vol.Optional(CONF_STATISTICS_IMPORT, default=False): cv.boolean,
             vol.Optional(ATTR_SONNEN_DEBUG, default=DEFAULT_SONNEN_DEBUG): cv.boolean,
         }
     )
@@ -69,6 +70,7 @@ class SonnenbatterieFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     CONF_IP_ADDRESS: ipaddress,
                     CONF_AUTH_TOKEN: user_input.get(CONF_AUTH_TOKEN, ""),
                     CONF_SCAN_INTERVAL: user_input[CONF_SCAN_INTERVAL],
+                    CONF_STATISTICS_IMPORT: user_input[CONF_STATISTICS_IMPORT],
                     ATTR_SONNEN_DEBUG: user_input[ATTR_SONNEN_DEBUG],
                     CONF_SERIAL_NUMBER: sb_serial,
                 },
@@ -104,6 +106,10 @@ class SonnenbatterieFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                     CONF_SCAN_INTERVAL,
                     default=entry.data.get(CONF_SCAN_INTERVAL) or DEFAULT_SCAN_INTERVAL
                 ): cv.positive_int,
+                vol.Optional(
+                    CONF_STATISTICS_IMPORT,
+                    default=entry.data.get(CONF_STATISTICS_IMPORT, False)
+                ): cv.boolean,
                 vol.Optional(
                     ATTR_SONNEN_DEBUG,
                     default=entry.data.get(ATTR_SONNEN_DEBUG) or DEFAULT_SONNEN_DEBUG)
@@ -10,6 +10,15 @@ CONF_SERIAL_NUMBER = "serial_number"
 # set, setpoint WRITES use the token-based v2 client (no login, no session
 # expiry -> no 401), while polling keeps using the username/password v1 client.
 CONF_AUTH_TOKEN = "auth_token"
+# Result of the firmware capability probe (see capabilities.py), persisted
+# with the config entry so it only runs again when the firmware changes.
+CONF_CAPABILITIES = "capabilities"
+# Settings of the in-process grid controller (see controller.py), set by the
+# set_grid_controller service and kept with the config entry.
+CONF_CONTROLLER = "controller"
+# Aggregate the high-rate sensors into imported long-term statistics instead
+# of having the recorder derive them from every state (see longterm.py).
+CONF_STATISTICS_IMPORT = "statistics_import"
 
 ATTR_SONNEN_DEBUG = "sonnenbatterie_debug"
 DOMAIN = "sonnenbatterie"
@@ -42,12 +51,35 @@ CONF_OPERATING_MODES_NUM = [
 
 CONF_CHARGE_WATT  = "power"
 CONF_COORDINATOR = "coordinator"
+CONF_SCHEDULER = "scheduler"
 CONF_INVERTER_MAX = "inverter_max"
 CONF_TOU_MAX = "tou_max"
+CONF_SERVICE_DRY_RUN = "dry_run"
 CONF_SERVICE_ITEM = "item"
+CONF_SERVICE_MAX_AGE = "max_age"
 CONF_SERVICE_MODE = "mode"
+CONF_SERVICE_OPERATIONS = "operations"
 CONF_SERVICE_SCHEDULE = "schedule"
 CONF_SERVICE_VALUE = "value"
+CONF_TOU_START = "start"
+CONF_TOU_STOP = "stop"
+CONF_TOU_NEW_START = "new_start"
+CONF_TOU_MAX_POWER = "threshold_p_max"
+CONF_OPT_PRICES = "prices"
+CONF_OPT_SLOT_MINUTES = "slot_minutes"
+CONF_OPT_START = "start"
+CONF_OPT_LOAD = "load"
+CONF_OPT_PV = "pv"
+CONF_OPT_FEED_IN_PRICE = "feed_in_price"
+CONF_OPT_EFFICIENCY = "efficiency"
+CONF_OPT_APPLY = "apply"
+CONF_BT_START = "start"
+CONF_BT_END = "end"
+CONF_BT_PERIOD = "period"
+CONF_BT_RESERVES = "reserves"
+CONF_BT_SCHEDULES = "schedules"
+CONF_SETPOINT_TIMELINE = "timeline"
+CONF_FORECAST_HOURS = "hours"
 
 PLATFORMS = [ Platform.SENSOR, Platform.BINARY_SENSOR, Platform.SELECT, Platform.NUMBER, Platform.BUTTON ]
 # PLATFORMS = [ Platform.SENSOR ]
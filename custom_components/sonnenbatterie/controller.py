@@ -0,0 +1,84 @@
+"""Closed-loop grid controller (zero export / self-consumption).
+
+Runs inside the coordinator on every fresh status sample: it compares
+GridFeedIn_W with the configured target and moves the battery's charge or
+discharge setpoint toward it - within one poll period instead of the round
+trip through sensor states, automations and number entities an external
+controller needs.
+"""
+from dataclasses import asdict, dataclass, fields
+
+
+@dataclass(frozen=True, slots=True)
+class ControllerSettings:
+    enabled: bool = False
+    # GridFeedIn_W to settle at (W, > 0: export); 0 is zero export
+    target: float = 0.0
+    # deviations from the target up to this (W) are left alone
+    deadband: float = 50.0
+    # gains per sample, on the change of the deviation / on the deviation
+    kp: float = 0.3
+    ki: float = 0.7
+    # largest setpoint change per sample (W)
+    max_step: float = 1000.0
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "ControllerSettings":
+        if not data:
+            return cls()
+        return cls(**{field.name: data[field.name] for field in fields(cls) if field.name in data})
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# the settings changeable by the set_grid_controller service
+CONTROLLER_FIELDS = tuple(field.name for field in fields(ControllerSettings))
+
+
+class PiController:
+    """PI controller in velocity form: each sample yields a setpoint CHANGE.
+
+    The integral is the setpoint itself, so clamping it to the inverter limit
+    is all it takes to keep it from winding up. When the battery doesn't
+    deliver what was commanded (full, empty, derated), the next step starts
+    from the measured battery power instead - a saturated battery therefore
+    doesn't leave a setpoint behind that has to be ramped back first.
+    """
+
+    __slots__ = ("settings", "output", "written", "_last_error")
+
+    def __init__(self, settings: ControllerSettings) -> None:
+        self.settings = settings
+        self.reset()
+
+    def reset(self) -> None:
+        # setpoint (W, > 0: charge, < 0: discharge)
+        self.output = 0.0
+        # setpoint last sent to the battery, None if unknown
+        self.written: int | None = None
+        self._last_error: float | None = None
+
+    def update(self, grid_feed_in: float, actual: float | None, limit: float) -> int | None:
+        """A new setpoint for the sample, or None to keep the current one.
+
+        `actual` is the measured battery power (W, > 0: charging), `limit`
+        the inverter's maximum power.
+        """
+        settings = self.settings
+        # exporting more than the target -> charge more
+        error = grid_feed_in - settings.target
+        last_error, self._last_error = self._last_error, error
+        if abs(error) <= settings.deadband:
+            return None
+        if actual is not None and abs(self.output - actual) > settings.deadband:
+            self.output = actual
+        change = settings.ki * error
+        if last_error is not None:
+            change += settings.kp * (error - last_error)
+        change = max(-settings.max_step, min(settings.max_step, change))
+        self.output = max(-limit, min(limit, self.output + change))
+        setpoint = int(round(self.output))
+        if setpoint == self.written:
+            return None
+        return setpoint
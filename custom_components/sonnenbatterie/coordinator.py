@@ -2,17 +2,53 @@ import asyncio
 import sys
 import traceback
 from datetime import timedelta
-from time import time
+from time import monotonic, time
+from typing import Any, Callable, Coroutine, Mapping
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_SCAN_INTERVAL, CONF_USERNAME, CONF_PASSWORD, CONF_IP_ADDRESS
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_SCAN_INTERVAL, CONF_USERNAME, CONF_PASSWORD, CONF_IP_ADDRESS, EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from sonnenbatterie import AsyncSonnenBatterie
 
 from custom_components.sonnenbatterie import LOGGER, DOMAIN, ATTR_SONNEN_DEBUG
-from .const import CONF_AUTH_TOKEN
+from .baseline import Baseline
+from .capabilities import (
+    FAST_SECTIONS,
+    REQUIRED_SECTIONS,
+    SLOW_SECTIONS,
+    Capabilities,
+    firmware_version,
+    is_auth_error,
+    is_unsupported_error,
+    normalize,
+)
+from .commands import COMMANDS, Command
+from .const import CONF_AUTH_TOKEN, CONF_CAPABILITIES, CONF_CONTROLLER, SB_OPERATING_MODES
+from .controller import ControllerSettings, PiController
+from .degradation import Degradation
+from .energy import EnergyCounters
+from .kpi import KpiEngine
+from .latency import LatencyTracker
+from .model import CONFIGURATION_FIELDS, EMPTY, BatteryInfo, BatterySystemData, StatusData
+from .predictor import SocPredictor
+from .reconcile import SampleContext, SetpointTracker
+from .snapshot import SECTION_UNSUPPORTED, SectionMeta, Snapshot, SnapshotBuilder
+from .tou import TouSchedule
+
+# An entity's section is considered stale after this many missed fetches of it.
+STALE_AFTER_CYCLES = 3
+
+# number entity key -> command writing it
+_SETPOINT_COMMANDS = {
+    "number_charge": "charge",
+    "number_discharge": "discharge",
+    "battery_reserve": "battery_reserve",
+}
 
 def _v2_write_class():
     """The v2 (Auth-Token) WRITE-client class, obtained WITHOUT declaring a new
@@ -47,6 +83,13 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
     TIMEOUT_READ = 30
     TIMEOUT_TOTAL = 40
 
+    # Writes are verified by ONE read of the sections they touched, once the
+    # writers have been quiet for VERIFY_QUIET seconds - but no later than
+    # VERIFY_MAX_DELAY seconds after the first unverified write, so a writer
+    # that never pauses can't postpone it forever.
+    VERIFY_QUIET = 2.0
+    VERIFY_MAX_DELAY = 10.0
+
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry, serial: str) -> None:
         # Never log secrets (password / Auth-Token) in clear text.
         _safe = {k: ("***" if k in (CONF_PASSWORD, CONF_AUTH_TOKEN) else v)
@@ -60,6 +103,35 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
         self._last_error = None
         self._last_login = 0
         self._cycle_count = 0   # schedules the rarely-changing endpoints
+        self._auth_failed = False   # a fetch of this poll was refused (401/403)
+        # what the firmware supports, probed once per firmware version
+        self._capabilities = Capabilities.from_dict(config_entry.data.get(CONF_CAPABILITIES))
+        # keep the raw payloads in the snapshot (they're logged in debug mode only)
+        self._debug_capture = config_entry.data.get(ATTR_SONNEN_DEBUG, False)
+        # sections touched by writes, re-read by the pending verification
+        # or the next poll (even if it isn't a slow cycle)
+        self._unverified: set[str] = set()
+        self._verify_since: float | None = None
+        self._verify_unsub = None
+        config_entry.async_on_unload(self._cancel_verification)
+        # section -> the on-demand read of it currently in flight
+        self._inflight: dict[str, asyncio.Task] = {}
+        # (EM_ToU_Schedule string, its parsed form)
+        self._tou_cache: tuple[str | None, TouSchedule] = (None, TouSchedule())
+        # called with every snapshot a poll publishes
+        self._sample_listeners: list[Callable[[Snapshot], None]] = []
+        self._control_task: asyncio.Task | None = None
+        # fetch time of the status sample the controller acted on last
+        self._controlled_at: float | None = None
+        self._resend_task: asyncio.Task | None = None
+        self.async_add_sample_listener(self._control)
+        self.async_add_sample_listener(self._reconcile)
+        self.async_add_sample_listener(self._check_effects)
+        self.async_add_sample_listener(self._integrate_energy)
+        self.async_add_sample_listener(self._track_soc)
+        self._energy_store = Store(hass, 1, f"{DOMAIN}.{config_entry.entry_id}.energy")
+        # removes the stop listener until it has fired
+        self._unsub_stop = None
 
         """ public attributes """
         # Serializes ALL device I/O (poll bursts, entity writes, services): the
@@ -67,7 +139,27 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
         # concurrent requests queue up and run into read timeouts
         # ("Timeout on reading data from socket").
         self.io_lock = asyncio.Lock()
-        self.latestData = {}
+        # per command: executions, failures, retries, duration of the last one
+        self.command_metrics: dict[str, dict] = {}
+        # the published data, replaced (never modified) by every cycle
+        self.snapshot = Snapshot()
+        # the in-process grid controller (off unless configured)
+        self.controller = PiController(ControllerSettings.from_dict(config_entry.data.get(CONF_CONTROLLER)))
+        # the last charge/discharge setpoint commanded, followed in the polls
+        self.setpoints = SetpointTracker()
+        # queue, round trip and command-to-effect times of the writes
+        self.latency = LatencyTracker()
+        # energy (Wh) integrated from the status samples; a few missed polls
+        # are bridged, longer gaps aren't
+        self.energy = EnergyCounters(max_gap=max(300.0, 3.0 * config_entry.data.get(CONF_SCAN_INTERVAL, 30)))
+        # autarky, self-consumption etc. over today / 24 h / 7 d
+        self.kpi = KpiEngine()
+        # cycle counting and capacity estimate
+        self.degradation = Degradation()
+        # time to full / to the backup reserve
+        self.soc_predictor = SocPredictor()
+        # expected consumption / production by hour of the week
+        self.baseline = Baseline()
         self.name = config_entry.title
         self.serial = serial
         self.sbconn = AsyncSonnenBatterie(username=self._config_entry.data[CONF_USERNAME],
@@ -95,52 +187,68 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
                          name=DOMAIN,
                          update_interval=timedelta(seconds=config_entry.data.get(CONF_SCAN_INTERVAL, 30)))
 
+    @property
+    def section_meta(self) -> Mapping[str, SectionMeta]:
+        """Per-section fetch time and outcome of the current snapshot."""
+        return self.snapshot.meta
+
+    @property
+    def tou_schedule(self) -> TouSchedule:
+        """The current time-of-use schedule, parsed once per change."""
+        text = self.snapshot.configurations.tou_schedule
+        if text != self._tou_cache[0]:
+            self._tou_cache = (text, TouSchedule.parse(text))
+        return self._tou_cache[1]
+
     @property
     def device_info(self) -> DeviceInfo:
-        system_data = self.latestData["battery_system"]["battery_system"]
-        system_info = self.latestData["system_data"]
+        battery_system = self.snapshot.battery_system
 
         # noinspection HttpUrlsUsage
         return DeviceInfo(
             identifiers={(DOMAIN, self._config_entry.entry_id)},
             configuration_url=f"http://{self._config_entry.data[CONF_IP_ADDRESS]}/",
             manufacturer="Sonnen",
-            model=system_info.get("ERP_ArticleName", "unknown"),
+            model=self.snapshot.system_data.article_name or "unknown",
             name=f"{DOMAIN} {self.serial}",
             serial_number=f"{self.serial}",
-            sw_version=f"{system_data.get('software', {}).get('software_version', 'unknown')} ({system_data.get('software', {}).get('firmware_version', 'unknown')})",
-            hw_version=f"{system_data.get('system', {}).get('hardware_version', 'unknown')}",
+            sw_version=f"{battery_system.software_version or 'unknown'} ({battery_system.firmware_version or 'unknown'})",
+            hw_version=f"{battery_system.hardware_version or 'unknown'}",
         )
 
-    def populate_battery_info(self):
+    def _derive_battery_info(self, sections: Mapping[str, Any]) -> BatteryInfo:
         """ some manually calculated values """
-        batt_module_capacity = int(
-            self.latestData["battery_system"]["battery_system"].get("system", {}).get("storage_capacity_per_module", 0)
-        )
-        batt_module_count = int(self.latestData["battery_system"]["modules"])
-
-        if self.latestData["status"]["BatteryCharging"]:
+        battery_system: BatterySystemData = sections["battery_system"]
+        status: StatusData = sections["status"]
+        if status.rsoc is None or battery_system.modules is None:
+            return EMPTY["battery_info"]
+        batt_module_capacity = int(battery_system.storage_capacity_per_module or 0)
+        batt_module_count = int(battery_system.modules)
+
+        if status.battery_charging:
             battery_current_state = "charging"
-        elif self.latestData["status"]["BatteryDischarging"]:
+        elif status.battery_discharging:
             battery_current_state = "discharging"
         else:
             battery_current_state = "standby"
 
-        self.latestData["battery_info"] = {}
-        self.latestData["battery_info"]["current_state"] = battery_current_state
-        self.latestData["battery_info"][
-            "total_installed_capacity"
-        ] = total_installed_capacity = int(batt_module_count * batt_module_capacity)
-        self.latestData["battery_info"]["reserved_capacity"] = reserved_capacity = int(
-            total_installed_capacity * (self._batt_reserved_factor / 100.0)
-        )
-        self.latestData["battery_info"]["remaining_capacity"] = remaining_capacity = (
-            int(total_installed_capacity * self.latestData["status"]["RSOC"]) / 100.0
-        )
-        self.latestData["battery_info"]["remaining_capacity_usable"] = max(
-            0, int(remaining_capacity - reserved_capacity)
+        total_installed_capacity = int(batt_module_count * batt_module_capacity)
+        reserved_capacity = int(total_installed_capacity * (self._batt_reserved_factor / 100.0))
+        remaining_capacity = int(total_installed_capacity * status.rsoc) / 100.0
+        return BatteryInfo(
+            current_state=battery_current_state,
+            total_installed_capacity=total_installed_capacity,
+            reserved_capacity=reserved_capacity,
+            remaining_capacity=remaining_capacity,
+            remaining_capacity_usable=max(0, int(remaining_capacity - reserved_capacity)),
         )
 
+    def _publish(self, builder: SnapshotBuilder) -> Snapshot:
+        """Swap in the snapshot built by `builder` (one atomic assignment)."""
+        self.snapshot = builder.build(self._derive_battery_info)
+        LOGGER.debug(f"snapshot built in {self.snapshot.build_cost * 1000:.3f} ms")
+        return self.snapshot
+
     def _relax_timeouts(self, *clients):
         """Apply relaxed timeouts to the given async client(s). The v1 client
         RE-CREATES its v2 sub-client (sbconn.sb2) on every login, so this must run
@@ -174,70 +282,239 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
             self._relax_timeouts(self.sbconn, getattr(self.sbconn, "sb2", None))
             self._last_login = time()
 
-    async def _async_update_data(self):
-        """Populate self.latestdata"""
+    async def _async_update_data(self) -> Snapshot:
+        """Build and publish a new snapshot"""
         async with self.io_lock:
-            await self._update_locked()
+            snapshot = await self._update_locked()
+        for listener in tuple(self._sample_listeners):
+            try:
+                listener(snapshot)
+            except Exception:  # noqa: BLE001 - a listener must not fail the poll
+                LOGGER.exception("Error in sample listener")
+        return snapshot
+
+    @callback
+    def async_add_sample_listener(self, listener: Callable[[Snapshot], None]) -> Callable[[], None]:
+        """Have `listener` called with every snapshot a poll publishes, right
+        after the poll - unlike async_add_listener(), not for the patched
+        snapshots published after writes. Returns the function removing it."""
+        self._sample_listeners.append(listener)
+        return lambda: self._sample_listeners.remove(listener)
+
+    async def _read_section(self, section: str):
+        """Fetch one section (endpoint) from the battery."""
+        match section:
+            case "battery":
+                return await self.sbconn.get_battery()
+            case "inverter":
+                return await self.sbconn.get_inverter()
+            case "powermeter":
+                return await self.sbconn.get_powermeter()
+            case "status":
+                return await self.sbconn.get_status()
+            case "v2_status":
+                return await self.sbconn.sb2.get_status()
+            case "battery_system":
+                return await self.sbconn.get_batterysystem()
+            case "system_data":
+                return await self.sbconn.get_systemdata()
+            case "configurations":
+                return await self.sbconn.sb2.get_configurations()
+            case "api_configuration":
+                return await self.sbconn.get_api_configuration()
+            case "latestdata":
+                return await self.sbconn.sb2.get_latest_data()
+            case "commissioning_settings":
+                return await self.sbconn.get_commissioning_settings()
+        raise ValueError(f"unknown section {section!r}")
+
+    async def _probe_capabilities(self, firmware: str) -> dict:
+        """Request every endpoint once to find out what this firmware supports.
+
+        Only a "not found"-like answer marks an endpoint as unsupported; any
+        other error aborts the probe (it is repeated on the next cycle), so a
+        busy battery never gets endpoints disabled permanently. Returns the
+        payloads fetched while probing so the cycle doesn't request them again.
+        """
+        LOGGER.info(f"Probing API capabilities of firmware {firmware}")
+        # battery_system and system_data have just been fetched by the cycle
+        payloads = {}
+        unsupported = set()
+        for section in FAST_SECTIONS + SLOW_SECTIONS:
+            if section in ("battery_system", "system_data"):
+                continue
+            try:
+                payloads[section] = await self._read_section(section)
+            except Exception as e:
+                if section in REQUIRED_SECTIONS or not is_unsupported_error(e):
+                    raise
+                LOGGER.info(f"Endpoint '{section}' not supported by firmware {firmware}")
+                unsupported.add(section)
+                continue
 
-    async def _update_locked(self):
+        self._capabilities = Capabilities(firmware, unsupported)
+        self.hass.config_entries.async_update_entry(
+            self._config_entry,
+            data={**self._config_entry.data, CONF_CAPABILITIES: self._capabilities.as_dict()},
+        )
+        return payloads
+
+    def default_max_age(self, section: str) -> float:
+        """How long the values of a section stay valid without a successful fetch."""
+        interval = self.update_interval.total_seconds()
+        if section in SLOW_SECTIONS:
+            interval *= self.SLOW_POLL_EVERY
+        return interval * STALE_AFTER_CYCLES
+
+    def is_fresh(self, section: str | None, max_age: float | None = None) -> bool:
+        """Whether the last good data of a section may still be served."""
+        if section is None:
+            return True
+        if self._capabilities is not None and not self._capabilities.supports(section):
+            # nothing to be stale, readers fall back to their defaults
+            return True
+        meta = self.section_meta.get(section)
+        if meta is None or meta.fetched_at is None:
+            return False
+        if max_age is None:
+            max_age = self.default_max_age(section)
+        return time() - meta.fetched_at <= max_age
+
+    def section_status(self) -> dict:
+        """Fetch time and outcome of every section, for diagnostics."""
+        result = {}
+        for section in FAST_SECTIONS + SLOW_SECTIONS:
+            if self._capabilities is not None and not self._capabilities.supports(section):
+                result[section] = {"status": SECTION_UNSUPPORTED}
+                continue
+            meta = self.section_meta.get(section, SectionMeta())
+            result[section] = {
+                "status": meta.status,
+                "fetched_at": meta.fetched_at,
+                "stale": not self.is_fresh(section),
+            }
+            if meta.error:
+                result[section]["error"] = meta.error
+        return result
+
+    async def _fetch_section(self, builder: SnapshotBuilder, section: str) -> bool:
+        """Fetch one section in isolation: a failure - of the request or of
+        parsing its answer - only marks THIS section as failed (keeping its
+        last good data), the cycle goes on."""
+        try:
+            payload = await self._read_section(section)
+            builder.set(section, payload, time())
+        except Exception as e:
+            LOGGER.debug(f"Fetching '{section}' failed: {traceback.format_exc()}")
+            builder.failed(section, str(e) or type(e).__name__)
+            if is_auth_error(e):
+                self._auth_failed = True
+            return False
+        return True
+
+    async def _update_locked(self) -> Snapshot:
         await self._ensure_login()
 
         LOGGER.debug(f"COORDINATOR - async_update_data: {self._config_entry.data}")
-        slow_due = (not self.latestData
+        builder = SnapshotBuilder(self.snapshot, normalize, self._debug_capture)
+        slow_due = (not self.snapshot.built_at
+                    or self._capabilities is None
                     or self._cycle_count % self.SLOW_POLL_EVERY == 0)
         self._cycle_count += 1
-        try:
-            self.latestData["battery"] = await self.sbconn.get_battery()
-            self.latestData["inverter"] = await self.sbconn.get_inverter()
-            self.latestData["powermeter"] = await self.sbconn.get_powermeter()
-            self.latestData["status"] = await self.sbconn.get_status()
-            self.latestData["v2_status"] = await self.sbconn.sb2.get_status()
-
-            if slow_due:
-                self.latestData["battery_system"] = await self.sbconn.get_batterysystem()
-                self.latestData["system_data"] = await self.sbconn.get_systemdata()
-                self.latestData["configurations"] = await self.sbconn.sb2.get_configurations()
-                self.latestData["api_configuration"] = await self.sbconn.get_api_configuration()
-                # fault flags rarely change; the ~3.3KB payload is the largest of any
-                # endpoint we poll, so keep it on the slow cadence with the other
-                # diagnostic/config data rather than fetching it every cycle
-                self.latestData["latestdata"] = await self.sbconn.sb2.get_latest_data()
-                self.latestData["commissioning_settings"] = await self.sbconn.get_commissioning_settings()
 
-            self._last_error = None
+        # this poll covers the pending verification
+        self._cancel_verification()
+        verify, self._unverified = self._unverified, set()
+        sections = FAST_SECTIONS + (SLOW_SECTIONS if slow_due else tuple(verify.difference(FAST_SECTIONS)))
+        done = set()
+        failed = []
+        attempted = 0
+        self._auth_failed = False
+        if slow_due:
+            # the firmware version decides whether the capabilities are still valid
+            for section in ("battery_system", "system_data"):
+                done.add(section)
+                attempted += 1
+                if not await self._fetch_section(builder, section):
+                    failed.append(section)
+            if not failed:
+                firmware = firmware_version(builder.sections["battery_system"], builder.sections["system_data"])
+                if self._capabilities is None or self._capabilities.firmware != firmware:
+                    try:
+                        payloads = await self._probe_capabilities(firmware)
+                    except Exception:
+                        # transient - poll everything as usual, probe again next cycle
+                        LOGGER.debug(f"Capability probe failed: {traceback.format_exc()}")
+                    else:
+                        now = time()
+                        for section, payload in payloads.items():
+                            if section in done:
+                                continue
+                            done.add(section)
+                            attempted += 1
+                            try:
+                                builder.set(section, payload, now)
+                            except Exception as e:
+                                LOGGER.debug(f"Parsing '{section}' failed: {traceback.format_exc()}")
+                                builder.failed(section, str(e) or type(e).__name__)
+                                failed.append(section)
+
+        for section in sections:
+            if section in done:
+                continue
+            if self._capabilities is not None and not self._capabilities.supports(section):
+                continue
+            attempted += 1
+            if not await self._fetch_section(builder, section):
+                failed.append(section)
 
-        except Exception as e:
-            self._last_login = 0    # session is suspect -> fresh login next try
-            LOGGER.debug(traceback.format_exc())
-            if self._last_error is not None:
-                LOGGER.info(traceback.format_exc() + " ... might be maintenance window")
+        if not failed:
+            self._last_error = None
+        else:
+            self._unverified.update(verify.intersection(failed))
+            # a section failing on its own (busy, 5xx) says nothing about the
+            # session - renewing it every poll would only add requests
+            if self._auth_failed or len(failed) == attempted:
+                self._last_login = 0    # session is suspect -> fresh login next try
+            if len(failed) < len(sections):
+                LOGGER.info(f"Fetching {failed} failed, serving their last values until they get stale")
+            elif self._last_error is not None:
+                LOGGER.info(f"Fetching all sections failed ({builder.meta[failed[0]].error}) ... might be maintenance window")
                 elapsed = time() - self._last_error
                 if elapsed > 180:
                     LOGGER.error(
-                        f"Unable to connecto to Sonnenbatteries at {self._config_entry.data[CONF_IP_ADDRESS]} for {elapsed} seconds. Please check! [{e}]")
+                        f"Unable to connecto to Sonnenbatteries at {self._config_entry.data[CONF_IP_ADDRESS]} for {elapsed} seconds. Please check! [{builder.meta[failed[0]].error}]")
             else:
                 self._last_error = time()
 
-        # Fixup for older models
-        if isinstance(self.latestData.get("powermeter"), dict):
-            # noinspection PyBroadException
-            try:
-                # some new firmware of sonnenbatterie seems to send a dictionary, but we work with a list, so reformat :)
-                new_powermeters = []
-                for index, dictIndex in enumerate(self.latestData["powermeter"]):
-                    new_powermeters.append(self.latestData["powermeter"][dictIndex])
-                self.latestData["powermeter"] = new_powermeters
-            except:
-                e = traceback.format_exc()
-                LOGGER.error(e)
+        snapshot = self._publish(builder)
+        if not (snapshot.has("status") and snapshot.has("battery_system")):
+            raise UpdateFailed("No data from the Sonnenbatterie yet")
 
-        if self._config_entry.data.get(ATTR_SONNEN_DEBUG, False):
+        if self._debug_capture:
             self.send_all_data_to_log()
 
-        self.populate_battery_info()
+        return snapshot
 
-    async def async_write_setpoint(self, key: str, value) -> None:
-        """Write a charge/discharge/reserve setpoint robustly.
+    async def async_execute(self, name: str, *args, verify: bool = True) -> Any:
+        """Run a mutating command (see commands.py) on the battery.
+
+        The single pipeline for ALL writes - entities and services alike:
+        serialized with the polls by io_lock, sent through the Auth-Token client
+        if configured (else the session client), retried once, accounted in
+        command_metrics and followed by the shared, debounced read-back -
+        unless `verify` is False because the caller watches the result in the
+        regular polls anyway. Returns the battery's answer.
+        """
+        command = COMMANDS[name]
+        queued = time()
+        async with self.io_lock:
+            response = await self._execute_locked(name, command, args, queued)
+        self._after_commands([(command, response)], verify)
+        return response
+
+    async def _execute_locked(self, name: str, command: Command, args: tuple, queued: float) -> Any:
+        """Perform one command robustly; the caller holds io_lock.
 
         The battery's local API occasionally drops the session (token expiry ->
         401) or answers slowly (socket timeout), and the v1 session client's v2
@@ -247,65 +524,407 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
 
         When a static Auth-Token is configured, the dedicated v2 client is used
         (no login, no session expiry). Otherwise the session client is used with
-        an ensure-login and one re-login+retry on failure. A light refresh
-        confirms the applied value afterwards."""
-        v = int(value)
-
-        async def _do(client) -> None:
-            if key == "number_charge":
-                await client.charge_battery(v)
-            elif key == "number_discharge":
-                await client.discharge_battery(v)
-            elif key == "battery_reserve":
-                await client.set_battery_reserve(v)
-            else:
-                raise ValueError(f"unknown setpoint key {key!r}")
-
+        an ensure-login and one re-login+retry on failure. `queued` is the
+        time the command started waiting for io_lock."""
+        metrics = self.command_metrics.setdefault(name, {"count": 0, "failed": 0, "retries": 0, "last_duration": None})
+        metrics["count"] += 1
+        started = monotonic()
+        for attempt in (1, 2):
+            try:
+                if self._write_v2 is not None:
+                    # static token: no login/session — just one retry on a transient
+                    # socket timeout (the command usually lands even then).
+                    client = self._write_v2
+                else:
+                    await self._ensure_login()
+                    client = getattr(self.sbconn, "sb2", None)
+                    if client is None:
+                        raise RuntimeError("sonnenbatterie session not established (sb2 is None)")
+                sent = time()
+                response = await command.call(client, *args)
+                break
+            except Exception as e:  # noqa: BLE001
+                if self._write_v2 is None:
+                    self._last_login = 0    # session suspect -> fresh login on retry
+                if attempt == 2:
+                    metrics["failed"] += 1
+                    raise
+                metrics["retries"] += 1
+                LOGGER.debug(f"command {name}{args} failed, retry: {e}")
+        metrics["last_duration"] = round(monotonic() - started, 3)
+        LOGGER.debug(f"command {name}{args} took {metrics['last_duration']} s")
+        acked = time()
+        if command.setpoint:
+            self.setpoints.command(command.setpoint * int(args[0]), acked)
+        effect = None
+        if command.effect is not None:
+            # a newer charge or discharge setpoint replaces the older one
+            kind = "setpoint" if command.setpoint else name
+            effect = (kind, lambda snapshot: command.effect(snapshot, *args))
+        self.latency.acknowledged(name, queued, sent, acked, effect)
+        return response
+
+    async def async_execute_batch(self, operations: list[tuple[str, tuple]]) -> list[dict]:
+        """Run several commands in order in ONE io_lock slot.
+
+        The battery has no transactions: execution stops at the first failing
+        command, the ones after it are reported as skipped. The commands that
+        did run are patched into the snapshot in one go and share one read-back.
+        """
+        results = []
+        executed = []
+        failed = False
+        queued = time()
         async with self.io_lock:
-            if self._write_v2 is not None:
-                # static token: no login/session — just one retry on a transient
-                # socket timeout (the command usually lands even then).
-                for attempt in (1, 2):
-                    try:
-                        await _do(self._write_v2)
-                        break
-                    except Exception as e:  # noqa: BLE001
-                        if attempt == 2:
-                            raise
-                        LOGGER.debug(f"token setpoint write {key} failed, retry: {e}")
+            for name, args in operations:
+                if failed:
+                    results.append({"operation": name, "status": "skipped"})
+                    continue
+                command = COMMANDS[name]
+                if executed:
+                    # waited for the ones before it, not for the lock
+                    queued = time()
+                try:
+                    response = await self._execute_locked(name, command, args, queued)
+                except Exception as e:  # noqa: BLE001 - reported per operation
+                    LOGGER.warning(f"Batch operation {name}{args} failed: {e}")
+                    results.append({"operation": name, "status": "failed", "error": str(e) or type(e).__name__})
+                    failed = True
+                    continue
+                executed.append((command, response))
+                results.append({"operation": name, "status": "ok", "response": response})
+        self._after_commands(executed)
+        return results
+
+    def _after_commands(self, executed: list[tuple[Command, Any]], verify: bool = True) -> None:
+        """Patch what the battery reported back for the commands into the
+        snapshot - instead of reading it again right away - and schedule the
+        read-back of everything they touched.
+
+        Writers (external controllers) may set values every few seconds; the
+        follow-up reads per write saturated the battery's webserver.
+        """
+        changes = {}
+        sections = set()
+        for command, response in executed:
+            sections.update(command.verify)
+            if command.returns_config and isinstance(response, Mapping):
+                changes.update(
+                    (CONFIGURATION_FIELDS[item], str(value))
+                    for item, value in response.items()
+                    if item in CONFIGURATION_FIELDS
+                )
+        if changes:
+            builder = SnapshotBuilder(self.snapshot, normalize, self._debug_capture)
+            builder.patch("configurations", **changes)
+            # not async_set_updated_data(): that reschedules the next poll, and
+            # frequent writers would postpone it indefinitely
+            self.data = self._publish(builder)
+            self.async_update_listeners()
+        if verify:
+            self.request_verification(*sections)
+
+    async def async_write_setpoint(self, key: str, value) -> None:
+        """Write the setpoint of a number entity."""
+        await self.async_execute(_SETPOINT_COMMANDS[key], value)
+
+    def configure_controller(self, settings: ControllerSettings) -> None:
+        """Replace the controller's settings and persist them."""
+        was_active = self.controller.settings.enabled and self.controller.written
+        self.controller.settings = settings
+        self.controller.reset()
+        self.hass.config_entries.async_update_entry(
+            self._config_entry,
+            data={**self._config_entry.data, CONF_CONTROLLER: settings.as_dict()},
+        )
+        if was_active and not settings.enabled:
+            # don't leave the battery at the controller's last setpoint
+            self._start_control_write(0)
+
+    @callback
+    def _control(self, snapshot: Snapshot) -> None:
+        """One step of the grid controller, on a fresh status sample."""
+        controller = self.controller
+        if not controller.settings.enabled:
+            return
+        meta = snapshot.meta.get("status")
+        if meta is None or meta.fetched_at is None or meta.fetched_at == self._controlled_at:
+            # the status didn't change - its grid error was accounted already
+            return
+        status = snapshot.status
+        limit = snapshot.battery_system.inverter_capacity
+        if status.grid_feed_in_w is None or not limit:
+            return
+        if str(status.operating_mode) != str(SB_OPERATING_MODES["manual"]):
+            # setpoints are ignored in any other mode
+            if controller.written is not None:
+                LOGGER.info("Grid controller paused: the battery isn't in manual mode")
+            controller.reset()
+            return
+        if self._control_task is not None and not self._control_task.done():
+            # the last setpoint is still on its way
+            return
+        self._controlled_at = meta.fetched_at
+        actual = -status.pac_total_w if status.pac_total_w is not None else None
+        setpoint = controller.update(status.grid_feed_in_w, actual, limit)
+        if setpoint is not None:
+            self._start_control_write(setpoint)
+
+    def _start_control_write(self, setpoint: int) -> None:
+        self._control_task = self._config_entry.async_create_background_task(
+            self.hass, self._async_write_control(setpoint), f"{DOMAIN} grid controller"
+        )
+
+    async def _async_write_control(self, setpoint: int) -> None:
+        try:
+            if setpoint >= 0:
+                await self.async_execute("charge", setpoint, verify=False)
             else:
-                for attempt in (1, 2):
-                    try:
-                        await self._ensure_login()
-                        sb2 = getattr(self.sbconn, "sb2", None)
-                        if sb2 is None:
-                            raise RuntimeError("sonnenbatterie session not established (sb2 is None)")
-                        await _do(sb2)
-                        break
-                    except Exception as e:  # noqa: BLE001
-                        self._last_login = 0    # session suspect -> fresh login on retry
-                        if attempt == 2:
-                            raise
-                        LOGGER.debug(f"setpoint write {key} failed, re-login + retry: {e}")
-        await self.refresh_after_write()
-
-    async def refresh_after_write(self):
-        """Light refresh after a setpoint/mode write: a few targeted reads instead
-        of the full poll salvo that async_request_refresh() triggers — writers
-        (external controllers) may set values every few seconds, and a full
-        request burst per write saturates the battery's webserver."""
+                await self.async_execute("discharge", -setpoint, verify=False)
+        except Exception as e:  # noqa: BLE001 - retried on the next sample
+            LOGGER.warning(f"Grid controller failed to set {setpoint} W: {e}")
+            self.controller.written = None
+        else:
+            self.controller.written = setpoint
+
+    def commanded_setpoint(self, key: str) -> int | None:
+        """The charge/discharge target of a setpoint number entity as
+        commanded last (by whichever writer), None if unknown."""
+        sign = COMMANDS[_SETPOINT_COMMANDS[key]].setpoint
+        if not sign or self.setpoints.commanded is None:
+            return None
+        return max(0, self.setpoints.commanded * sign)
+
+    @callback
+    def _reconcile(self, snapshot: Snapshot) -> None:
+        """Compare the commanded setpoint with the measured battery power;
+        send it again only if the battery has dropped it."""
+        meta = snapshot.meta.get("status")
+        if meta is None or meta.fetched_at is None:
+            return
+        reserve = snapshot.configurations.usoc
+        context = SampleContext(snapshot.status, snapshot.v2_status, float(reserve) if reserve is not None else None)
+        power = self.setpoints.sample(context, meta.fetched_at)
+        if power is None or (self._resend_task is not None and not self._resend_task.done()):
+            return
+        LOGGER.info(f"The battery dropped the setpoint of {power} W, sending it again")
+        self._resend_task = self._config_entry.async_create_background_task(
+            self.hass, self._async_resend(power), f"{DOMAIN} setpoint resend"
+        )
+
+    async def async_restore_energy(self) -> None:
+        """Continue the energy counters where they were before the restart."""
+        if (data := await self._energy_store.async_load()) is not None:
+            self.energy.restore(data.get("totals", {}))
+            self.kpi.restore(data.get("kpi", {}))
+            self.degradation.restore(data.get("degradation", {}))
+            self.baseline.restore(data.get("baseline", {}))
+
+    @callback
+    def async_listen_stop(self) -> Callable[[], Coroutine[Any, Any, None]]:
+        """Save the energy counters when Home Assistant stops or the entry is
+        unloaded, whichever comes first. Returns the unload callback."""
+        self._unsub_stop = self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+        return self._async_unload
+
+    async def _async_stop(self, _event: Event) -> None:
+        # a once-listener is removed when it fires
+        self._unsub_stop = None
+        await self.async_save_energy()
+
+    async def _async_unload(self) -> None:
+        if self._unsub_stop is None:
+            # saved on the stop already
+            return
+        self._unsub_stop()
+        self._unsub_stop = None
+        await self.async_save_energy()
+
+    async def async_save_energy(self) -> None:
+        """Write the energy counters now. A delayed save still pending after
+        a reload would come only after the next setup restored them."""
+        await self._energy_store.async_save(self._energy_data())
+
+    def _energy_data(self) -> dict:
+        return {
+            "totals": dict(self.energy.totals),
+            "kpi": self.kpi.as_stored(),
+            "degradation": self.degradation.as_stored(),
+            "baseline": self.baseline.as_stored(),
+        }
+
+    @callback
+    def _integrate_energy(self, snapshot: Snapshot) -> None:
+        meta = snapshot.meta.get("status")
+        if meta is None or meta.fetched_at is None:
+            return
+        status = snapshot.status
+        outcome = self.energy.sample(status, meta.fetched_at)
+        if outcome.integrated:
+            # written at most once a minute (and when Home Assistant stops)
+            self._energy_store.async_delay_save(self._energy_data, 60)
+        self.kpi.sample(self.energy.totals, meta.fetched_at)
+        if (rsoc := status.rsoc) is not None:
+            totals = self.energy.totals
+            self.degradation.sample(
+                float(rsoc),
+                totals["battery_charge"] - totals["battery_discharge"],
+                # no new status isn't a gap - the swing goes on
+                not outcome.gap,
+                snapshot.battery_info.total_installed_capacity,
+            )
+        if status.consumption_w is not None and status.production_w is not None:
+            self.baseline.sample(float(status.consumption_w), float(status.production_w), meta.fetched_at)
+
+    @callback
+    def _track_soc(self, snapshot: Snapshot) -> None:
+        meta = snapshot.meta.get("status")
+        status = snapshot.status
+        if meta is None or meta.fetched_at is None or status.usoc is None or status.pac_total_w is None:
+            return
+        self.soc_predictor.sample(float(status.usoc), float(status.pac_total_w), meta.fetched_at)
+
+    @property
+    def _wh_per_percent(self) -> float | None:
+        """Energy per percent of USOC (Wh), None if unknown"""
+        info = self.snapshot.battery_info
+        if not info.total_installed_capacity:
+            return None
+        return (info.total_installed_capacity - (info.reserved_capacity or 0)) / 100
+
+    def minutes_to_soc(self, target: str) -> int | None:
+        """Predicted minutes until the battery is "full" or down to its
+        backup "reserve", None if it isn't heading there."""
+        if target == "full":
+            usoc = 100.0
+        elif (reserve := self.snapshot.configurations.usoc) is not None:
+            usoc = float(reserve)
+        else:
+            return None
+        minutes = self.soc_predictor.minutes_to(usoc, self._wh_per_percent)
+        return round(minutes) if minutes is not None else None
+
+    def soc_rate(self) -> dict:
+        rate = self.soc_predictor.rate(self._wh_per_percent)
+        if rate is None:
+            return {"rate": None, "method": None}
+        return {"rate": round(rate[0], 1), "method": rate[1]}
+
+    @callback
+    def _check_effects(self, snapshot: Snapshot) -> None:
+        meta = snapshot.meta.get("status")
+        if meta is not None and meta.fetched_at is not None:
+            self.latency.sample(snapshot, meta.fetched_at)
+
+    async def _async_resend(self, power: int) -> None:
         try:
-            async with self.io_lock:
+            await self.async_execute("charge" if power > 0 else "discharge", abs(power), verify=False)
+        except Exception as e:  # noqa: BLE001 - tried again on the next poll
+            LOGGER.warning(f"Re-sending the setpoint of {power} W failed: {e}")
+        else:
+            self.setpoints.command(power, time(), resend=True)
+
+    @callback
+    def request_verification(self, *sections: str) -> None:
+        """Schedule a read-back of sections changed by a write.
+
+        Every write path reports here; writes in quick succession (e.g. both
+        resets of button_reset_all, a mode change and a reserve update from one
+        automation) are merged into a single read of all touched sections.
+        """
+        self._unverified.update(sections)
+        now = monotonic()
+        if self._verify_since is None:
+            self._verify_since = now
+        delay = min(self.VERIFY_QUIET, self._verify_since + self.VERIFY_MAX_DELAY - now)
+        if self._verify_unsub is not None:
+            self._verify_unsub()
+        self._verify_unsub = async_call_later(self.hass, max(delay, 0), self._verification_due)
+
+    @callback
+    def _cancel_verification(self) -> None:
+        if self._verify_unsub is not None:
+            self._verify_unsub()
+            self._verify_unsub = None
+        self._verify_since = None
+
+    @callback
+    def _verification_due(self, _now) -> None:
+        self._verify_unsub = None
+        self.hass.async_create_task(self._async_verify())
+
+    async def _async_verify(self) -> None:
+        """Read back the sections touched by writes since the last poll."""
+        async with self.io_lock:
+            verify, self._unverified = self._unverified, set()
+            self._verify_since = None
+            if not verify:
+                # a poll got the lock first and has read them already
+                return
+            LOGGER.debug(f"Verifying {sorted(verify)} after write")
+            try:
                 await self._ensure_login()
-                self.latestData["status"] = await self.sbconn.get_status()
-                self.latestData["v2_status"] = await self.sbconn.sb2.get_status()
-                self.latestData["configurations"] = await self.sbconn.sb2.get_configurations()
-        except Exception:  # noqa: BLE001
-            LOGGER.debug(traceback.format_exc())
-            self._last_login = 0
-            return
-        self.populate_battery_info()
-        self.async_set_updated_data(self.latestData)
+            except Exception:  # noqa: BLE001 - leave it to the next poll
+                LOGGER.debug(traceback.format_exc())
+                self._last_login = 0
+                self._unverified.update(verify)
+                return
+            builder = SnapshotBuilder(self.snapshot, normalize, self._debug_capture)
+            attempted = failed = 0
+            self._auth_failed = False
+            for section in FAST_SECTIONS + SLOW_SECTIONS:
+                if section not in verify:
+                    continue
+                if self._capabilities is not None and not self._capabilities.supports(section):
+                    continue
+                attempted += 1
+                if not await self._fetch_section(builder, section):
+                    failed += 1
+                    self._unverified.add(section)
+            # same rule as the poll: only a refusal or nothing answering at
+            # all makes the session suspect
+            if failed and (self._auth_failed or failed == attempted):
+                self._last_login = 0
+            self.data = self._publish(builder)
+        self.async_update_listeners()
+
+    async def async_read_section(self, section: str, max_age: float | None = None) -> Any:
+        """The values of a section for on-demand readers (services).
+
+        Served from the snapshot if fetched no more than `max_age` seconds
+        ago. Otherwise the section is read from the battery - concurrent
+        readers of the same section share that single request.
+        """
+        meta = self.snapshot.meta.get(section)
+        if max_age and meta is not None and meta.fetched_at is not None and time() - meta.fetched_at <= max_age:
+            return getattr(self.snapshot, section)
+        # a read finished eagerly is still listed until its callback has run
+        if (pending := self._inflight.get(section)) is None or pending.done():
+            pending = self._inflight[section] = self.hass.async_create_task(self._read_fresh(section))
+            pending.add_done_callback(lambda _task: self._inflight.pop(section, None))
+        # a cancelled reader must not cancel the read the others wait for
+        return await asyncio.shield(pending)
+
+    async def _read_fresh(self, section: str) -> Any:
+        async with self.io_lock:
+            builder = SnapshotBuilder(self.snapshot, normalize, self._debug_capture)
+            try:
+                await self._ensure_login()
+            except Exception as e:
+                self._last_login = 0
+                raise HomeAssistantError(f"Unable to read '{section}': {e}") from e
+            self._auth_failed = False
+            ok = await self._fetch_section(builder, section)
+            if ok:
+                self._unverified.discard(section)
+            elif self._auth_failed:
+                # a single section failing (busy, 5xx) says nothing about the session
+                self._last_login = 0
+            self.data = self._publish(builder)
+        self.async_update_listeners()
+        if not ok:
+            raise HomeAssistantError(f"Unable to read '{section}': {builder.meta[section].error}")
+        return getattr(self.snapshot, section)
 
     async def fetch_sonnenbatterie_on_startup(self):
         """Fetch all config items from Sonnenbatterie."""
@@ -318,11 +937,13 @@ class SonnenbatterieCoordinator(DataUpdateCoordinator):
         variable we're looking for if it's not where we expect it to be
         """
         if not self._fullLogsAlreadySent:
-            LOGGER.warning(f"Powermeter data:\n{self.latestData['powermeter']}")
-            LOGGER.warning(f"Battery system data:\n{self.latestData['battery_system']}")
-            LOGGER.warning(f"Inverted:\n{self.latestData['inverter']}")
-            LOGGER.warning(f"System data:\n{self.latestData['system_data']}")
-            LOGGER.warning(f"Status:\n{self.latestData['status']}")
-            LOGGER.warning(f"Battery:\n{self.latestData['battery']}")
-            LOGGER.warning(f"API-Config:\n{self.latestData['api_configuration']}")
+            LOGGER.warning(f"Powermeter data:\n{self.snapshot.raw.get('powermeter')}")
+            LOGGER.warning(f"Battery system data:\n{self.snapshot.raw.get('battery_system')}")
+            LOGGER.warning(f"Inverted:\n{self.snapshot.raw.get('inverter')}")
+            LOGGER.warning(f"System data:\n{self.snapshot.raw.get('system_data')}")
+            LOGGER.warning(f"Status:\n{self.snapshot.raw.get('status')}")
+            LOGGER.warning(f"Battery:\n{self.snapshot.raw.get('battery')}")
+            LOGGER.warning(f"API-Config:\n{self.snapshot.raw.get('api_configuration')}")
+            if self._capabilities is not None:
+                LOGGER.warning(f"Capabilities:\n{self._capabilities.as_dict()}")
             self._fullLogsAlreadySent = True
@@ -0,0 +1,179 @@
+"""Battery wear: rainflow cycle counting and a usable capacity estimate.
+
+Both are fed one status sample at a time and keep only a handful of values,
+so they can run for years without looking at the recorded history again.
+
+Cycles are counted on the real state of charge (RSOC) with the streaming
+form of the ASTM E1049 rainflow algorithm. The reversals of the SoC (with a
+little hysteresis against jitter) go onto a stack. A range closed by a
+larger one counts as a full cycle of its depth, and a range at the bottom
+of the stack counts as a half cycle. The stack left over is the residue of
+cycles still open.
+
+The capacity is estimated by counting the battery's energy (the net charged
+energy from energy.py) over monotonic SoC swings. A swing runs from the
+first change of the SoC in one direction to the last one before it turns,
+and both ends sit on a SoC step, which keeps the integer SoC from skewing
+it. AC energy overstates the capacity while charging and understates it
+while discharging, so charge and discharge swings are averaged separately
+and combined.
+"""
+# SoC (%) the state of charge has to turn back by to count as a reversal
+HYSTERESIS = 2.0
+# cycle depth histogram: bins of this width (%)
+BIN_WIDTH = 10
+BINS = 100 // BIN_WIDTH
+# least SoC swing (%) a capacity estimate is taken from
+MIN_SWING = 20.0
+# weight of a new estimate in the running average
+ALPHA = 0.1
+# estimates outside these shares of the installed capacity are implausible
+PLAUSIBLE = (0.5, 1.3)
+
+
+class Degradation:
+    __slots__ = (
+        "histogram", "cycles", "estimates", "swings",
+        "_reversals", "_extreme", "_rising", "_soc", "_start", "_tick", "_charging",
+    )
+
+    def __init__(self) -> None:
+        # counted cycles per depth bin (0-10 %, 10-20 %, ...)
+        self.histogram = [0.0] * BINS
+        # equivalent full cycles (sum of depth x count)
+        self.cycles = 0.0
+        # "charge"/"discharge" -> capacity estimate (Wh) from such swings
+        self.estimates: dict[str, float] = {}
+        # swings estimated from
+        self.swings = 0
+        # rainflow: residue stack of reversals, and the turning point so far
+        self._reversals: list[float] = []
+        self._extreme: float | None = None
+        self._rising: bool | None = None
+        # capacity: SoC at the previous sample, (SoC, net energy) at the
+        # start of the swing and at its latest SoC step, its direction
+        self._soc: float | None = None
+        self._start: tuple[float, float] | None = None
+        self._tick: tuple[float, float] | None = None
+        self._charging: bool | None = None
+
+    def sample(self, soc: float, net: float, continuous: bool, installed: float | None) -> None:
+        """Account a sample: the real SoC (%), the net energy charged so far
+        (Wh), whether the energy counting went on without a gap since the
+        previous sample and the installed capacity (Wh)."""
+        self._rainflow(soc)
+        self._capacity(soc, net, continuous, installed)
+
+    ################
+    # rainflow
+    ################
+    def _rainflow(self, soc: float) -> None:
+        if self._extreme is None:
+            self._extreme = soc
+            self._push(soc)
+        elif self._rising is None:
+            if abs(soc - self._reversals[-1]) >= HYSTERESIS:
+                self._rising = soc > self._reversals[-1]
+                self._extreme = soc
+        elif (soc > self._extreme) == self._rising and soc != self._extreme:
+            self._extreme = soc
+        elif abs(self._extreme - soc) >= HYSTERESIS:
+            self._push(self._extreme)
+            self._rising = not self._rising
+            self._extreme = soc
+
+    def _push(self, reversal: float) -> None:
+        stack = self._reversals
+        stack.append(reversal)
+        while len(stack) >= 3:
+            latest = abs(stack[-1] - stack[-2])
+            previous = abs(stack[-2] - stack[-3])
+            if latest < previous:
+                break
+            if len(stack) == 3:
+                self._count(previous, 0.5)
+                del stack[0]
+            else:
+                self._count(previous, 1.0)
+                del stack[-3:-1]
+
+    def _count(self, depth: float, count: float) -> None:
+        self.histogram[min(int(depth // BIN_WIDTH), BINS - 1)] += count
+        self.cycles += count * depth / 100
+
+    ################
+    # capacity
+    ################
+    def _capacity(self, soc: float, net: float, continuous: bool, installed: float | None) -> None:
+        last, self._soc = self._soc, soc
+        if not continuous:
+            # energy is missing, the swing can't be counted
+            self._start = self._tick = self._charging = None
+            return
+        if last is None or soc == last:
+            return
+        charging = soc > last
+        if charging != self._charging:
+            self._close(installed)
+            self._start = (soc, net)
+            self._charging = charging
+        self._tick = (soc, net)
+
+    def _close(self, installed: float | None) -> None:
+        if self._start is None or self._tick is None:
+            return
+        swing = self._tick[0] - self._start[0]
+        if abs(swing) < MIN_SWING:
+            return
+        estimate = (self._tick[1] - self._start[1]) / (swing / 100)
+        if installed and not PLAUSIBLE[0] * installed <= estimate <= PLAUSIBLE[1] * installed:
+            return
+        kind = "charge" if swing > 0 else "discharge"
+        previous = self.estimates.get(kind)
+        self.estimates[kind] = estimate if previous is None else previous + ALPHA * (estimate - previous)
+        self.swings += 1
+
+    @property
+    def capacity(self) -> float | None:
+        """Estimated capacity (Wh)"""
+        if not self.estimates:
+            return None
+        return sum(self.estimates.values()) / len(self.estimates)
+
+    def state_of_health(self, installed: float | None) -> float | None:
+        """Estimated capacity in % of the installed one"""
+        capacity = self.capacity
+        if capacity is None or not installed:
+            return None
+        return round(100 * capacity / installed, 1)
+
+    def as_dict(self) -> dict:
+        return {
+            "histogram": {
+                f"{index * BIN_WIDTH}-{(index + 1) * BIN_WIDTH}": round(count, 1)
+                for index, count in enumerate(self.histogram)
+            },
+            "open_cycles": len(self._reversals),
+        }
+
+    def as_stored(self) -> dict:
+        return {
+            "histogram": self.histogram,
+            "cycles": self.cycles,
+            "estimates": self.estimates,
+            "swings": self.swings,
+            "reversals": self._reversals,
+            "extreme": self._extreme,
+            "rising": self._rising,
+        }
+
+    def restore(self, data: dict) -> None:
+        if len(histogram := data.get("histogram", ())) == BINS:
+            self.histogram = [float(count) for count in histogram]
+        self.cycles = float(data.get("cycles", 0.0))
+        self.estimates = {kind: float(value) for kind, value in data.get("estimates", {}).items()}
+        self.swings = int(data.get("swings", 0))
+        self._reversals = [float(soc) for soc in data.get("reversals", ())]
+        if self._reversals:
+            self._extreme = data.get("extreme")
+            self._rising = data.get("rising")
@@ -20,7 +20,7 @@ class SelectEntry(NamedTuple):
     type: Platform = None
     # the section where the value is found in the coordinator
     section: str = None
-    # the property name of the setting
+    # the attribute name of the setting in the section's model
     property: str = None
     # the unit of measurement (optional, for number entities)
     unit_of_measurement: str = None
@@ -38,7 +38,7 @@ class Tag(SelectEntry, Enum):
         key="select_operating_mode",
         type=Platform.SELECT,
         section="configurations",
-        property="EM_OperatingMode",
+        property="operating_mode",
         writable=True,
     )
 
@@ -46,7 +46,7 @@ class Tag(SelectEntry, Enum):
         key="number_charge",
         type=Platform.NUMBER,
         section="status",
-        property="Pac_total_W",
+        property="pac_total_w",
         unit_of_measurement="W",
         writable=True,
     )
@@ -55,7 +55,7 @@ class Tag(SelectEntry, Enum):
         key="number_discharge",
         type=Platform.NUMBER,
         section="status",
-        property="Pac_total_W",
+        property="pac_total_w",
         unit_of_measurement="W",
         writable=True,
     )
@@ -64,7 +64,7 @@ class Tag(SelectEntry, Enum):
         key="battery_reserve",
         type=Platform.NUMBER,
         section="status",
-        property="USOC",
+        property="usoc",
         writable=True,
     )
 
@@ -109,6 +109,14 @@ class SonnenBaseEntity(CoordinatorEntity[SonnenbatterieCoordinator], Entity):
             else self.entity_description.key
         )
 
+    @property
+    def available(self) -> bool:
+        # serve the last value until its section gets stale
+        description = self.entity_description
+        if not (super().available and self.coordinator.is_fresh(description.section, description.max_age)):
+            return False
+        return description.available_fn is None or description.available_fn(self.coordinator)
+
     @property
     def unique_id(self) -> str:
         key = self.entity_description.legacy_key or self.entity_description.key
@@ -136,6 +144,10 @@ class SonnenSelectEntity(CoordinatorEntity[SonnenbatterieCoordinator], Entity):
             else self.entity_description.key
         )
 
+    @property
+    def available(self) -> bool:
+        return super().available and self.coordinator.is_fresh(self.entity_description.tag.section)
+
     @property
     def unique_id(self) -> str:
         return f"{DOMAIN}_{self.coordinator.serial}_{self.entity_description.key}"
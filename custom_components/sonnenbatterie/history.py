@@ -0,0 +1,88 @@
+"""Recorded telemetry of a battery, read from Home Assistant's statistics.
+
+The sensors for Production_W, Consumption_W and GridFeedIn_W are
+measurements, so the recorder keeps their mean per 5 minutes (for about ten
+days by default) and per hour (for good). These means are exactly the
+equidistant power series the simulator needs - no state history has to be
+resampled. With the statistics import enabled, the hourly means are imported
+by the integration itself and read from there.
+"""
+from datetime import datetime
+
+import numpy as np
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import statistics_during_period
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .longterm import statistic_id
+from .simulator import Telemetry
+
+# statistics period -> its length in hours
+PERIODS = {"5minute": 5 / 60, "hour": 1.0}
+
+# keys (as in the unique ids) of the sensors holding the recorded values
+_PRODUCTION = "production_w"
+_CONSUMPTION = "consumption_w"
+_GRID = "state_grid_inout"
+
+
+def _local_minute(timestamp: float) -> int:
+    local = dt_util.as_local(dt_util.utc_from_timestamp(timestamp))
+    return local.hour * 60 + local.minute
+
+
+async def async_load_telemetry(
+    hass: HomeAssistant, serial: str, start: datetime, end: datetime, period: str
+) -> Telemetry:
+    registry = er.async_get(hass)
+    keys = (_PRODUCTION, _CONSUMPTION, _GRID)
+    entity_ids = {
+        key: registry.async_get_entity_id("sensor", DOMAIN, f"sensor.{DOMAIN}_{serial}_{key}")
+        for key in keys
+    }
+    # hourly statistics imported by the integration (see longterm.py)
+    imported_ids = {key: statistic_id(serial, key) for key in keys}
+
+    statistics = await get_instance(hass).async_add_executor_job(
+        statistics_during_period,
+        hass,
+        start,
+        end,
+        {entity_id for entity_id in entity_ids.values() if entity_id is not None} | set(imported_ids.values()),
+        period,
+        None,
+        {"mean"},
+    )
+
+    def _series(key: str) -> dict[float, float]:
+        series = {}
+        # where both exist, the imported statistics are the later ones
+        for source in (entity_ids[key], imported_ids[key]):
+            rows = statistics.get(source) or ()
+            series.update((row["start"], row["mean"]) for row in rows if row.get("mean") is not None)
+        return series
+
+    production = _series(_PRODUCTION)
+    consumption = _series(_CONSUMPTION)
+    grid = _series(_GRID)
+    # steps lacking production or consumption can't be replayed
+    starts = sorted(production.keys() & consumption.keys())
+    if not starts:
+        raise HomeAssistantError("No recorded statistics in the requested period")
+    step = PERIODS[period] * 3600
+    # a step that doesn't follow right after the previous one starts a run
+    breaks = np.concatenate(([False], np.diff(np.asarray(starts, dtype=float)) > 1.5 * step))
+    return Telemetry(
+        hours=PERIODS[period],
+        minutes=np.fromiter((_local_minute(start) for start in starts), dtype=np.int64, count=len(starts)),
+        # small negative production values at night
+        production=np.maximum(np.fromiter((production[start] for start in starts), dtype=float, count=len(starts)), 0.0),
+        consumption=np.fromiter((consumption[start] for start in starts), dtype=float, count=len(starts)),
+        grid_feed_in=np.fromiter((grid.get(start, np.nan) for start in starts), dtype=float, count=len(starts)),
+        breaks=breaks,
+        expected=max(1, int((end - start).total_seconds() // step)),
+    )
@@ -0,0 +1,129 @@
+"""Energy KPIs over today, the last 24 hours and the last 7 days.
+
+The KPIs are maintained from the energy counters (see energy.py), one step
+per poll. The energy since the previous poll goes into the current
+15-minute bucket and into a running sum per window. Buckets that drop out of
+a rolling window are subtracted again. A KPI is a few divisions of these
+sums, so nothing is ever recomputed from the recorded history.
+"""
+from collections import deque
+
+from homeassistant.util import dt as dt_util
+
+from .energy import COUNTERS
+
+# s per bucket of the rolling windows
+BUCKET = 900
+# rolling window -> its span (s)
+ROLLING = {"24h": 86400, "7d": 7 * 86400}
+WINDOWS = ("today", *ROLLING)
+KPIS = ("autarky", "self_consumption", "throughput", "efficiency")
+# least energy charged (Wh) for the round-trip efficiency to mean anything
+MIN_EFFICIENCY_CHARGE = 500.0
+
+_INDEX = {counter: index for index, counter in enumerate(COUNTERS)}
+
+
+class _Rolling:
+    __slots__ = ("span", "buckets", "sums")
+
+    def __init__(self, span: float) -> None:
+        self.span = span
+        # [bucket start, energy per counter (Wh)], oldest first
+        self.buckets: deque[list] = deque()
+        self.sums = [0.0] * len(COUNTERS)
+
+    def add(self, start: float, deltas: list[float]) -> None:
+        if self.buckets and self.buckets[-1][0] == start:
+            bucket = self.buckets[-1][1]
+            for index, delta in enumerate(deltas):
+                bucket[index] += delta
+        else:
+            self.buckets.append([start, list(deltas)])
+        for index, delta in enumerate(deltas):
+            self.sums[index] += delta
+
+    def evict(self, now: float) -> None:
+        while self.buckets and self.buckets[0][0] + BUCKET <= now - self.span:
+            for index, energy in enumerate(self.buckets.popleft()[1]):
+                self.sums[index] -= energy
+        if not self.buckets:
+            # no rounding residue left behind
+            self.sums = [0.0] * len(COUNTERS)
+
+
+class KpiEngine:
+    __slots__ = ("_last", "_day", "_today", "_rolling")
+
+    def __init__(self) -> None:
+        # counter totals (Wh) at the previous sample
+        self._last: list[float] | None = None
+        # the local date "today" refers to
+        self._day: str | None = None
+        self._today = [0.0] * len(COUNTERS)
+        self._rolling = {name: _Rolling(span) for name, span in ROLLING.items()}
+
+    def sample(self, totals: dict[str, float], at: float) -> None:
+        """Account the energy counted since the previous sample."""
+        current = [totals[counter] for counter in COUNTERS]
+        last, self._last = self._last, current
+        day = dt_util.as_local(dt_util.utc_from_timestamp(at)).date().isoformat()
+        if day != self._day:
+            self._day = day
+            self._today = [0.0] * len(COUNTERS)
+        for rolling in self._rolling.values():
+            rolling.evict(at)
+        if last is None:
+            return
+        deltas = [now - before for now, before in zip(current, last)]
+        if not any(deltas):
+            return
+        for index, delta in enumerate(deltas):
+            self._today[index] += delta
+        start = at // BUCKET * BUCKET
+        for rolling in self._rolling.values():
+            rolling.add(start, deltas)
+
+    def energy(self, window: str, counter: str) -> float:
+        """Energy (Wh) of a counter in the window."""
+        sums = self._today if window == "today" else self._rolling[window].sums
+        return max(sums[_INDEX[counter]], 0.0)
+
+    def value(self, kpi: str, window: str) -> float | None:
+        def energy(counter: str) -> float:
+            return self.energy(window, counter)
+
+        match kpi:
+            case "autarky":
+                # share of the consumption not drawn from the grid
+                if (consumption := energy("consumption")) <= 0:
+                    return None
+                return round(100 * max(0.0, 1 - energy("grid_import") / consumption), 1)
+            case "self_consumption":
+                # share of the production not fed into the grid
+                if (production := energy("production")) <= 0:
+                    return None
+                return round(100 * max(0.0, 1 - energy("grid_export") / production), 1)
+            case "throughput":
+                return round(energy("battery_discharge") / 1000, 2)
+            case "efficiency":
+                if (charged := energy("battery_charge")) < MIN_EFFICIENCY_CHARGE:
+                    return None
+                return round(100 * energy("battery_discharge") / charged, 1)
+        raise ValueError(f"unknown KPI {kpi!r}")
+
+    def as_stored(self) -> dict:
+        return {
+            "day": self._day,
+            "today": self._today,
+            "rolling": {name: list(rolling.buckets) for name, rolling in self._rolling.items()},
+        }
+
+    def restore(self, data: dict) -> None:
+        self._day = data.get("day")
+        if len(today := data.get("today", ())) == len(COUNTERS):
+            self._today = [float(energy) for energy in today]
+        for name, rolling in self._rolling.items():
+            for start, energies in data.get("rolling", {}).get(name, ()):
+                if len(energies) == len(COUNTERS):
+                    rolling.add(start, energies)
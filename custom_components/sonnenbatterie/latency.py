@@ -0,0 +1,111 @@
+"""End-to-end latency of the commands sent to the battery.
+
+Every write is timestamped when it's queued (waiting for io_lock), sent and
+acknowledged by the battery; commands with a visible effect (see
+Command.effect) additionally when the first poll shows it - e.g. Pac_total_W
+reaching a charge setpoint. The stages are kept per operation as bounded
+series of the most recent writes, so the distributions are always at hand
+instead of having to be correlated from log timestamps.
+
+The effect time is only as precise as the poll interval: it's the time the
+first status showing the effect was fetched.
+"""
+from collections import deque
+from typing import Any, Callable, NamedTuple
+
+from .snapshot import Snapshot
+
+# writes kept per operation
+HISTORY = 100
+# a command whose effect didn't show within this (s) counts as without effect
+EFFECT_TIMEOUT = 600.0
+
+STAGES = ("queue", "round_trip", "effect", "total")
+
+
+class _Pending(NamedTuple):
+    name: str
+    queued: float
+    acked: float
+    effect: Callable[[Snapshot], bool]
+
+
+def _percentile(ordered: list[float], share: float) -> float:
+    # nearest rank
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+class LatencyTracker:
+    __slots__ = ("_series", "_pending", "_without_effect")
+
+    def __init__(self) -> None:
+        # operation -> stage -> the latest durations (s)
+        self._series: dict[str, dict[str, deque[float]]] = {}
+        # per kind of effect, the latest command still waiting for it
+        self._pending: dict[str, _Pending] = {}
+        self._without_effect: dict[str, int] = {}
+
+    def _record(self, name: str, stage: str, duration: float) -> None:
+        stages = self._series.setdefault(name, {stage: deque(maxlen=HISTORY) for stage in STAGES})
+        stages[stage].append(duration)
+
+    def acknowledged(
+        self,
+        name: str,
+        queued: float,
+        sent: float,
+        acked: float,
+        effect: tuple[str, Callable[[Snapshot], bool]] | None,
+    ) -> None:
+        """Account a write the battery has answered. `effect` is the kind of
+        effect and the check whether a snapshot shows it."""
+        self._record(name, "queue", sent - queued)
+        self._record(name, "round_trip", acked - sent)
+        if effect is not None:
+            kind, check = effect
+            # a newer command of the same kind supersedes the pending one
+            self._pending[kind] = _Pending(name, queued, acked, check)
+
+    def sample(self, snapshot: Snapshot, fetched_at: float) -> None:
+        """Check the pending commands against a fresh status sample."""
+        for kind, pending in tuple(self._pending.items()):
+            if fetched_at <= pending.acked:
+                continue
+            if pending.effect(snapshot):
+                self._record(pending.name, "effect", fetched_at - pending.acked)
+                self._record(pending.name, "total", fetched_at - pending.queued)
+            elif fetched_at - pending.acked > EFFECT_TIMEOUT:
+                self._without_effect[pending.name] = self._without_effect.get(pending.name, 0) + 1
+            else:
+                continue
+            del self._pending[kind]
+
+    def median(self, stage: str, names: tuple[str, ...] | None = None) -> float | None:
+        """Median of a stage over the given (default: all) operations."""
+        values = sorted(
+            value
+            for name, stages in self._series.items()
+            if names is None or name in names
+            for value in stages[stage]
+        )
+        return round(_percentile(values, 0.5), 3) if values else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Per operation and stage: count, median, 90th percentile and max (s)."""
+        result = {}
+        for name, stages in self._series.items():
+            summary = {}
+            for stage, series in stages.items():
+                if not series:
+                    continue
+                ordered = sorted(series)
+                summary[stage] = {
+                    "count": len(ordered),
+                    "p50": round(_percentile(ordered, 0.5), 3),
+                    "p90": round(_percentile(ordered, 0.9), 3),
+                    "max": round(ordered[-1], 3),
+                }
+            if name in self._without_effect:
+                summary["without_effect"] = self._without_effect[name]
+            result[name] = summary
+        return result
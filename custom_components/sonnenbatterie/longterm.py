@@ -0,0 +1,177 @@
+"""Long-term statistics of the high-rate sensors, imported by the integration.
+
+At short poll intervals the power, voltage and current sensors change on
+every poll, and the recorder derives their statistics from all those state
+rows. With the statistics import enabled, these sensors lose their state
+class, and the samples are aggregated in memory instead: per sensor and hour,
+the mean, minimum and maximum. Once an hour ends, all of its rows go to the
+recorder in one batch as external statistics ("sonnenbatterie:<serial>_<key>"),
+which the statistics graph card shows like any other.
+
+The recorder only accepts whole hours for imported statistics, so there is
+no 5-minute resolution. When the entry is unloaded or Home Assistant stops,
+the hour in progress is imported as far as it goes and its buckets are kept,
+so after a restart within the same hour they are continued rather than
+overwritten.
+"""
+import re
+from datetime import datetime
+from typing import Iterable
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMeanType, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    STATISTIC_UNIT_TO_UNIT_CONVERTER,
+    async_add_external_statistics,
+)
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import SonnenbatterieCoordinator
+from .sensor_list import SonnenbatterieSensorEntityDescription
+from .snapshot import Snapshot
+
+STORAGE_VERSION = 1
+
+# the sensors changing (nearly) every poll
+HIGH_RATE_CLASSES = (SensorDeviceClass.POWER, SensorDeviceClass.VOLTAGE, SensorDeviceClass.CURRENT)
+
+
+def is_high_rate(description: SonnenbatterieSensorEntityDescription) -> bool:
+    return description.state_class == SensorStateClass.MEASUREMENT and description.device_class in HIGH_RATE_CLASSES
+
+
+def statistic_key(description: SonnenbatterieSensorEntityDescription) -> str:
+    """The sensor's key as in its unique id"""
+    return description.legacy_key or description.key
+
+
+def statistic_id(serial: str, key: str) -> str:
+    """The external statistic id; only [a-z0-9_] is valid after the colon
+    (the serial may be e.g. "sru-unknown")."""
+    object_id = re.sub(r"[^a-z0-9_]", "_", f"{serial}_{key}".lower())
+    return f"{DOMAIN}:{re.sub(r'_+', '_', object_id).strip('_')}"
+
+
+class StatisticsImporter:
+    """Aggregates the samples of the high-rate sensors into hourly statistics"""
+
+    def __init__(self, hass: HomeAssistant, coordinator: SonnenbatterieCoordinator, config_entry: ConfigEntry) -> None:
+        self._hass = hass
+        self._coordinator = coordinator
+        # the buckets of the hour in progress at the last shutdown
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.statistics")
+        # unique id key -> description
+        self._descriptions: dict[str, SonnenbatterieSensorEntityDescription] = {}
+        # start (UTC timestamp) of the hour being aggregated
+        self._hour: float | None = None
+        # key -> [sum, count, min, max] of the hour's samples
+        self._buckets: dict[str, list[float]] = {}
+        # section -> fetch time of the last sample taken from it
+        self._sampled: dict[str, float] = {}
+        # removes the stop listener until it has fired
+        self._unsub_stop: CALLBACK_TYPE | None = None
+
+    def add(self, descriptions: Iterable[SonnenbatterieSensorEntityDescription]) -> None:
+        for description in descriptions:
+            if is_high_rate(description):
+                self._descriptions[statistic_key(description)] = description
+
+    async def async_load(self) -> None:
+        """Continue the hour in progress before the restart, if it still is."""
+        data = await self._store.async_load() or {}
+        if data.get("hour") == dt_util.utcnow().timestamp() // 3600 * 3600:
+            self._hour = data["hour"]
+            self._buckets = {key: list(bucket) for key, bucket in data.get("buckets", {}).items()}
+
+    @callback
+    def async_listen_stop(self) -> CALLBACK_TYPE:
+        """Keep the hour in progress when Home Assistant stops or the entry
+        is unloaded, whichever comes first. Returns the unload callback."""
+        self._unsub_stop = self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+        return self._async_unload
+
+    @callback
+    def _async_stop(self, _event: Event) -> None:
+        # a once-listener is removed when it fires
+        self._unsub_stop = None
+        self.async_shutdown()
+
+    @callback
+    def _async_unload(self) -> None:
+        if self._unsub_stop is None:
+            # kept on the stop already
+            return
+        self._unsub_stop()
+        self._unsub_stop = None
+        self.async_shutdown()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Import the hour in progress as far as it goes, and keep it."""
+        if self._hour is None or not self._buckets:
+            return
+        self._flush()
+        data = {"hour": self._hour, "buckets": {key: list(bucket) for key, bucket in self._buckets.items()}}
+        # written on the final write at the latest
+        self._store.async_delay_save(lambda: data, 0)
+
+    @callback
+    def sample(self, snapshot: Snapshot) -> None:
+        # only sections fetched since the last sample - a value served from
+        # an older fetch would be counted twice
+        fresh = {}
+        for section, meta in snapshot.meta.items():
+            if meta.fetched_at is not None and meta.fetched_at != self._sampled.get(section):
+                fresh[section] = meta.fetched_at
+        if not fresh:
+            return
+        self._sampled.update(fresh)
+        hour = max(fresh.values()) // 3600 * 3600
+        if self._hour != hour:
+            if self._hour is not None and self._hour < hour:
+                self._flush()
+            self._hour = hour
+            self._buckets.clear()
+
+        for key, description in self._descriptions.items():
+            if description.section not in fresh:
+                continue
+            value = description.value_fn(self._coordinator)
+            if not isinstance(value, (int, float)):
+                continue
+            if (bucket := self._buckets.get(key)) is None:
+                self._buckets[key] = [value, 1, value, value]
+            else:
+                bucket[0] += value
+                bucket[1] += 1
+                bucket[2] = min(bucket[2], value)
+                bucket[3] = max(bucket[3], value)
+
+    def _flush(self) -> None:
+        """Hand the hour's rows over to the recorder."""
+        start: datetime = dt_util.utc_from_timestamp(self._hour)
+        for key, (total, count, minimum, maximum) in self._buckets.items():
+            if (description := self._descriptions.get(key)) is None:
+                # restored for a sensor that isn't set up (yet)
+                continue
+            unit = description.native_unit_of_measurement
+            converter = STATISTIC_UNIT_TO_UNIT_CONVERTER.get(unit)
+            metadata = StatisticMetaData(
+                mean_type=StatisticMeanType.ARITHMETIC,
+                has_sum=False,
+                name=f"{DOMAIN} {self._coordinator.serial} {key}",
+                source=DOMAIN,
+                statistic_id=statistic_id(self._coordinator.serial, key),
+                unit_class=converter.UNIT_CLASS if converter is not None else None,
+                unit_of_measurement=unit,
+            )
+            async_add_external_statistics(
+                self._hass,
+                metadata,
+                [StatisticData(start=start, mean=total / count, min=minimum, max=maximum)],
+            )
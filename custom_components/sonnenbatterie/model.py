@@ -0,0 +1,340 @@
+"""Compact, typed model of the values the integration actually uses.
+
+The battery's endpoints return large JSON trees (latestdata and battery_system
+alone are several KB), but the entities only read a few dozen scalars from
+them. Each section is parsed ONCE when it is fetched into a slotted, frozen
+object holding just those values; entities then read plain attributes.
+Sections that haven't been fetched (yet) are represented by their EMPTY
+instance, whose fields are all None.
+"""
+from dataclasses import dataclass, fields
+from types import MappingProxyType
+from typing import Any, Mapping
+
+
+def _dig(data: Any, *keys):
+    """Walk nested dicts, returning None as soon as a level is missing."""
+    for key in keys:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class _Section:
+    """Common helpers of the section models."""
+    __slots__ = ()
+
+    @classmethod
+    def empty(cls):
+        return cls(**{f.name: None for f in fields(cls)})
+
+
+@dataclass(frozen=True, slots=True)
+class StatusData(_Section):
+    """/api/v1/status"""
+    consumption_w: float | None
+    consumption_avg: float | None
+    production_w: float | None
+    grid_feed_in_w: float | None
+    pac_total_w: float | None
+    rsoc: float | None
+    usoc: float | None
+    system_status: str | None
+    operating_mode: str | None
+    battery_charging: bool | None
+    battery_discharging: bool | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "StatusData":
+        return cls(
+            consumption_w=data.get("Consumption_W"),
+            consumption_avg=data.get("Consumption_Avg"),
+            production_w=data.get("Production_W"),
+            grid_feed_in_w=data.get("GridFeedIn_W"),
+            pac_total_w=data.get("Pac_total_W"),
+            rsoc=data.get("RSOC"),
+            usoc=data.get("USOC"),
+            system_status=data.get("SystemStatus"),
+            operating_mode=data.get("OperatingMode"),
+            battery_charging=data.get("BatteryCharging"),
+            battery_discharging=data.get("BatteryDischarging"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class InverterData(_Section):
+    """/api/v1/inverter"""
+    fac: float | None
+    ipv: float | None
+    ipv2: float | None
+    ppv: float | None
+    ppv2: float | None
+    upv: float | None
+    upv2: float | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "InverterData":
+        status = _dig(data, "status") or {}
+        return cls(
+            fac=status.get("fac") or _dig(status, "status", "fac"),
+            ipv=status.get("ipv"),
+            ipv2=status.get("ipv2"),
+            ppv=status.get("ppv"),
+            ppv2=status.get("ppv2"),
+            upv=status.get("upv"),
+            upv2=status.get("upv2"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryData(_Section):
+    """/api/v1/battery"""
+    cyclecount: int | None
+    stateofhealth: float | None
+    minimum_cell_temperature: float | None
+    maximum_cell_temperature: float | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "BatteryData":
+        status = _dig(data, "measurements", "battery_status") or {}
+        return cls(
+            cyclecount=status.get("cyclecount"),
+            stateofhealth=status.get("stateofhealth"),
+            minimum_cell_temperature=status.get("minimumcelltemperature"),
+            maximum_cell_temperature=status.get("maximumcelltemperature"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class BatterySystemData(_Section):
+    """/api/battery_system"""
+    storage_capacity_per_module: int | None
+    modules: int | None
+    inverter_capacity: int | None
+    software_version: str | None
+    firmware_version: str | None
+    hardware_version: str | None
+    grid_fac: float | None
+    grid_ipv: float | None
+    grid_ppv: float | None
+    grid_upv: float | None
+    grid_tmax: float | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "BatterySystemData":
+        system = _dig(data, "battery_system", "system") or {}
+        software = _dig(data, "battery_system", "software") or {}
+        grid = _dig(data, "grid_information") or {}
+        return cls(
+            storage_capacity_per_module=system.get("storage_capacity_per_module"),
+            modules=data.get("modules"),
+            inverter_capacity=system.get("inverter_capacity"),
+            software_version=software.get("software_version"),
+            firmware_version=software.get("firmware_version"),
+            hardware_version=system.get("hardware_version"),
+            grid_fac=grid.get("fac"),
+            grid_ipv=grid.get("ipv"),
+            grid_ppv=grid.get("ppv"),
+            grid_upv=grid.get("upv"),
+            grid_tmax=grid.get("tmax"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SystemData(_Section):
+    """/api/system_data"""
+    article_name: str | None
+    software_version: str | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "SystemData":
+        return cls(
+            article_name=data.get("ERP_ArticleName"),
+            software_version=data.get("software_version"),
+        )
+
+
+# configuration item -> ConfigurationsData field
+CONFIGURATION_FIELDS = {
+    "EM_OperatingMode": "operating_mode",
+    "EM_USOC": "usoc",
+    "EM_ToU_Schedule": "tou_schedule",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigurationsData(_Section):
+    """/api/v2/configurations"""
+    operating_mode: str | None
+    usoc: str | None
+    tou_schedule: str | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "ConfigurationsData":
+        return cls(**{name: data.get(item) for item, name in CONFIGURATION_FIELDS.items()})
+
+
+@dataclass(frozen=True, slots=True)
+class ApiConfigurationData(_Section):
+    """/api/configuration"""
+    read_active: bool | None
+    write_active: bool | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "ApiConfigurationData":
+        return cls(
+            read_active=data.get("IN_LocalAPIReadActive", "0") == "1",
+            write_active=data.get("IN_LocalAPIWriteActive", "0") == "1",
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class LatestData(_Section):
+    """/api/v2/latestdata - only the fault flags of ic_status"""
+    inverter_over_temperature: bool | None
+    critical_bms_alarm: bool | None
+    hw_shutdown: bool | None
+    grid_abnormal: bool | None
+    grid_detached: bool | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "LatestData":
+        shutdown = _dig(data, "ic_status", "DC Shutdown Reason") or {}
+        droop = _dig(data, "ic_status", "Droop mode status") or {}
+        return cls(
+            inverter_over_temperature=shutdown.get("Inverter Over Temperature"),
+            critical_bms_alarm=shutdown.get("Critical BMS Alarm"),
+            hw_shutdown=shutdown.get("HW_Shutdown"),
+            grid_abnormal=droop.get("Grid abnormal"),
+            grid_detached=droop.get("Grid detached"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CommissioningSettingsData(_Section):
+    """/api/commissioning_settings"""
+    tou_max_power_limit: int | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "CommissioningSettingsData":
+        return cls(tou_max_power_limit=_dig(data, "data", "attributes", "tou_max_power_limit"))
+
+
+@dataclass(frozen=True, slots=True)
+class V2StatusData(_Section):
+    """/api/v2/status"""
+    discharge_not_allowed: bool | None
+    backup_buffer: str | None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "V2StatusData":
+        return cls(
+            discharge_not_allowed=data.get("dischargeNotAllowed"),
+            backup_buffer=data.get("BackupBuffer"),
+        )
+
+
+# the powermeter values we create sensors for
+POWERMETER_VALUES = (
+    "a_l1",
+    "a_l2",
+    "a_l3",
+    "v_l1_l2",
+    "v_l1_n",
+    "v_l2_l3",
+    "v_l2_n",
+    "v_l3_l1",
+    "v_l3_n",
+    "w_l1",
+    "w_l2",
+    "w_l3",
+    "w_total",
+)
+
+
+# (direction, deviceid, channel) - identifies a meter independent of its
+# position in the payload, which isn't stable across cycles
+PowermeterKey = tuple[str, int, int]
+
+
+@dataclass(frozen=True, slots=True)
+class PowermeterReading:
+    """One meter of /api/v1/powermeter"""
+    direction: str
+    deviceid: int
+    channel: int
+    a_l1: float | None = None
+    a_l2: float | None = None
+    a_l3: float | None = None
+    v_l1_l2: float | None = None
+    v_l1_n: float | None = None
+    v_l2_l3: float | None = None
+    v_l2_n: float | None = None
+    v_l3_l1: float | None = None
+    v_l3_n: float | None = None
+    w_l1: float | None = None
+    w_l2: float | None = None
+    w_l3: float | None = None
+    w_total: float | None = None
+
+    @classmethod
+    def from_payload(cls, data: dict) -> "PowermeterReading":
+        return cls(
+            direction=data.get("direction"),
+            deviceid=data.get("deviceid"),
+            channel=data.get("channel"),
+            **{name: data.get(name) for name in POWERMETER_VALUES},
+        )
+
+    @property
+    def key(self) -> PowermeterKey:
+        return self.direction, self.deviceid, self.channel
+
+
+def parse_powermeter(data: list) -> Mapping[PowermeterKey, PowermeterReading]:
+    """Index the meters by their key, so readers don't depend on the order."""
+    readings = (PowermeterReading.from_payload(meter) for meter in data or ())
+    return MappingProxyType({reading.key: reading for reading in readings})
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryInfo(_Section):
+    """Values derived from status and battery_system"""
+    current_state: str | None
+    total_installed_capacity: int | None
+    reserved_capacity: int | None
+    remaining_capacity: float | None
+    remaining_capacity_usable: int | None
+
+
+# section name -> parser of its (normalized) payload
+PARSERS = {
+    "status": StatusData.from_payload,
+    "inverter": InverterData.from_payload,
+    "battery": BatteryData.from_payload,
+    "battery_system": BatterySystemData.from_payload,
+    "system_data": SystemData.from_payload,
+    "configurations": ConfigurationsData.from_payload,
+    "api_configuration": ApiConfigurationData.from_payload,
+    "latestdata": LatestData.from_payload,
+    "commissioning_settings": CommissioningSettingsData.from_payload,
+    "v2_status": V2StatusData.from_payload,
+    "powermeter": parse_powermeter,
+}
+
+# section name -> value representing "not fetched"
+EMPTY = {
+    "status": StatusData.empty(),
+    "inverter": InverterData.empty(),
+    "battery": BatteryData.empty(),
+    "battery_system": BatterySystemData.empty(),
+    "system_data": SystemData.empty(),
+    "configurations": ConfigurationsData.empty(),
+    "api_configuration": ApiConfigurationData.empty(),
+    "latestdata": LatestData.empty(),
+    "commissioning_settings": CommissioningSettingsData.empty(),
+    "v2_status": V2StatusData.empty(),
+    "powermeter": MappingProxyType({}),
+    "battery_info": BatteryInfo.empty(),
+}
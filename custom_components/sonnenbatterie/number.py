@@ -14,7 +14,7 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
     # await coordinator.async_refresh()
 
-    if coordinator.latestData.get('api_configuration',{}).get('IN_LocalAPIWriteActive', '0') == '1':
+    if coordinator.snapshot.api_configuration.write_active:
 
         max_power = int(hass.data[DOMAIN][config_entry.entry_id][CONF_INVERTER_MAX])
         entities = []
@@ -42,14 +42,23 @@ class SonnenbatterieNumber(SonnenNumberEntity, NumberEntity):
     def native_max_value(self) -> int:
         return self._max_power
 
+    @property
+    def native_value(self) -> int:
+        # the charge/discharge target as commanded last - by this entity, a
+        # service, the grid controller or the setpoint schedule
+        if (commanded := self.coordinator.commanded_setpoint(self.entity_description.tag.key)) is not None:
+            return commanded
+        return self._attr_native_value
+
     async def async_set_native_value(self, value):
         LOGGER.debug(f"NUMBER - async_set_native_value: {value} - {type(value)}")
         tag = self.entity_description.tag
         if tag.writable:
-            # Robust write: serialized (single-request webserver), session-safe
-            # (ensures a session / uses the static Auth-Token), retried once on a
-            # transient 401/timeout, then a LIGHT refresh (external controllers
-            # write every few seconds; a full refresh per write overloads it).
+            # Robust write through the coordinator's command pipeline: serialized
+            # (single-request webserver), session-safe (ensures a session / uses
+            # the static Auth-Token), retried once on a transient 401/timeout,
+            # read back by the shared debounced verification (external
+            # controllers write every few seconds).
             await self.coordinator.async_write_setpoint(tag.key, value)
             # Optimistic state: the sonnen charge/discharge setpoint is WRITE-ONLY
             # (the API has no read-back of the current target), so without this the
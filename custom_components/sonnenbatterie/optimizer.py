@@ -0,0 +1,157 @@
+"""Price-driven time-of-use schedule optimizer.
+
+Finds the slots of a tariff horizon in which charging the battery from the
+grid minimizes the energy cost. Outside of those slots the battery works in
+self-consumption: PV surplus charges it, demand is covered from it down to the
+backup reserve - which is what the battery does outside of its TOU windows.
+
+The search is a backward dynamic program over a grid of states of charge. Each
+step evaluates both actions (self-consumption / grid charging) for ALL states
+at once with NumPy, so a day of quarter-hour slots takes milliseconds instead
+of the seconds a per-state Python loop needs.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .battery import grid_charge, self_consumption
+from .tou import TouSchedule, TouWindow
+
+# resolution of the state-of-charge grid (0.5 % steps)
+SOC_STEPS = 201
+# TOU windows are times of day, repeated daily - a plan can't be longer
+MAX_HORIZON = timedelta(hours=24)
+
+_IDLE = 0
+_CHARGE = 1
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryParams:
+    """What the optimizer needs to know about the battery"""
+    # usable capacity (Wh) - total installed minus the internally reserved part
+    capacity: float
+    # current usable state of charge (%)
+    usoc: float
+    # backup reserve the battery doesn't discharge below (%)
+    reserve: float
+    # inverter limit (W)
+    max_power: float
+    # limit of the power drawn from the grid while charging (W), threshold_p_max
+    grid_limit: float
+    # one-way charge/discharge efficiency
+    efficiency: float = 0.95
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    start: datetime
+    slot: timedelta
+    # per slot: charge from the grid?
+    charge: np.ndarray
+    # per slot: state of charge (%) at its end
+    usoc: np.ndarray
+    # per slot: energy drawn from (> 0) or fed into (< 0) the grid (Wh)
+    grid: np.ndarray
+    cost: float
+    # cost without any grid charging (plain self-consumption)
+    baseline_cost: float
+
+    def windows(self) -> list[tuple[datetime, datetime]]:
+        """The contiguous runs of charging slots."""
+        edges = np.diff(np.concatenate(([0], self.charge.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        return [(self.start + self.slot * int(a), self.start + self.slot * int(b)) for a, b in zip(starts, stops)]
+
+    def schedule(self, threshold_p_max: int) -> TouSchedule:
+        return TouSchedule.from_windows(
+            TouWindow.create(start.time(), stop.time(), threshold_p_max) for start, stop in self.windows()
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "start": self.start.isoformat(),
+            "slot_minutes": int(self.slot.total_seconds() // 60),
+            "expected_cost": round(self.cost, 4),
+            "baseline_cost": round(self.baseline_cost, 4),
+            "usoc": [round(float(value), 1) for value in self.usoc],
+            "grid_wh": [round(float(value)) for value in self.grid],
+        }
+
+
+def _step(soc, net, params: BatteryParams, hours: float):
+    """Next state of charge and grid energy for both actions.
+
+    `soc` holds states of charge in Wh (any shape), `net` the PV surplus of
+    the slot in Wh (negative: demand). Returns arrays of shape (2,) + soc.shape
+    indexed by action.
+    """
+    max_energy = params.max_power * hours
+    idle = self_consumption(
+        soc, net, params.capacity, params.capacity * params.reserve / 100.0, max_energy, params.efficiency
+    )
+    charge = grid_charge(soc, net, params.capacity, params.grid_limit * hours, max_energy, params.efficiency)
+    return np.stack((idle.soc, charge.soc)), np.stack((idle.grid, charge.grid))
+
+
+def _costs(grid, price: float, feed_in_price: float):
+    return np.where(grid > 0, grid * price, grid * feed_in_price) / 1000.0
+
+
+def optimize(
+    prices,
+    params: BatteryParams,
+    start: datetime,
+    slot: timedelta,
+    load=None,
+    pv=None,
+    feed_in_price: float = 0.0,
+) -> Plan:
+    """Plan the grid charging for the tariff `prices` (per kWh, one per slot
+    beginning at `start`). `load` and `pv` are forecasts of the mean power
+    (W) per slot; without them only the tariff decides."""
+    slots = min(len(prices), int(MAX_HORIZON / slot))
+    if slots == 0:
+        raise ValueError("no prices given")
+    prices = np.asarray(prices[:slots], dtype=float)
+    hours = slot.total_seconds() / 3600.0
+    load = np.zeros(slots) if load is None else np.resize(np.asarray(load, dtype=float), slots)
+    pv = np.zeros(slots) if pv is None else np.resize(np.asarray(pv, dtype=float), slots)
+    net = (pv - load) * hours
+
+    grid_soc = np.linspace(0.0, params.capacity, SOC_STEPS)
+    # energy left at the end is worth what it'd cost at least to buy it -
+    # never worth buying just to have it at the end, but not worth dumping
+    value = -grid_soc * prices.min() * params.efficiency / 1000.0
+    values = np.empty((slots + 1, SOC_STEPS))
+    values[slots] = value
+    for t in range(slots - 1, -1, -1):
+        next_soc, grid = _step(grid_soc, net[t], params, hours)
+        total = _costs(grid, prices[t], feed_in_price) + np.interp(next_soc, grid_soc, values[t + 1])
+        values[t] = total.min(axis=0)
+
+    def _run(policy) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        soc = params.capacity * params.usoc / 100.0
+        actions = np.zeros(slots, dtype=bool)
+        socs = np.empty(slots)
+        grids = np.empty(slots)
+        cost = 0.0
+        for t in range(slots):
+            next_soc, grid = _step(np.asarray(soc), net[t], params, hours)
+            costs = _costs(grid, prices[t], feed_in_price)
+            action = policy(t, next_soc, costs)
+            actions[t] = action == _CHARGE
+            soc = float(next_soc[action])
+            socs[t] = soc
+            grids[t] = float(grid[action])
+            cost += float(costs[action])
+        return actions, socs / params.capacity * 100.0, grids, cost
+
+    def _optimal(t, next_soc, costs):
+        return int(np.argmin(costs + np.interp(next_soc, grid_soc, values[t + 1])))
+
+    charge, usoc, grid, cost = _run(_optimal)
+    _, _, _, baseline_cost = _run(lambda t, next_soc, costs: _IDLE)
+    return Plan(start, slot, charge, usoc, grid, cost, baseline_cost)
@@ -0,0 +1,88 @@
+"""Time until the battery is full or down to its backup reserve.
+
+The rate of change of the state of charge is estimated over a ring of the
+samples of the last 15 minutes. A least-squares line through the (time,
+USOC) points is used where the SoC has moved enough over the window for
+its integer steps not to matter. Otherwise the rate comes from the mean
+battery power over the window and the capacity per percent. The regression
+sums are updated as samples enter and leave the ring, so nothing is
+recomputed per poll.
+
+USOC rather than RSOC: the backup reserve (EM_USOC) is given in USOC.
+"""
+from collections import deque
+
+# s of samples the rate is estimated from
+WINDOW = 900.0
+# least SoC change (%) over the window for the regression to be used
+MIN_CHANGE = 2.0
+# the regression sums are re-based after this (s) to keep them precise
+REBASE_AFTER = 86400.0
+
+
+class SocPredictor:
+    __slots__ = ("_samples", "_origin", "_n", "_sx", "_sy", "_sxx", "_sxy", "_power")
+
+    def __init__(self) -> None:
+        # (time, usoc, Pac_total_W), oldest first
+        self._samples: deque[tuple[float, float, float]] = deque()
+        self._origin = 0.0
+        # regression sums over (time - origin, usoc), and the sum of the powers
+        self._n = 0
+        self._sx = self._sy = self._sxx = self._sxy = self._power = 0.0
+
+    def _account(self, sample: tuple[float, float, float], sign: int) -> None:
+        at, usoc, power = sample
+        x = at - self._origin
+        self._n += sign
+        self._sx += sign * x
+        self._sy += sign * usoc
+        self._sxx += sign * x * x
+        self._sxy += sign * x * usoc
+        self._power += sign * power
+
+    def sample(self, usoc: float, power: float, at: float) -> None:
+        """Add a sample: USOC (%), Pac_total_W (W, > 0: discharging) and the
+        time it was fetched."""
+        if self._samples and at <= self._samples[-1][0]:
+            return
+        if at - self._origin > REBASE_AFTER:
+            self._origin = at
+            self._n = 0
+            self._sx = self._sy = self._sxx = self._sxy = self._power = 0.0
+            for old in self._samples:
+                self._account(old, 1)
+        sample = (at, usoc, power)
+        self._samples.append(sample)
+        self._account(sample, 1)
+        while self._samples[0][0] < at - WINDOW:
+            self._account(self._samples.popleft(), -1)
+
+    def rate(self, wh_per_percent: float | None) -> tuple[float, str] | None:
+        """SoC change (%/h, > 0: charging) and how it was estimated."""
+        n = self._n
+        if n >= 3:
+            span = self._samples[-1][0] - self._samples[0][0]
+            denominator = n * self._sxx - self._sx * self._sx
+            if span > 0 and denominator > 0:
+                slope = (n * self._sxy - self._sx * self._sy) / denominator
+                if abs(slope * span) >= MIN_CHANGE:
+                    return slope * 3600, "regression"
+        if n and wh_per_percent:
+            return -self._power / n / wh_per_percent, "power"
+        return None
+
+    def minutes_to(self, target: float, wh_per_percent: float | None) -> float | None:
+        """Minutes until the SoC reaches `target` at the current rate, None if
+        it isn't heading there."""
+        if not self._samples:
+            return None
+        distance = target - self._samples[-1][1]
+        if distance == 0:
+            return 0.0
+        if (rate := self.rate(wh_per_percent)) is None:
+            return None
+        per_hour = rate[0]
+        if per_hour == 0 or (per_hour > 0) != (distance > 0):
+            return None
+        return distance / per_hour * 60
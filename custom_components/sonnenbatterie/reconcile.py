@@ -0,0 +1,161 @@
+"""Reconciliation of commanded charge/discharge setpoints with the battery.
+
+The API can't read a setpoint back, so the commanded one is followed with
+the measured battery power (Pac_total_W) instead: how long the battery takes
+to get there, how far off it stays once there - and whether it has dropped
+the command altogether (reboot, mode change), which is the only case where
+sending it again is worth a request.
+"""
+from dataclasses import dataclass
+
+from .const import SB_OPERATING_MODES
+from .model import StatusData, V2StatusData
+
+MANUAL_MODE = str(SB_OPERATING_MODES["manual"])
+
+# |measured - commanded| counted as "there": this or 5 % of the setpoint
+TOLERANCE = 100
+TOLERANCE_SHARE = 0.05
+
+
+def reaches(measured: float, target: float) -> bool:
+    """Whether the measured battery power (W, > 0: charging) is at `target`."""
+    return abs(measured - target) <= max(TOLERANCE, abs(target) * TOLERANCE_SHARE)
+
+
+@dataclass(frozen=True, slots=True)
+class SampleContext:
+    """What decides whether the battery can follow a setpoint"""
+    status: StatusData
+    v2_status: V2StatusData
+    # backup reserve (%), None if unknown
+    reserve: float | None
+
+
+class SetpointTracker:
+    """Follows the last commanded setpoint (W, > 0: charge, < 0: discharge)."""
+
+    # consecutive idle samples of a battery able to follow before the
+    # command counts as dropped
+    DROPPED_AFTER = 3
+    # seconds after the command in which a return to manual mode still
+    # restores it; later, it's someone else's manual mode
+    RESEND_WINDOW = 300.0
+
+    __slots__ = (
+        "commanded", "commanded_at", "convergence_time", "_converged",
+        "_error_sum", "_error_samples", "_idle_samples", "_left_manual", "_resent", "_last_sample", "resends",
+    )
+
+    def __init__(self) -> None:
+        self.commanded: int | None = None
+        self.commanded_at: float | None = None
+        # seconds from the command to the first sample within tolerance
+        self.convergence_time: float | None = None
+        self._converged = False
+        self._error_sum = 0.0
+        self._error_samples = 0
+        self._idle_samples = 0
+        self._left_manual = False
+        self._resent = False
+        self._last_sample: float | None = None
+        # commands sent again because the battery had dropped them
+        self.resends = 0
+
+    @property
+    def steady_state_error(self) -> float | None:
+        """Mean deviation (W, measured - commanded) once converged."""
+        if not self._error_samples:
+            return None
+        return self._error_sum / self._error_samples
+
+    def command(self, power: int, at: float, resend: bool = False) -> None:
+        if resend:
+            self.resends += 1
+            self._resent = True
+        if power == self.commanded:
+            # the same target again - keep following it
+            return
+        self._resent = resend
+        self.commanded = power
+        self.commanded_at = at
+        self.convergence_time = None
+        self._converged = False
+        self._error_sum = 0.0
+        self._error_samples = 0
+        self._idle_samples = 0
+        self._left_manual = False
+
+    def _forget(self) -> None:
+        self.commanded = None
+        self.commanded_at = None
+        self.convergence_time = None
+        self._converged = False
+        self._error_sum = 0.0
+        self._error_samples = 0
+        self._idle_samples = 0
+        self._resent = False
+
+    def _can_follow(self, context: SampleContext) -> bool:
+        """Whether the battery is able to deliver the commanded power at all."""
+        usoc = context.status.usoc
+        if self.commanded > 0:
+            return usoc is None or usoc < 100
+        if context.v2_status.discharge_not_allowed:
+            return False
+        return usoc is None or context.reserve is None or usoc > context.reserve
+
+    def sample(self, context: SampleContext, at: float) -> int | None:
+        """Account a status sample. Returns the setpoint to send again if the
+        battery has clearly dropped it, else None. `at` is the time the
+        status was fetched."""
+        if at == self._last_sample:
+            # no new status this poll
+            return None
+        self._last_sample = at
+        if not self.commanded or context.status.pac_total_w is None:
+            return None
+        if str(context.status.operating_mode) != MANUAL_MODE:
+            # setpoints are void outside manual mode - and gone once back
+            self._left_manual = True
+            return None
+        if self._left_manual:
+            self._left_manual = False
+            if at - self.commanded_at <= self.RESEND_WINDOW:
+                return self.commanded
+            # a stale setpoint - don't replay it
+            self._forget()
+            return None
+        if not self._can_follow(context):
+            self._idle_samples = 0
+            return None
+
+        measured = -context.status.pac_total_w
+        error = measured - self.commanded
+        if reaches(measured, self.commanded):
+            if not self._converged:
+                self._converged = True
+                self.convergence_time = at - self.commanded_at
+            self._resent = False
+        if self._converged:
+            self._error_sum += error
+            self._error_samples += 1
+
+        # only a setpoint well above the noise can clearly be missing
+        if abs(measured) > TOLERANCE or abs(self.commanded) <= 2 * TOLERANCE:
+            self._idle_samples = 0
+            return None
+        self._idle_samples += 1
+        # re-send once; if the battery ignores that too, it has its reasons
+        if self._idle_samples >= self.DROPPED_AFTER and not self._resent:
+            return self.commanded
+        return None
+
+    def as_dict(self) -> dict:
+        error = self.steady_state_error
+        return {
+            "commanded": self.commanded,
+            "convergence_time": round(self.convergence_time, 1) if self.convergence_time is not None else None,
+            "steady_state_error": round(error) if error is not None else None,
+            "resends": self.resends,
+        }
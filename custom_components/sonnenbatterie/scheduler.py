@@ -0,0 +1,174 @@
+"""Timed charge/discharge setpoints, executed by the integration.
+
+A plan like "charge 3000 W 02:00-04:00, then release" is compiled into a
+sorted timeline of change points (UTC timestamp, signed setpoint). A single
+timer is armed for the next change point only, however dense the plan is, and
+the writes go through the coordinator's command pipeline on time. The
+timeline is persisted, so a restart neither loses the plan nor misses a
+change that fell into the downtime; after a poll failure (reconnect, login
+renewal) the setpoint currently in force is sent again.
+"""
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+from typing import Iterable, NamedTuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, LOGGER
+from .coordinator import SonnenbatterieCoordinator
+from .snapshot import Snapshot
+
+STORAGE_VERSION = 1
+
+
+class Segment(NamedTuple):
+    start: datetime
+    # None: until the next segment starts (or for good)
+    end: datetime | None
+    # W, > 0: charge, < 0: discharge
+    power: int
+
+
+def resolve_time(value: datetime | time, after: datetime) -> datetime:
+    """A datetime as is (naive ones are local), a time of day as its next
+    occurrence after `after`."""
+    if isinstance(value, datetime):
+        return dt_util.as_local(value) if value.tzinfo is not None else value.replace(tzinfo=after.tzinfo)
+    resolved = datetime.combine(after.date(), value, tzinfo=after.tzinfo)
+    return resolved if resolved > after else resolved + timedelta(days=1)
+
+
+def compile_timeline(segments: Iterable[Segment]) -> list[tuple[float, int]]:
+    """The change points of the segments, sorted. Each end becomes a release
+    (setpoint 0) unless the next segment starts right there. Raises
+    ValueError on overlapping segments."""
+    points: dict[float, int] = {}
+    last_end = None
+    for segment in sorted(segments, key=lambda segment: segment.start):
+        start = segment.start.timestamp()
+        end = segment.end.timestamp() if segment.end is not None else None
+        if end is not None and end <= start:
+            raise ValueError(f"segment starting at {segment.start} ends before it starts")
+        if last_end is not None and start < last_end:
+            raise ValueError(f"segment starting at {segment.start} overlaps the previous one")
+        points[start] = segment.power
+        if end is not None:
+            points.setdefault(end, 0)
+        last_end = end
+    return sorted(points.items())
+
+
+class SetpointScheduler:
+    """Executes the setpoint timeline of one battery"""
+
+    def __init__(self, hass: HomeAssistant, coordinator: SonnenbatterieCoordinator, config_entry: ConfigEntry) -> None:
+        self._hass = hass
+        self._coordinator = coordinator
+        self._config_entry = config_entry
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.setpoints")
+        # change points, sorted: timestamps and setpoints kept apart for bisect
+        self._times: list[float] = []
+        self._powers: list[int] = []
+        # setpoint in force (None: released / nothing scheduled)
+        self.current: int | None = None
+        # setpoint whose write failed, sent again on the next poll
+        self._retry: int | None = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._unsub_sample = coordinator.async_add_sample_listener(self._on_sample)
+
+    async def async_load(self) -> None:
+        data = await self._store.async_load() or {}
+        self.current = data.get("current")
+        timeline = data.get("timeline", [])
+        self._times = [point[0] for point in timeline]
+        self._powers = [point[1] for point in timeline]
+        # catch up on what fell into the downtime, re-assert the rest
+        if not self._advance() and self.current is not None:
+            self._send(self.current)
+        self._arm()
+
+    async def async_set(self, timeline: list[tuple[float, int]]) -> None:
+        """Replace the plan."""
+        self._times = [point[0] for point in timeline]
+        self._powers = [point[1] for point in timeline]
+        if not self._advance() and self.current is not None:
+            # the old plan's setpoint isn't part of the new one
+            self.current = None
+            self._send(0)
+        self._arm()
+        await self._store.async_save(self._data())
+
+    @callback
+    def async_shutdown(self) -> None:
+        self._unsub_sample()
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    def as_list(self) -> list[dict]:
+        return [
+            {"at": dt_util.as_local(dt_util.utc_from_timestamp(at)).isoformat(), "power": power}
+            for at, power in zip(self._times, self._powers)
+        ]
+
+    def _data(self) -> dict:
+        return {"timeline": list(zip(self._times, self._powers)), "current": self.current}
+
+    def _advance(self) -> bool:
+        """Drop the change points that are due and put the last of them in
+        force. Returns whether it did."""
+        due = bisect_right(self._times, dt_util.utcnow().timestamp())
+        if not due:
+            return False
+        power = self._powers[due - 1]
+        del self._times[:due], self._powers[:due]
+        self.current = power or None
+        self._send(power)
+        return True
+
+    def _arm(self) -> None:
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if self._times:
+            self._unsub_timer = async_track_point_in_utc_time(
+                self._hass, self._fire, dt_util.utc_from_timestamp(self._times[0])
+            )
+
+    @callback
+    def _fire(self, _now: datetime) -> None:
+        self._unsub_timer = None
+        self._advance()
+        self._arm()
+        self._store.async_delay_save(self._data, 1.0)
+
+    @callback
+    def _on_sample(self, _snapshot: Snapshot) -> None:
+        if self._retry is not None:
+            self._send(self._retry)
+        # called before the coordinator records this poll's success, i.e.
+        # last_update_success still tells how the previous poll went
+        elif not self._coordinator.last_update_success and self.current is not None:
+            LOGGER.info(f"Re-asserting scheduled setpoint of {self.current} W after reconnect")
+            self._send(self.current)
+
+    def _send(self, power: int) -> None:
+        self._retry = None
+        # cancelled with the entry, so it can't outlive a reload
+        self._config_entry.async_create_background_task(
+            self._hass, self._async_send(power), f"{DOMAIN} setpoint schedule"
+        )
+
+    async def _async_send(self, power: int) -> None:
+        try:
+            if power >= 0:
+                await self._coordinator.async_execute("charge", power)
+            else:
+                await self._coordinator.async_execute("discharge", -power)
+        except Exception as e:  # noqa: BLE001 - retried on the next poll
+            LOGGER.warning(f"Scheduled setpoint of {power} W failed: {e}")
+            self._retry = power
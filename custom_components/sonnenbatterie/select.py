@@ -16,7 +16,7 @@ async def async_setup_entry(
     LOGGER.debug(f"SELECT async_setup_entry: {config_entry}")
     coordinator = hass.data[DOMAIN][config_entry.entry_id][CONF_COORDINATOR]
 
-    if coordinator.latestData.get('api_configuration',{}).get('IN_LocalAPIWriteActive', '0') == '1':
+    if coordinator.snapshot.api_configuration.write_active:
         # await coordinator.async_refresh()
 
         entities = []
@@ -36,8 +36,8 @@ class SonnenBatterieSelect(SonnenSelectEntity, SelectEntity):
     @property
     def current_option(self) ->  str | list[str] | None:
         tag = self.entity_description.tag
-        value = self.coordinator.latestData[tag.section][tag.property]
-        return SB_OPERATING_MODES_NUM[value] or "unknown"
+        value = getattr(getattr(self.coordinator.snapshot, tag.section), tag.property)
+        return SB_OPERATING_MODES_NUM.get(value) or "unknown"
 
     async def async_select_option(self, option: str) -> None:
         tag = self.entity_description.tag
@@ -47,7 +47,6 @@ class SonnenBatterieSelect(SonnenSelectEntity, SelectEntity):
                 case "configurations":
                     match tag.key:
                         case "select_operating_mode":
-                            await self.coordinator.sbconn.sb2.set_operating_mode(SB_OPERATING_MODES[option])
-                            await self.coordinator.async_request_refresh()
+                            await self.coordinator.async_execute("operating_mode", SB_OPERATING_MODES[option])
 
         return None
@@ -1,20 +1,33 @@
 from homeassistant.components.sensor import (
     SensorEntity,
 )
+from dataclasses import replace
+from time import monotonic
+
 from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import MATCH_ALL
+from homeassistant.core import callback
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.typing import StateType
 
 from . import CONF_COORDINATOR
 from .const import (
+    CONF_STATISTICS_IMPORT,
     DOMAIN,
     LOGGER,
 )
 from .coordinator import SonnenbatterieCoordinator
 from .entities import SonnenBaseEntity
+from .longterm import StatisticsImporter, is_high_rate
 
 from .sensor_list import (
+    KPI_SENSORS,
+    LATENCY_SENSORS,
     SENSORS,
+    SETPOINT_SENSORS,
+    SOC_FORECAST_SENSORS,
+    WEAR_SENSORS,
+    deadband_of,
     generate_powermeter_sensors, SonnenbatterieSensorEntityDescription
 )
 
@@ -34,16 +47,57 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 
     # await coordinator.async_refresh()
 
-    async_add_entities(
-        SonnenbatterieSensor(coordinator=coordinator, entity_description=description)
+    importer = None
+    if config_entry.data.get(CONF_STATISTICS_IMPORT):
+        importer = StatisticsImporter(hass, coordinator, config_entry)
+        await importer.async_load()
+        config_entry.async_on_unload(coordinator.async_add_sample_listener(importer.sample))
+        # don't lose the hour in progress
+        config_entry.async_on_unload(importer.async_listen_stop())
+
+    def _entities(descriptions):
+        descriptions = list(descriptions)
+        if importer is None:
+            return [SonnenbatterieSensor(coordinator=coordinator, entity_description=d) for d in descriptions]
+        importer.add(descriptions)
+        # no state class: the recorder doesn't compile statistics from the states
+        return [
+            SonnenbatterieSensor(
+                coordinator=coordinator,
+                entity_description=replace(d, state_class=None) if is_high_rate(d) else d,
+            )
+            for d in descriptions
+        ]
+
+    async_add_entities(_entities(
+        description
         for description in SENSORS
         if description.value_fn(coordinator) is not None
-    )
-
-    async_add_entities(
-        SonnenbatterieSensor(coordinator=coordinator, entity_description=description)
-        for description in generate_powermeter_sensors(_coordinator=coordinator)
-    )
+    ))
+    async_add_entities(_entities((*SETPOINT_SENSORS, *LATENCY_SENSORS, *KPI_SENSORS, *WEAR_SENSORS, *SOC_FORECAST_SENSORS)))
+
+    # meters we have entities for / meters in the last snapshot
+    known_meters = set(coordinator.snapshot.powermeter)
+    reported_meters = set(known_meters)
+    async_add_entities(_entities(generate_powermeter_sensors(_coordinator=coordinator, keys=known_meters)))
+
+    @callback
+    def _async_check_powermeters() -> None:
+        """Add entities for meters that show up after setup - no reload needed.
+        Entities of meters that vanish turn unavailable (see available_fn)."""
+        current = coordinator.snapshot.powermeter.keys()
+        if current == reported_meters:
+            return
+        if gone := reported_meters - current:
+            LOGGER.info(f"Powermeter(s) {sorted(gone)} no longer reported")
+        if new := current - known_meters:
+            LOGGER.info(f"New powermeter(s) {sorted(new)} detected")
+            known_meters.update(new)
+            async_add_entities(_entities(generate_powermeter_sensors(_coordinator=coordinator, keys=new)))
+        reported_meters.clear()
+        reported_meters.update(current)
+
+    config_entry.async_on_unload(coordinator.async_add_listener(_async_check_powermeters))
 
     return True
 
@@ -56,6 +110,8 @@ class SonnenbatterieSensor(SonnenBaseEntity, SensorEntity, RestoreEntity):
     # _attr_should_poll = False
     # _attr_has_entity_name = True
     _attr_suggested_display_precision = 0
+    # diagnostic attributes change every cycle, keep them out of the database
+    _unrecorded_attributes = frozenset({MATCH_ALL})
 
     def __init__(
         self,
@@ -75,6 +131,32 @@ class SonnenbatterieSensor(SonnenBaseEntity, SensorEntity, RestoreEntity):
         # )
         if precision := entity_description.suggested_display_precision:
             self._attr_suggested_display_precision = precision
+        # (absolute, relative) deadband, None if every change is written
+        deadband = deadband_of(entity_description)
+        self._deadband = deadband if any(deadband) else None
+        # (value, availability, time) of the last state written by an update
+        self._written: tuple[StateType, bool, float] | None = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state - unless only the noise within the deadband changed,
+        in which case not even a state_changed event is created."""
+        if self._deadband is None:
+            super()._handle_coordinator_update()
+            return
+        value, available, now = self.native_value, self.available, monotonic()
+        if self._written is not None:
+            last, was_available, written_at = self._written
+            if (
+                available == was_available
+                and isinstance(value, (int, float))
+                and isinstance(last, (int, float))
+                and abs(value - last) < max(self._deadband[0], self._deadband[1] * abs(last))
+                and now - written_at < self.entity_description.heartbeat
+            ):
+                return
+        self._written = (value, available, now)
+        super()._handle_coordinator_update()
 
     @property
     def unique_id(self) -> str:
@@ -87,3 +169,10 @@ class SonnenbatterieSensor(SonnenBaseEntity, SensorEntity, RestoreEntity):
     def native_value(self) -> StateType:
         """Return the state of the sensor."""
         return self.entity_description.value_fn(self.coordinator)
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return additional (diagnostic) attributes."""
+        if self.entity_description.attr_fn is None:
+            return None
+        return self.entity_description.attr_fn(self.coordinator)
@@ -10,6 +10,8 @@ from homeassistant.const import EntityCategory
 from homeassistant.helpers.typing import StateType
 
 from custom_components.sonnenbatterie.coordinator import SonnenbatterieCoordinator
+from custom_components.sonnenbatterie.kpi import KPIS, WINDOWS
+from custom_components.sonnenbatterie.model import POWERMETER_VALUES
 
 
 @dataclass(frozen=True, kw_only=True)
@@ -17,38 +19,62 @@ class SonnenbatterieSensorEntityDescription(SensorEntityDescription):
     """Describes Sonnebatterie sensor entity."""
     _attr_has_entity_name: bool = True
     legacy_key: str = None
+    # the coordinator section (endpoint) the value is read from
+    section: str | None = None
+    # seconds the last value is served without a successful fetch of the
+    # section before the entity turns unavailable (None: coordinator default)
+    max_age: float | None = None
     # exists_fn: Callable[[SonnenBatterieCoordinator], bool] = lambda _: True
     value_fn: Callable[[SonnenbatterieCoordinator], StateType]
+    attr_fn: Callable[[SonnenbatterieCoordinator], dict] | None = None
+    # extra condition for the entity to be available (besides fresh data)
+    available_fn: Callable[[SonnenbatterieCoordinator], bool] | None = None
+    # the state is only written once the value leaves the band around the
+    # last written one: absolute (in the native unit) and/or relative to it.
+    # None for both: the default of the device class (see DEADBANDS), 0: off
+    deadband: float | None = None
+    deadband_share: float | None = None
+    # seconds after which a value within the band is written anyway
+    heartbeat: float = 300.0
 
-def generate_powermeter_sensors(_coordinator):
-    powermeter_sensors: list[SonnenbatterieSensorEntityDescription] = []
 
-    generate_sensors_for = {
-        "a_l1",
-        "a_l2",
-        "a_l3",
-        "v_l1_l2",
-        "v_l1_n",
-        "v_l2_l3",
-        "v_l2_n",
-        "v_l3_l1",
-        "v_l3_n",
-        "w_l1",
-        "w_l2",
-        "w_l3",
-        "w_total",
-    }
+# device class -> default (absolute, relative) deadband: the values that
+# jitter on every poll without meaning anything
+DEADBANDS: dict[SensorDeviceClass, tuple[float, float]] = {
+    SensorDeviceClass.VOLTAGE: (0.5, 0.0),
+    SensorDeviceClass.CURRENT: (0.05, 0.01),
+    SensorDeviceClass.FREQUENCY: (0.01, 0.0),
+}
+
+
+def deadband_of(description: SonnenbatterieSensorEntityDescription) -> tuple[float, float]:
+    """The (absolute, relative) deadband of a sensor, (0, 0) if it has none."""
+    if description.deadband is None and description.deadband_share is None:
+        return DEADBANDS.get(description.device_class, (0.0, 0.0))
+    return description.deadband or 0.0, description.deadband_share or 0.0
+
+
+def generate_powermeter_sensors(_coordinator, keys=None):
+    """Sensor descriptions for the given meters (default: all known ones).
+
+    Every sensor looks its meter up by (direction, deviceid, channel), so the
+    order in which the battery lists its meters doesn't matter.
+    """
+    powermeter_sensors: list[SonnenbatterieSensorEntityDescription] = []
+    if keys is None:
+        keys = _coordinator.snapshot.powermeter.keys()
 
     """powermeter values"""
-    for index, meter in enumerate(_coordinator.latestData["powermeter"]):
+    for meter_key in keys:
+        direction, deviceid, channel = meter_key
         sensor_prefix_key = (
-            f"meter_{meter['direction']}_{meter['deviceid']}_{meter['channel']}".lower()
+            f"meter_{direction}_{deviceid}_{channel}".lower()
         )
 
-        for sensor_meter in generate_sensors_for:
+        for sensor_meter in POWERMETER_VALUES:
             sensor_key = f"{sensor_prefix_key}_{sensor_meter}"
             # sensor_name = f"meter {meter['direction']} {sensor_meter}"
-            sensor_name = f"meter {meter['direction']} {meter['channel']} {sensor_meter}"
+            sensor_name = f"meter {direction} {channel} {sensor_meter}"
             unit = (sensor_meter[0] + "").upper()
             match unit:
                 case "V":
@@ -67,21 +93,21 @@ def generate_powermeter_sensors(_coordinator):
                 SonnenbatterieSensorEntityDescription(
                     key=sensor_key,
                     name=sensor_name,
+                    section="powermeter",
                     icon=icon,
                     state_class=SensorStateClass.MEASUREMENT,
                     native_unit_of_measurement=unit,
                     device_class=device_class,
                     entity_category=EntityCategory.DIAGNOSTIC,
                     suggested_display_precision=2,
-                    value_fn=lambda coordinator, _index=index, _sensor_meter=sensor_meter: (
+                    value_fn=lambda coordinator, _key=meter_key, _sensor_meter=sensor_meter: (
                         round(val, 2)
-                        if (
-                            val := coordinator.latestData.get("powermeter", {})[
-                                _index
-                            ].get(_sensor_meter)
-                        )
-                        is not None else None
+                        if (meter := coordinator.snapshot.powermeter.get(_key)) is not None
+                        and (val := getattr(meter, _sensor_meter)) is not None
+                        else None
                     ),
+                    # a meter that disappeared from the payload turns unavailable
+                    available_fn=lambda coordinator, _key=meter_key: _key in coordinator.snapshot.powermeter,
                     entity_registry_enabled_default=False,
                 )
             )
@@ -96,42 +122,40 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
     # main sensor
     SonnenbatterieSensorEntityDescription(
         key="state_sonnenbatterie",
+        section="status",
         icon="mdi:battery-charging-medium",
         options=["standby", "charging", "discharging"],
         device_class=SensorDeviceClass.ENUM,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_info", {}).get(
-            "current_state"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_info.current_state,
     ),
     ###
     # consumption
     SonnenbatterieSensorEntityDescription(
         key="state_consumption_current",
+        section="status",
         legacy_key="consumption_w",
         icon="mdi:home-lightning-bolt",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "Consumption_W"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.consumption_w,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_consumption_avg",
+        section="status",
         legacy_key="consumption_avg",
         icon="mdi:home-lightning-bolt",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "Consumption_Avg"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.consumption_avg,
         entity_registry_enabled_default=False,
     ),
     ###
     # production
     SonnenbatterieSensorEntityDescription(
         key="state_production",
+        section="status",
         legacy_key="production_w",
         icon="mdi:solar-power",
         state_class=SensorStateClass.MEASUREMENT,
@@ -140,29 +164,86 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
         value_fn=lambda coordinator: (
             # Prevent having small negative values in production at night
             0
-            if (
-                production := coordinator.latestData.get("status", {}).get(
-                    "Production_W", 0
-                )
-            )
-            < 0
+            if (production := coordinator.snapshot.status.production_w or 0) < 0
             else production
         ),
     ),
     ###
+    # energy, integrated from the power samples
+    SonnenbatterieSensorEntityDescription(
+        key="energy_battery_charge",
+        section="status",
+        icon="mdi:battery-arrow-up",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.energy.kwh("battery_charge"),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="energy_battery_discharge",
+        section="status",
+        icon="mdi:battery-arrow-down",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.energy.kwh("battery_discharge"),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="energy_grid_import",
+        section="status",
+        icon="mdi:transmission-tower-export",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.energy.kwh("grid_import"),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="energy_grid_export",
+        section="status",
+        icon="mdi:transmission-tower-import",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.energy.kwh("grid_export"),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="energy_production",
+        section="status",
+        icon="mdi:solar-power",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.energy.kwh("production"),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="energy_consumption",
+        section="status",
+        icon="mdi:home-lightning-bolt",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.energy.kwh("consumption"),
+    ),
+    ###
     # grid
     SonnenbatterieSensorEntityDescription(
         key="state_grid_inout",
+        section="status",
         state_class=SensorStateClass.MEASUREMENT,
         icon="mdi:transmission-tower",
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "GridFeedIn_W"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.grid_feed_in_w,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_grid_in",
+        section="status",
         legacy_key="state_grid_input",
         state_class=SensorStateClass.MEASUREMENT,
         icon="mdi:transmission-tower-export",
@@ -170,16 +251,14 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.POWER,
         value_fn=lambda coordinator: (
             0
-            if (
-                power := coordinator.latestData.get("status", {}).get("GridFeedIn_W", 0)
-            )
-            >= 0
+            if (power := coordinator.snapshot.status.grid_feed_in_w or 0) >= 0
             else abs(power)
         ),
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_grid_out",
+        section="status",
         legacy_key="state_grid_output",
         icon="mdi:transmission-tower-import",
         state_class=SensorStateClass.MEASUREMENT,
@@ -187,91 +266,86 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.POWER,
         value_fn=lambda coordinator: (
             0
-            if (
-                power := coordinator.latestData.get("status", {}).get("GridFeedIn_W", 0)
-            )
-            <= 0
+            if (power := coordinator.snapshot.status.grid_feed_in_w or 0) <= 0
             else power
         ),
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_net_frequency",
+        section="inverter",
         legacy_key="state_netfrequency",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="Hz",
         device_class=SensorDeviceClass.FREQUENCY,
         suggested_display_precision=2,
         value_fn=lambda coordinator: (
-            coordinator.latestData.get("inverter", {}).get("status", {}).get("fac")
-            or coordinator.latestData.get("inverter", {}).get("status", {}).get("status", {}).get("fac")
-            or coordinator.latestData.get("battery_system", {}).get("grid_information", {}).get("fac")
+            coordinator.snapshot.inverter.fac
+            or coordinator.snapshot.battery_system.grid_fac
         ),
     ),
     ###
     # battery
     SonnenbatterieSensorEntityDescription(
         key="state_battery_inout",
+        section="status",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "Pac_total_W"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.pac_total_w,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_battery_in",
+        section="status",
         legacy_key="state_battery_input",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
         value_fn=lambda coordinator: (
             0
-            if (power := coordinator.latestData.get("status", {}).get("Pac_total_W", 0))
-            >= 0
+            if (power := coordinator.snapshot.status.pac_total_w or 0) >= 0
             else abs(power)
         ),
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_battery_out",
+        section="status",
         legacy_key="state_battery_output",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
         value_fn=lambda coordinator: (
             0
-            if (power := coordinator.latestData.get("status", {}).get("Pac_total_W", 0))
-            <= 0
+            if (power := coordinator.snapshot.status.pac_total_w or 0) <= 0
             else power
         ),
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_battery_percentage_real",
+        section="status",
         legacy_key="state_charge_real",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="%",
         device_class=SensorDeviceClass.BATTERY,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "RSOC"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.rsoc,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_battery_percentage_user",
+        section="status",
         legacy_key="state_charge_user",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="%",
         device_class=SensorDeviceClass.BATTERY,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "USOC"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.usoc,
     ),
     ###
     # system
     SonnenbatterieSensorEntityDescription(
         key="state_system_status",
+        section="status",
         icon="mdi:battery-check-outline",
         legacy_key="systemstatus",
         device_class=SensorDeviceClass.ENUM,
@@ -280,19 +354,18 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
         value_fn=lambda coordinator: (
             # for some reason translation throws an error when using uppercase chars (even tough it is working)
             val.lower()
-            if (val := coordinator.latestData.get("status", {}).get("SystemStatus"))
+            if (val := coordinator.snapshot.status.system_status)
             else None
         ),
     ),
     SonnenbatterieSensorEntityDescription(
         key="state_operating_mode",
+        section="status",
         legacy_key="operating_mode",
         icon="mdi:state-machine",
         options=["1", "2", "6", "10", "11"],
         device_class=SensorDeviceClass.ENUM,
-        value_fn=lambda coordinator: coordinator.latestData.get("status", {}).get(
-            "OperatingMode"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.status.operating_mode,
     ),
     ###########################
     ### -- advanced sensors ###
@@ -300,143 +373,121 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
     # grid
     SonnenbatterieSensorEntityDescription(
         key="inverter_state_ipv",
+        section="inverter",
         legacy_key="inverter_ipv",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="A",
         device_class=SensorDeviceClass.CURRENT,
-        value_fn=lambda coordinator: coordinator.latestData.get("inverter", {})
-        .get("status", {})
-        .get("ipv"),
+        value_fn=lambda coordinator: coordinator.snapshot.inverter.ipv,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="inverter_state_ipv2",
+        section="inverter",
         legacy_key="inverter_ipv2",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="A",
         device_class=SensorDeviceClass.CURRENT,
-        value_fn=lambda coordinator: coordinator.latestData.get("inverter", {})
-        .get("status", {})
-        .get("ipv2"),
+        value_fn=lambda coordinator: coordinator.snapshot.inverter.ipv2,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="inverter_state_ppv",
+        section="inverter",
         legacy_key="inverter_ppv",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("inverter", {})
-        .get("status", {})
-        .get("ppv"),
+        value_fn=lambda coordinator: coordinator.snapshot.inverter.ppv,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="inverter_state_ppv2",
+        section="inverter",
         legacy_key="inverter_ppv2",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("inverter", {})
-        .get("status", {})
-        .get("ppv2"),
+        value_fn=lambda coordinator: coordinator.snapshot.inverter.ppv2,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="inverter_state_upv",
+        section="inverter",
         legacy_key="inverter_upv",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="V",
         device_class=SensorDeviceClass.VOLTAGE,
-        value_fn=lambda coordinator: coordinator.latestData.get("inverter", {})
-        .get("status", {})
-        .get("upv"),
+        value_fn=lambda coordinator: coordinator.snapshot.inverter.upv,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="inverter_state_upv2",
+        section="inverter",
         legacy_key="inverter_upv2",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="V",
         device_class=SensorDeviceClass.VOLTAGE,
-        value_fn=lambda coordinator: coordinator.latestData.get("inverter", {})
-        .get("status", {})
-        .get("upv2"),
+        value_fn=lambda coordinator: coordinator.snapshot.inverter.upv2,
         entity_registry_enabled_default=False,
     ),
     ###
     # battery system
     SonnenbatterieSensorEntityDescription(
         key="battery_system_cycles",
+        section="battery",
         icon="mdi:battery-sync",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: (
-            coordinator.latestData.get("battery", {})
-            .get("measurements", {})
-            .get("battery_status", {})
-            .get("cyclecount")
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery.cyclecount,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_system_health",
+        section="battery",
         icon="mdi:battery-heart-variant",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="%",
         device_class=SensorDeviceClass.BATTERY,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: (
-            coordinator.latestData.get("battery", {})
-            .get("measurements", {})
-            .get("battery_status", {})
-            .get("stateofhealth")
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery.stateofhealth,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_minimum_cell_temperature",
+        section="battery",
         icon="mdi:thermometer-low",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="°C",
         device_class=SensorDeviceClass.TEMPERATURE,
         entity_category=EntityCategory.DIAGNOSTIC,
         suggested_display_precision=2,
-        value_fn=lambda coordinator: (
-            coordinator.latestData.get("battery", {})
-            .get("measurements", {})
-            .get("battery_status", {})
-            .get("minimumcelltemperature")
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery.minimum_cell_temperature,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_maximum_cell_temperature",
+        section="battery",
         icon="mdi:thermometer-high",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="°C",
         device_class=SensorDeviceClass.TEMPERATURE,
         entity_category=EntityCategory.DIAGNOSTIC,
         suggested_display_precision=2,
-        value_fn=lambda coordinator: (
-            coordinator.latestData.get("battery", {})
-            .get("measurements", {})
-            .get("battery_status", {})
-            .get("maximumcelltemperature")
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery.maximum_cell_temperature,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_installed_capacity_total",
+        section="status",
         legacy_key="state_total_capacity_real",
         icon="mdi:battery-charging",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="Wh",
         device_class=SensorDeviceClass.ENERGY_STORAGE,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_info").get(
-            "total_installed_capacity"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_info.total_installed_capacity,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_installed_capacity_usable",
+        section="status",
         legacy_key="state_total_capacity_usable",
         icon="mdi:battery-charging",
         state_class=SensorStateClass.MEASUREMENT,
@@ -444,107 +495,96 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.ENERGY_STORAGE,
         entity_category=EntityCategory.DIAGNOSTIC,
         value_fn=lambda coordinator: (
-            coordinator.latestData.get("battery_info", {}).get(
-                "total_installed_capacity", 0
-            )
-            - coordinator.latestData.get("battery_info", {}).get("reserved_capacity", 0)
+            (coordinator.snapshot.battery_info.total_installed_capacity or 0)
+            - (coordinator.snapshot.battery_info.reserved_capacity or 0)
         ),
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_remaining_capacity_total",
+        section="status",
         legacy_key="state_remaining_capacity_real",
         icon="mdi:battery-charging",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="Wh",
         device_class=SensorDeviceClass.ENERGY_STORAGE,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_info", {}).get(
-            "remaining_capacity"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_info.remaining_capacity,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_remaining_capacity_usable",
+        section="status",
         legacy_key="state_remaining_capacity_usable",
         icon="mdi:battery-charging",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="Wh",
         device_class=SensorDeviceClass.ENERGY_STORAGE,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_info", {}).get(
-            "remaining_capacity_usable"
-        ),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_info.remaining_capacity_usable,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_storage_capacity_per_module",
+        section="battery_system",
         legacy_key="module_capacity",
         icon="mdi:battery-charging",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="Wh",
         device_class=SensorDeviceClass.ENERGY_STORAGE,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_system", {})
-        .get("battery_system", {})
-        .get("system", {})
-        .get("storage_capacity_per_module"),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_system.storage_capacity_per_module,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_module_count",
+        section="battery_system",
         legacy_key="module_count",
         icon="mdi:battery",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get(
-            "battery_system", {}
-        ).get("modules"),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_system.modules,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_grid_ipv",
+        section="battery_system",
         legacy_key="battery_system_ipv",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="A",
         device_class=SensorDeviceClass.CURRENT,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_system", {})
-        .get("grid_information", {})
-        .get("ipv"),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_system.grid_ipv,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_grid_ppv",
+        section="battery_system",
         legacy_key="battery_system_ppv",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="W",
         device_class=SensorDeviceClass.POWER,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_system", {})
-        .get("grid_information", {})
-        .get("ppv"),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_system.grid_ppv,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_grid_upv",
+        section="battery_system",
         legacy_key="battery_system_upv",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="V",
         device_class=SensorDeviceClass.VOLTAGE,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_system", {})
-        .get("grid_information", {})
-        .get("upv"),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_system.grid_upv,
         entity_registry_enabled_default=False,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_grid_tmax",
+        section="battery_system",
         legacy_key="tmax",
         icon="mdi:thermometer-alert",
         state_class=SensorStateClass.MEASUREMENT,
         native_unit_of_measurement="°C",
         device_class=SensorDeviceClass.TEMPERATURE,
-        value_fn=lambda coordinator: coordinator.latestData.get("battery_system", {})
-        .get("grid_information", {})
-        .get("tmax"),
+        value_fn=lambda coordinator: coordinator.snapshot.battery_system.grid_tmax,
         entity_registry_enabled_default=False,
     ),
     ###########################
@@ -552,47 +592,227 @@ SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
     ###
     SonnenbatterieSensorEntityDescription(
         key="read_api",
+        section="api_configuration",
         icon="mdi:alpha-r-circle-outline",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("api_configuration", {})
-        .get('IN_LocalAPIReadActive', '0') == '1',
+        value_fn=lambda coordinator: coordinator.snapshot.api_configuration.read_active,
         entity_registry_enabled_default=True,
     ),
     SonnenbatterieSensorEntityDescription(
         key="write_api",
+        section="api_configuration",
         icon="mdi:alpha-w-circle-outline",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn= lambda coordinator: coordinator.latestData.get("api_configuration", {})
-        .get('IN_LocalAPIWriteActive', '0') == '1',
+        value_fn=lambda coordinator: coordinator.snapshot.api_configuration.write_active,
         entity_registry_enabled_default = True,
     ),
     SonnenbatterieSensorEntityDescription(
         key="tou_max_power",
+        section="commissioning_settings",
         icon="mdi:transmission-tower-import",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: coordinator.latestData.get("commissioning_settings", {})
-                                     .get('data', {}).get('attributes',{}).get('tou_max_power_limit', 'unknown'),
+        value_fn=lambda coordinator: (
+            limit
+            if (limit := coordinator.snapshot.commissioning_settings.tou_max_power_limit) is not None
+            else 'unknown'
+        ),
         entity_registry_enabled_default=True,
     ),
     SonnenbatterieSensorEntityDescription(
         key="battery_care",
+        section="v2_status",
         icon="mdi:wrench-clock",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
-        value_fn=lambda coordinator: (coordinator.latestData.get("v2_status", {})
-        .get("dischargeNotAllowed", False) == True),
+        value_fn=lambda coordinator: coordinator.snapshot.v2_status.discharge_not_allowed == True,
         entity_registry_enabled_default=True,
     ),
     SonnenbatterieSensorEntityDescription(
         key="backup_buffer",
+        section="v2_status",
         icon="mdi:battery-20",
         state_class=SensorStateClass.MEASUREMENT,
         entity_category=EntityCategory.DIAGNOSTIC,
         native_unit_of_measurement="%",
-        value_fn=lambda coordinator: int(coordinator.latestData.get("v2_status", {}).get("BackupBuffer", "0")),
+        value_fn=lambda coordinator: int(coordinator.snapshot.v2_status.backup_buffer or "0"),
+        entity_registry_enabled_default=True,
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="stale_sections",
+        icon="mdi:timer-sand",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda coordinator: sum(
+            1 for state in coordinator.section_status().values() if state.get("stale")
+        ),
+        attr_fn=lambda coordinator: coordinator.section_status(),
         entity_registry_enabled_default=True,
     ),
+    SonnenbatterieSensorEntityDescription(
+        key="snapshot_build_time",
+        icon="mdi:timer-cog-outline",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="ms",
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=3,
+        value_fn=lambda coordinator: round(coordinator.snapshot.build_cost * 1000, 3),
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+# unknown until a commanded setpoint has settled
+SETPOINT_SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
+    SonnenbatterieSensorEntityDescription(
+        key="setpoint_error",
+        section="status",
+        icon="mdi:target-variant",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="W",
+        device_class=SensorDeviceClass.POWER,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda coordinator: (
+            round(error) if (error := coordinator.setpoints.steady_state_error) is not None else None
+        ),
+        attr_fn=lambda coordinator: coordinator.setpoints.as_dict(),
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+# unknown until a command has run / a setpoint has taken effect
+LATENCY_SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
+    SonnenbatterieSensorEntityDescription(
+        key="command_latency",
+        icon="mdi:timer-outline",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="s",
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: coordinator.latency.median("round_trip"),
+        attr_fn=lambda coordinator: coordinator.latency.as_dict(),
+        entity_registry_enabled_default=False,
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="setpoint_effect_latency",
+        icon="mdi:timer-play-outline",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="s",
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=1,
+        value_fn=lambda coordinator: coordinator.latency.median("total", ("charge", "discharge")),
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+def _kpi_sensor(kpi: str, window: str) -> SonnenbatterieSensorEntityDescription:
+    if kpi == "throughput":
+        return SonnenbatterieSensorEntityDescription(
+            key=f"kpi_{kpi}_{window}",
+            icon="mdi:battery-sync",
+            state_class=SensorStateClass.MEASUREMENT,
+            native_unit_of_measurement="kWh",
+            suggested_display_precision=2,
+            value_fn=lambda coordinator: coordinator.kpi.value(kpi, window),
+            # equivalent full cycles
+            attr_fn=lambda coordinator: {
+                "cycles": round(coordinator.kpi.energy(window, "battery_discharge") / capacity, 2)
+                if (capacity := coordinator.snapshot.battery_info.total_installed_capacity)
+                else None
+            },
+            entity_registry_enabled_default=window == "today",
+        )
+    return SonnenbatterieSensorEntityDescription(
+        key=f"kpi_{kpi}_{window}",
+        icon={
+            "autarky": "mdi:home-battery",
+            "self_consumption": "mdi:solar-power-variant",
+            "efficiency": "mdi:battery-heart-variant",
+        }[kpi],
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="%",
+        suggested_display_precision=1,
+        value_fn=lambda coordinator: coordinator.kpi.value(kpi, window),
+        entity_registry_enabled_default=window == "today" and kpi != "efficiency",
+    )
+
+
+# maintained from the energy counters, unknown until there's enough energy
+KPI_SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = tuple(
+    _kpi_sensor(kpi, window) for kpi in KPIS for window in WINDOWS
+)
+
+# cycle counting / capacity estimate, unknown until the first full swing
+WEAR_SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
+    SonnenbatterieSensorEntityDescription(
+        key="battery_cycles",
+        icon="mdi:battery-sync-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=1,
+        value_fn=lambda coordinator: round(coordinator.degradation.cycles, 2),
+        # cycle counts per depth
+        attr_fn=lambda coordinator: coordinator.degradation.as_dict(),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="battery_capacity_estimate",
+        icon="mdi:battery-heart-outline",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY_STORAGE,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=2,
+        value_fn=lambda coordinator: (
+            round(capacity / 1000, 2) if (capacity := coordinator.degradation.capacity) is not None else None
+        ),
+        attr_fn=lambda coordinator: {
+            "charge": round(charge / 1000, 2) if (charge := coordinator.degradation.estimates.get("charge")) else None,
+            "discharge": round(discharge / 1000, 2)
+            if (discharge := coordinator.degradation.estimates.get("discharge")) else None,
+            "swings": coordinator.degradation.swings,
+        },
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="battery_state_of_health",
+        icon="mdi:battery-heart-variant",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="%",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        suggested_display_precision=1,
+        value_fn=lambda coordinator: coordinator.degradation.state_of_health(
+            coordinator.snapshot.battery_info.total_installed_capacity
+        ),
+    ),
+)
+
+# predicted from the recent SoC samples, unknown while not heading there
+SOC_FORECAST_SENSORS: tuple[SonnenbatterieSensorEntityDescription, ...] = (
+    SonnenbatterieSensorEntityDescription(
+        key="time_to_full",
+        section="status",
+        icon="mdi:battery-clock",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="min",
+        device_class=SensorDeviceClass.DURATION,
+        value_fn=lambda coordinator: coordinator.minutes_to_soc("full"),
+        # SoC change (%/h) the prediction is based on
+        attr_fn=lambda coordinator: coordinator.soc_rate(),
+    ),
+    SonnenbatterieSensorEntityDescription(
+        key="time_to_reserve",
+        section="status",
+        icon="mdi:battery-clock-outline",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement="min",
+        device_class=SensorDeviceClass.DURATION,
+        value_fn=lambda coordinator: coordinator.minutes_to_soc("reserve"),
+        attr_fn=lambda coordinator: coordinator.soc_rate(),
+    ),
 )
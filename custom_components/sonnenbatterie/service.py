@@ -1,20 +1,56 @@
+import asyncio
 import json
+from collections.abc import Mapping
+from dataclasses import replace
+from datetime import timedelta
+from functools import partial
+from typing import Any, Awaitable, Callable
 
+import numpy as np
 from homeassistant.const import ATTR_DEVICE_ID
-from homeassistant.core import ServiceCall, ServiceResponse
-from homeassistant.exceptions import HomeAssistantError
-from homeassistant.helpers.device_registry import async_get as dr_async_get
+from homeassistant.core import Event, ServiceCall, ServiceResponse, callback
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers.device_registry import EVENT_DEVICE_REGISTRY_UPDATED, async_get as dr_async_get
+from homeassistant.util import dt as dt_util
 from homeassistant.util.read_only_dict import ReadOnlyDict
-from sonnenbatterie import AsyncSonnenBatterie
-from timeofuse import TimeofUseSchedule
 
 from custom_components.sonnenbatterie import CONF_COORDINATOR
+from custom_components.sonnenbatterie.controller import CONTROLLER_FIELDS
+from custom_components.sonnenbatterie.history import async_load_telemetry
+from custom_components.sonnenbatterie.model import ConfigurationsData
+from custom_components.sonnenbatterie.optimizer import BatteryParams, optimize
+from custom_components.sonnenbatterie.scheduler import Segment, compile_timeline, resolve_time
+from custom_components.sonnenbatterie.simulator import BatteryUnit, Candidate, simulate
+from custom_components.sonnenbatterie.tou import TouSchedule, TouWindow
 from custom_components.sonnenbatterie.const import (
+    CONF_BT_END,
+    CONF_BT_PERIOD,
+    CONF_BT_RESERVES,
+    CONF_BT_SCHEDULES,
+    CONF_BT_START,
     CONF_CHARGE_WATT,
+    CONF_FORECAST_HOURS,
+    CONF_SCHEDULER,
+    CONF_SETPOINT_TIMELINE,
+    CONF_OPT_APPLY,
+    CONF_OPT_EFFICIENCY,
+    CONF_OPT_FEED_IN_PRICE,
+    CONF_OPT_LOAD,
+    CONF_OPT_PRICES,
+    CONF_OPT_PV,
+    CONF_OPT_SLOT_MINUTES,
+    CONF_OPT_START,
+    CONF_SERVICE_DRY_RUN,
     CONF_SERVICE_ITEM,
+    CONF_SERVICE_MAX_AGE,
+    CONF_SERVICE_OPERATIONS,
     CONF_SERVICE_SCHEDULE,
     CONF_SERVICE_VALUE,
     CONF_TOU_MAX,
+    CONF_TOU_MAX_POWER,
+    CONF_TOU_NEW_START,
+    CONF_TOU_START,
+    CONF_TOU_STOP,
     DOMAIN,
     LOGGER,
     SB_OPERATING_MODES,
@@ -22,33 +58,72 @@ from custom_components.sonnenbatterie.const import (
     SONNENBATTERIE_ISSUE_URL,
 )
 
+# the hass.data of one config entry (coordinator, tou_max, ...)
+SbConfig = dict[str, Any]
+
 
 class SonnenbatterieService:
     def __init__(self, hass, config, coordinator):
         self._hass = hass
         self._config = config
         self._coordinator = coordinator
-        self._tou_max = hass.data[DOMAIN][config.entry_id][CONF_TOU_MAX]
-
-    def _get_sb_connection(self, call_data: ReadOnlyDict) -> AsyncSonnenBatterie:
-        LOGGER.debug(f"_get_sb_connection: {call_data}")
-        if ATTR_DEVICE_ID in call_data:
-            # no idea why, but sometimes it's a list and other times a str
-            if isinstance(call_data[ATTR_DEVICE_ID], list):
-                device_id = call_data[ATTR_DEVICE_ID][0]
-            else:
-                device_id = call_data[ATTR_DEVICE_ID]
+        # device_id -> config entry id, filled on demand; dropped whenever the
+        # device registry changes
+        self._device_index: dict[str, str] = {}
+        config.async_on_unload(
+            hass.bus.async_listen(EVENT_DEVICE_REGISTRY_UPDATED, self._invalidate_device_index)
+        )
+
+    @callback
+    def _invalidate_device_index(self, _event: Event) -> None:
+        self._device_index.clear()
+
+    def _get_entry_id(self, device_id: str) -> str:
+        if (entry_id := self._device_index.get(device_id)) is None:
             device_registry = dr_async_get(self._hass)
             if not (device_entry := device_registry.async_get(device_id)):
                 raise HomeAssistantError(f"No device found for device_id: {device_id}")
-            if not (sb_config := self._hass.data[DOMAIN][device_entry.primary_config_entry]):
-                raise HomeAssistantError(f"Unable to find config for device_id: {device_id} ({device_entry.name})")
-            if sb_config.get(CONF_COORDINATOR):
-                return sb_config.get("coordinator").sbconn
-            else:
+            entry_id = self._device_index[device_id] = device_entry.primary_config_entry
+        return entry_id
+
+    def _get_targets(self, call_data: ReadOnlyDict) -> list[tuple[str | None, SbConfig]]:
+        """The config data of every device the call is addressed to."""
+        LOGGER.debug(f"_get_targets: {call_data}")
+        if not (device_ids := call_data.get(ATTR_DEVICE_ID)):
+            return [(None, self._hass.data[DOMAIN][self._config.entry_id])]
+        # no idea why, but sometimes it's a list and other times a str
+        if isinstance(device_ids, str):
+            device_ids = [device_ids]
+        targets = []
+        for device_id in dict.fromkeys(device_ids):
+            if not (sb_config := self._hass.data[DOMAIN].get(self._get_entry_id(device_id))):
+                raise HomeAssistantError(f"Unable to find config for device_id: {device_id}")
+            if not sb_config.get(CONF_COORDINATOR):
                 raise HomeAssistantError(f"Invalid config for device_id: {device_id} ({sb_config}). Please report an issue at {SONNENBATTERIE_ISSUE_URL}.")
-        else:
-            return self._coordinator.sbconn
+            targets.append((device_id, sb_config))
+        return targets
+
+    async def _fan_out(self, call: ServiceCall, run: Callable[[SbConfig], Awaitable[dict]]) -> ServiceResponse:
+        """Run a service on every targeted device, in parallel.
+
+        A single device answers with its plain response (as it always did),
+        several ones with their responses keyed by device id. A device that
+        fails reports its error there; only if all fail the call fails.
+        """
+        targets = self._get_targets(call.data)
+        if len(targets) == 1:
+            return await run(targets[0][1])
+        results = await asyncio.gather(*(run(sb_config) for _, sb_config in targets), return_exceptions=True)
+        response = {}
+        for (device_id, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                LOGGER.warning(f"{call.service} failed for device {device_id}: {result}")
+                response[device_id] = {"error": str(result) or type(result).__name__}
+            else:
+                response[device_id] = result
+        if all(isinstance(result, Exception) for result in results):
+            raise HomeAssistantError(f"{call.service} failed for all devices: {response}")
+        return response
 
     # service definitions
     async def charge_battery(self, call: ServiceCall) -> ServiceResponse:
@@ -56,109 +131,361 @@ class SonnenbatterieService:
         power = int(call.data.get(CONF_CHARGE_WATT))
         if power < 0:
             power = 0
-        # Make sure we have an sb2 object
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.charge_battery(power)
-        return {
-            "charge": response,
-        }
+
+        async def _run(sb_config: SbConfig) -> dict:
+            return {
+                "charge": await sb_config[CONF_COORDINATOR].async_execute("charge", power),
+            }
+        return await self._fan_out(call, _run)
 
     async def discharge_battery(self, call: ServiceCall) -> ServiceResponse:
         LOGGER.debug(f"_discharge_battery: {call.data}")
         power = int(call.data.get(CONF_CHARGE_WATT))
         if power < 0:
             power = 0
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.discharge_battery(power)
-        return {
-            "discharge": response,
-        }
+
+        async def _run(sb_config: SbConfig) -> dict:
+            return {
+                "discharge": await sb_config[CONF_COORDINATOR].async_execute("discharge", power),
+            }
+        return await self._fan_out(call, _run)
 
     async def set_battery_reserve(self, call: ServiceCall) -> ServiceResponse:
         value = call.data.get(CONF_SERVICE_VALUE)
-        sb_conn = self._get_sb_connection(call.data)
-        response = int((await sb_conn.sb2.set_battery_reserve(value))["EM_USOC"])
-        return {
-            "battery_reserve": response,
-        }
+
+        async def _run(sb_config: SbConfig) -> dict:
+            response = await sb_config[CONF_COORDINATOR].async_execute("battery_reserve", value)
+            return {
+                "battery_reserve": int(response["EM_USOC"]),
+            }
+        return await self._fan_out(call, _run)
 
     async def set_config_item(self, call: ServiceCall) -> ServiceResponse:
         item = call.data.get(CONF_SERVICE_ITEM)
         value = call.data.get(CONF_SERVICE_VALUE)
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.set_config_item(item, value)
-        return {
-            "response": response,
-        }
+
+        async def _run(sb_config: SbConfig) -> dict:
+            return {
+                "response": await sb_config[CONF_COORDINATOR].async_execute("config_item", item, value),
+            }
+        return await self._fan_out(call, _run)
 
     async def set_operating_mode(self, call: ServiceCall) -> ServiceResponse:
         mode = SB_OPERATING_MODES.get(call.data.get('mode'))
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.set_operating_mode(mode)
-        return {
-            "mode": SB_OPERATING_MODES_NUM.get(str(response), "UNKNOWN")
-        }
+
+        async def _run(sb_config: SbConfig) -> dict:
+            response = await sb_config[CONF_COORDINATOR].async_execute("operating_mode", mode)
+            return {
+                "mode": SB_OPERATING_MODES_NUM.get(str(response["EM_OperatingMode"]), "UNKNOWN")
+            }
+        return await self._fan_out(call, _run)
 
     async def set_operating_mode_num(self, call: ServiceCall) -> ServiceResponse:
         mode = call.data.get('mode')
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.set_operating_mode(mode)
-        return {
-            "mode": response
-        }
 
-    async def set_tou_schedule(self, call: ServiceCall) -> ServiceResponse:
-        schedule = call.data.get(CONF_SERVICE_SCHEDULE)
+        async def _run(sb_config: SbConfig) -> dict:
+            response = await sb_config[CONF_COORDINATOR].async_execute("operating_mode", mode)
+            return {
+                "mode": int(response["EM_OperatingMode"])
+            }
+        return await self._fan_out(call, _run)
+
+    @staticmethod
+    def _checked_tou_schedule(schedule: TouSchedule, tou_max: int) -> TouSchedule:
+        """Cap the schedule's power limits to the device's maximum and check
+        it locally, before anything is sent."""
+        capped = schedule.capped(tou_max)
+        if capped is not schedule:
+            LOGGER.warning(f"Specified 'threshold_p_max' exceeds configured limit of {tou_max}, value capped to {tou_max}")
         try:
-            json_schedule = json.loads(schedule)
+            capped.validate()
         except ValueError as e:
-            raise HomeAssistantError(f"Schedule is not a valid JSON string: '{schedule}'") from e
+            raise HomeAssistantError(f"Schedule is not a valid schedule: {e}") from e
+        return capped
 
-        for lp in range(len(json_schedule)):
-            if json_schedule[lp]['threshold_p_max'] > self._tou_max:
-                LOGGER.warning(f"Specified 'threshold_p_max' exceeds configured limit of {self._tou_max}, value capped to {json_schedule[lp]['threshold_p_max']}")
-                json_schedule[lp]['threshold_p_max'] = self._tou_max
-
-        tou = TimeofUseSchedule()
+    @staticmethod
+    def _parse_tou_schedule(schedule: str) -> TouSchedule:
         try:
-            tou.load_tou_schedule_from_json(json_schedule)
+            return TouSchedule.parse(schedule)
         except ValueError as e:
-            raise HomeAssistantError(f"Schedule is not a valid schedule: '{schedule}'") from e
-        except TypeError as t:
-            raise HomeAssistantError(f"Schedule is not a valid schedule: '{schedule}'") from t
+            raise HomeAssistantError(f"Schedule is not a valid JSON schedule: '{schedule}'") from e
 
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.set_tou_schedule_string(schedule)
+    async def _update_tou_schedule(
+        self,
+        call: ServiceCall,
+        sb_config: SbConfig,
+        edit: Callable[[TouSchedule], TouSchedule],
+        dry_run: bool,
+    ) -> dict:
+        """Apply `edit` to the cached schedule of a device and write the
+        result - unless it equals the current schedule or it's a dry run."""
+        coordinator = sb_config[CONF_COORDINATOR]
+        if (max_age := call.data.get(CONF_SERVICE_MAX_AGE)) is not None:
+            # edit a base no older than that
+            await coordinator.async_read_section("configurations", max_age)
+        try:
+            current = coordinator.tou_schedule
+        except ValueError as e:
+            raise HomeAssistantError(f"The battery's current ToU schedule can't be parsed: {e}") from e
+        try:
+            edited = edit(current)
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+        schedule = self._checked_tou_schedule(edited, sb_config[CONF_TOU_MAX])
+        changed = schedule != current
+        text = schedule.compile()
+        if changed and not dry_run:
+            response = await coordinator.async_execute("tou_schedule", text)
+            if isinstance(response, Mapping):
+                text = response.get("EM_ToU_Schedule", text)
         return {
-            "schedule": response["EM_ToU_Schedule"],
+            # the EM_ToU_Schedule string, as set_tou_schedule always returned it
+            "schedule": text,
+            "windows": schedule.as_list(),
+            "changed": changed,
+            "written": changed and not dry_run,
         }
 
-    # noinspection PyUnusedLocal
-    async def get_tou_schedule(self, call: ServiceCall) -> ServiceResponse:
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.get_tou_schedule_string()
-        return {
-            "schedule": response,
+    async def _edit_tou_schedule(self, call: ServiceCall, edit: Callable[[TouSchedule], TouSchedule]) -> ServiceResponse:
+        dry_run = call.data.get(CONF_SERVICE_DRY_RUN, False)
+        return await self._fan_out(call, lambda sb_config: self._update_tou_schedule(call, sb_config, edit, dry_run))
+
+    async def set_tou_schedule(self, call: ServiceCall) -> ServiceResponse:
+        schedule = self._parse_tou_schedule(call.data.get(CONF_SERVICE_SCHEDULE))
+        return await self._edit_tou_schedule(call, lambda _current: schedule)
+
+    async def add_tou_window(self, call: ServiceCall) -> ServiceResponse:
+        window = TouWindow.create(call.data[CONF_TOU_START], call.data[CONF_TOU_STOP], call.data[CONF_TOU_MAX_POWER])
+        return await self._edit_tou_schedule(call, lambda current: current.add(window))
+
+    async def remove_tou_window(self, call: ServiceCall) -> ServiceResponse:
+        start = call.data[CONF_TOU_START]
+        return await self._edit_tou_schedule(call, lambda current: current.remove(start))
+
+    async def modify_tou_window(self, call: ServiceCall) -> ServiceResponse:
+        start = call.data[CONF_TOU_START]
+        changes = {
+            "start": call.data.get(CONF_TOU_NEW_START),
+            "stop": call.data.get(CONF_TOU_STOP),
+            "threshold_p_max": call.data.get(CONF_TOU_MAX_POWER),
         }
+        return await self._edit_tou_schedule(call, lambda current: current.modify(start, **changes))
+
+    async def optimize_tou_schedule(self, call: ServiceCall) -> ServiceResponse:
+        """Plan the TOU windows for a tariff; written only if `apply` is set."""
+        slot = timedelta(minutes=int(call.data[CONF_OPT_SLOT_MINUTES]))
+        if (start := call.data.get(CONF_OPT_START)) is None:
+            now = dt_util.now()
+            start = now.replace(second=0, microsecond=0) - timedelta(minutes=now.minute % (slot.seconds // 60))
+        elif start.tzinfo is not None:
+            # the windows are times of day of the battery, i.e. local time
+            start = dt_util.as_local(start)
+
+        async def _run(sb_config: SbConfig) -> dict:
+            snapshot = sb_config[CONF_COORDINATOR].snapshot
+            battery_info = snapshot.battery_info
+            if None in (battery_info.total_installed_capacity, snapshot.status.usoc, snapshot.battery_system.inverter_capacity):
+                raise HomeAssistantError("Battery data not available yet, please try again later")
+            params = BatteryParams(
+                capacity=battery_info.total_installed_capacity - (battery_info.reserved_capacity or 0),
+                usoc=float(snapshot.status.usoc),
+                reserve=float(snapshot.configurations.usoc or 0),
+                max_power=float(snapshot.battery_system.inverter_capacity),
+                grid_limit=float(sb_config[CONF_TOU_MAX]),
+                efficiency=call.data[CONF_OPT_EFFICIENCY],
+            )
+            load, pv = call.data.get(CONF_OPT_LOAD), call.data.get(CONF_OPT_PV)
+            baseline = sb_config[CONF_COORDINATOR].baseline
+            if (load is None or pv is None) and baseline.complete:
+                # no forecast given - expect the usual for these hours of the week
+                forecast = baseline.forecast(start, len(call.data[CONF_OPT_PRICES]), slot)
+                load = forecast["consumption"] if load is None else load
+                pv = forecast["production"] if pv is None else pv
+            plan = await self._hass.async_add_executor_job(partial(
+                optimize,
+                call.data[CONF_OPT_PRICES],
+                params,
+                start,
+                slot,
+                load=load,
+                pv=pv,
+                feed_in_price=call.data[CONF_OPT_FEED_IN_PRICE],
+            ))
+            result = plan.as_dict()
+            result.update(await self._update_tou_schedule(
+                call, sb_config, lambda _current: plan.schedule(sb_config[CONF_TOU_MAX]), not call.data[CONF_OPT_APPLY]
+            ))
+            return result
+        return await self._fan_out(call, _run)
+
+    async def backtest(self, call: ServiceCall) -> ServiceResponse:
+        """Replay recorded telemetry with candidate reserves and schedules."""
+        end = call.data.get(CONF_BT_END) or dt_util.now()
+        start = call.data.get(CONF_BT_START) or end - timedelta(days=30)
+        if start >= end:
+            raise HomeAssistantError("'start' must be before 'end'")
+        schedules = [
+            self._parse_tou_schedule(schedule if isinstance(schedule, str) else json.dumps(schedule))
+            for schedule in call.data.get(CONF_BT_SCHEDULES, ())
+        ]
+
+        async def _run(sb_config: SbConfig) -> dict:
+            coordinator = sb_config[CONF_COORDINATOR]
+            snapshot = coordinator.snapshot
+            battery_info = snapshot.battery_info
+            if None in (battery_info.total_installed_capacity, snapshot.battery_system.inverter_capacity):
+                raise HomeAssistantError("Battery data not available yet, please try again later")
+            reserves = call.data.get(CONF_BT_RESERVES) or [float(snapshot.configurations.usoc or 0)]
+            strategies = [None] + [self._checked_tou_schedule(schedule, sb_config[CONF_TOU_MAX]) for schedule in schedules]
+            candidates = [Candidate(reserve, schedule) for reserve in reserves for schedule in strategies]
+            unit = BatteryUnit(
+                capacity=battery_info.total_installed_capacity - (battery_info.reserved_capacity or 0),
+                max_power=float(snapshot.battery_system.inverter_capacity),
+                usoc=float(snapshot.status.usoc or 0),
+                efficiency=call.data[CONF_OPT_EFFICIENCY],
+            )
+            telemetry = await async_load_telemetry(self._hass, coordinator.serial, start, end, call.data[CONF_BT_PERIOD])
+            try:
+                result = await self._hass.async_add_executor_job(partial(
+                    simulate,
+                    telemetry,
+                    unit,
+                    candidates,
+                    call.data[CONF_OPT_PRICES],
+                    feed_in_price=call.data[CONF_OPT_FEED_IN_PRICE],
+                ))
+            except ValueError as e:
+                raise HomeAssistantError(str(e)) from e
+            return {"start": start.isoformat(), "end": end.isoformat(), **result}
+        return await self._fan_out(call, _run)
+
+    async def set_grid_controller(self, call: ServiceCall) -> ServiceResponse:
+        """Change the settings of the in-process grid controller; fields not
+        given keep their value."""
+        changes = {name: call.data[name] for name in CONTROLLER_FIELDS if name in call.data}
+
+        async def _run(sb_config: SbConfig) -> dict:
+            coordinator = sb_config[CONF_COORDINATOR]
+            if changes:
+                coordinator.configure_controller(replace(coordinator.controller.settings, **changes))
+            return {
+                **coordinator.controller.settings.as_dict(),
+                "setpoint": coordinator.controller.written,
+            }
+        return await self._fan_out(call, _run)
+
+    async def set_setpoint_schedule(self, call: ServiceCall) -> ServiceResponse:
+        """Replace the timed setpoints executed by the integration; without a
+        timeline only report the current one."""
+        timeline = None
+        if (segments := call.data.get(CONF_SETPOINT_TIMELINE)) is not None:
+            now = dt_util.now()
+            resolved = []
+            for segment in segments:
+                start = resolve_time(segment["start"], now)
+                end = resolve_time(segment["end"], start) if "end" in segment else None
+                power = segment["charge"] if "charge" in segment else -segment["discharge"]
+                resolved.append(Segment(start, end, power))
+            try:
+                timeline = compile_timeline(resolved)
+            except ValueError as e:
+                raise HomeAssistantError(str(e)) from e
+
+        async def _run(sb_config: SbConfig) -> dict:
+            if (scheduler := sb_config.get(CONF_SCHEDULER)) is None:
+                # only set up with the battery's write API enabled
+                raise ServiceValidationError(
+                    f"Battery {sb_config[CONF_COORDINATOR].serial} has no timed setpoints: its local write API is not enabled"
+                )
+            if timeline is not None:
+                await scheduler.async_set(timeline)
+            return {"current": scheduler.current, "timeline": scheduler.as_list()}
+        return await self._fan_out(call, _run)
+
+    async def get_load_forecast(self, call: ServiceCall) -> ServiceResponse:
+        """Expected consumption and production per hour from the baseline."""
+        now = dt_util.now()
+        start = now.replace(minute=0, second=0, microsecond=0)
+        hours = call.data[CONF_FORECAST_HOURS]
+
+        async def _run(sb_config: SbConfig) -> dict:
+            baseline = sb_config[CONF_COORDINATOR].baseline
+            forecast = baseline.forecast(start, hours, timedelta(hours=1))
+            result = {"start": start.isoformat(), "slot_minutes": 60, "complete": baseline.complete}
+            for key, values in forecast.items():
+                # hours of the week not seen yet are None
+                result[key] = [None if np.isnan(value) else round(float(value)) for value in values]
+            return result
+        return await self._fan_out(call, _run)
+
+    async def get_command_stats(self, call: ServiceCall) -> ServiceResponse:
+        """Latency distributions and counters of the writes so far."""
+        async def _run(sb_config: SbConfig) -> dict:
+            coordinator = sb_config[CONF_COORDINATOR]
+            return {
+                "latency": coordinator.latency.as_dict(),
+                "commands": coordinator.command_metrics,
+            }
+        return await self._fan_out(call, _run)
+
+    async def apply(self, call: ServiceCall) -> ServiceResponse:
+        """Several writes in one go: one slot in the device queue, one
+        read-back at the end."""
+
+        async def _run(sb_config: SbConfig) -> dict:
+            operations = []
+            for operation in call.data.get(CONF_SERVICE_OPERATIONS):
+                (name, value), = operation.items()
+                match name:
+                    case "operating_mode":
+                        operations.append((name, (SB_OPERATING_MODES[value],)))
+                    case "tou_schedule":
+                        schedule = self._checked_tou_schedule(self._parse_tou_schedule(value), sb_config[CONF_TOU_MAX])
+                        operations.append((name, (schedule.compile(),)))
+                    case _:
+                        operations.append((name, (value,)))
+            results = await sb_config[CONF_COORDINATOR].async_execute_batch(operations)
+            return {
+                "success": all(result["status"] == "ok" for result in results),
+                "results": results,
+            }
+        return await self._fan_out(call, _run)
+
+    @staticmethod
+    async def _get_configurations(call: ServiceCall, sb_config: SbConfig) -> ConfigurationsData:
+        """The configuration items, from the snapshot if they aren't older
+        than the call's max_age (seconds), else read from the battery."""
+        coordinator = sb_config[CONF_COORDINATOR]
+        return await coordinator.async_read_section("configurations", call.data.get(CONF_SERVICE_MAX_AGE))
+
+    async def get_tou_schedule(self, call: ServiceCall) -> ServiceResponse:
+        async def _run(sb_config: SbConfig) -> dict:
+            configurations = await self._get_configurations(call, sb_config)
+            return {
+                "schedule": configurations.tou_schedule,
+            }
+        return await self._fan_out(call, _run)
 
-    # noinspection PyUnusedLocal
     async def get_battery_reserve(self, call: ServiceCall) -> ServiceResponse:
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.get_battery_reserve()
-        return {
-            "backup_reserve": response,
-        }
+        async def _run(sb_config: SbConfig) -> dict:
+            configurations = await self._get_configurations(call, sb_config)
+            return {
+                "backup_reserve": int(configurations.usoc) if configurations.usoc is not None else None,
+            }
+        return await self._fan_out(call, _run)
 
     async def get_operating_mode(self, call: ServiceCall) -> ServiceResponse:
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.get_operating_mode()
-        return {
-            "operating_mode": SB_OPERATING_MODES_NUM.get(str(response), "UNKNOWN")
-        }
+        async def _run(sb_config: SbConfig) -> dict:
+            configurations = await self._get_configurations(call, sb_config)
+            return {
+                "operating_mode": SB_OPERATING_MODES_NUM.get(str(configurations.operating_mode), "UNKNOWN")
+            }
+        return await self._fan_out(call, _run)
 
     async def get_operating_mode_num(self, call: ServiceCall) -> ServiceResponse:
-        sb_conn = self._get_sb_connection(call.data)
-        response = await sb_conn.sb2.get_operating_mode()
-        return {
-            "operating_mode": response,
-        }
+        async def _run(sb_config: SbConfig) -> dict:
+            configurations = await self._get_configurations(call, sb_config)
+            return {
+                "operating_mode": int(configurations.operating_mode) if configurations.operating_mode is not None else None,
+            }
+        return await self._fan_out(call, _run)
@@ -0,0 +1,179 @@
+"""Offline backtesting of reserve levels and TOU schedules.
+
+Replays recorded telemetry (mean production and consumption per step)
+through the battery model of battery.py. All candidate strategies are
+simulated side by side: the state of charge is a vector with one entry per
+candidate, so each step is a handful of NumPy operations no matter how many
+candidates there are. Three months of 5-minute data take about half a second,
+hourly data a fraction of that.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .battery import grid_charge, self_consumption
+from .tou import TouSchedule
+
+MINUTES_PER_DAY = 24 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class Telemetry:
+    """Equidistant recorded steps, oldest first - in contiguous runs, with
+    the steps that weren't recorded left out"""
+    # length of a step (hours)
+    hours: float
+    # local minute of the day each step starts at
+    minutes: np.ndarray
+    production: np.ndarray
+    consumption: np.ndarray
+    # GridFeedIn_W as recorded (> 0: export), NaN where unknown
+    grid_feed_in: np.ndarray
+    # True for the steps that start a run, i.e. follow a gap
+    breaks: np.ndarray | None = None
+    # steps the requested period has, recorded or not
+    expected: int | None = None
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryUnit:
+    # usable capacity (Wh) - total installed minus the internally reserved part
+    capacity: float
+    # inverter limit (W)
+    max_power: float
+    # state of charge (%) to start with
+    usoc: float
+    efficiency: float = 0.95
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    """A strategy to test: the backup reserve (%) and, for timeofuse mode,
+    a schedule - without one the battery runs in automatic mode."""
+    reserve: float
+    schedule: TouSchedule | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "reserve": self.reserve,
+            "schedule": self.schedule.as_list() if self.schedule is not None else None,
+        }
+
+
+def _minute(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _grid_limits(schedule: TouSchedule | None) -> np.ndarray:
+    """threshold_p_max per minute of the day, NaN outside of the windows."""
+    limits = np.full(MINUTES_PER_DAY, np.nan)
+    for window in schedule.windows if schedule is not None else ():
+        start = _minute(window.start)
+        # a window ending at midnight is written as stopping at "00:00"
+        stop = _minute(window.stop) or MINUTES_PER_DAY
+        if start < stop:
+            limits[start:stop] = window.threshold_p_max
+        else:
+            limits[start:] = window.threshold_p_max
+            limits[:stop] = window.threshold_p_max
+    return limits
+
+
+def _prices(prices, minutes: np.ndarray) -> np.ndarray:
+    """Price per kWh of each step, from a flat price or one per hour of the day."""
+    prices = np.asarray(prices, dtype=float)
+    if prices.size == 1:
+        return np.full(len(minutes), prices.item())
+    if prices.size != 24:
+        raise ValueError("prices must be a single price or one per hour of the day")
+    return prices[minutes // 60]
+
+
+def _summary(imported, exported, cost) -> dict:
+    return {
+        "import_kwh": round(float(imported) / 1000.0, 3),
+        "export_kwh": round(float(exported) / 1000.0, 3),
+        "cost": round(float(cost), 2),
+    }
+
+
+def simulate(
+    telemetry: Telemetry,
+    unit: BatteryUnit,
+    candidates: list[Candidate],
+    prices,
+    feed_in_price: float = 0.0,
+) -> dict:
+    """Simulate every candidate over the telemetry. Returns the results per
+    candidate (same order) and what was actually recorded for comparison."""
+    if not len(telemetry):
+        raise ValueError("no telemetry to simulate")
+    hours = telemetry.hours
+    price = _prices(prices, telemetry.minutes)
+    # (steps, candidates): grid limit while in a TOU window, NaN outside
+    limits = np.stack([_grid_limits(candidate.schedule)[telemetry.minutes] for candidate in candidates], axis=1)
+    in_window = ~np.isnan(limits)
+    grid_energy = np.nan_to_num(limits) * hours
+
+    capacity = unit.capacity
+    floor = capacity * np.array([candidate.reserve for candidate in candidates], dtype=float) / 100.0
+    max_energy = unit.max_power * hours
+    net = (telemetry.production - telemetry.consumption) * hours
+
+    initial = np.full(len(candidates), capacity * unit.usoc / 100.0)
+    soc = initial
+    breaks = telemetry.breaks if telemetry.breaks is not None else np.zeros(len(telemetry), dtype=bool)
+    grid = np.empty((len(telemetry), len(candidates)))
+    discharged = np.zeros(len(candidates))
+    for t in range(len(telemetry)):
+        if breaks[t]:
+            # what happened in the gap is unknown - start the run afresh
+            soc = initial
+        idle = self_consumption(soc, net[t], capacity, floor, max_energy, unit.efficiency)
+        window = in_window[t]
+        if window.any():
+            charge = grid_charge(soc, net[t], capacity, grid_energy[t], max_energy, unit.efficiency)
+            soc = np.where(window, charge.soc, idle.soc)
+            grid[t] = np.where(window, charge.grid, idle.grid)
+            discharged += np.where(window, 0.0, idle.discharged)
+        else:
+            soc = idle.soc
+            grid[t] = idle.grid
+            discharged += idle.discharged
+
+    drawn = np.maximum(grid, 0.0)
+    fed = np.maximum(-grid, 0.0)
+    imported = drawn.sum(axis=0)
+    exported = fed.sum(axis=0)
+    cost = (price @ drawn - exported * feed_in_price) / 1000.0
+
+    results = [
+        {
+            **candidate.as_dict(),
+            **_summary(imported[i], exported[i], cost[i]),
+            # equivalent full cycles
+            "cycles": round(float(discharged[i] / capacity), 2) if capacity else None,
+        }
+        for i, candidate in enumerate(candidates)
+    ]
+
+    known = ~np.isnan(telemetry.grid_feed_in)
+    recorded_grid = -telemetry.grid_feed_in[known] * hours
+    recorded_import = np.maximum(recorded_grid, 0.0)
+    recorded_export = np.maximum(-recorded_grid, 0.0)
+    recorded = _summary(
+        recorded_import.sum(),
+        recorded_export.sum(),
+        (recorded_import @ price[known] - recorded_export.sum() * feed_in_price) / 1000.0,
+    ) if known.any() else None
+    coverage = {
+        "steps": len(telemetry),
+        "expected": telemetry.expected,
+        "share": round(len(telemetry) / telemetry.expected, 3) if telemetry.expected else None,
+        "runs": int(breaks[1:].sum()) + 1,
+    }
+    return {"steps": len(telemetry), "coverage": coverage, "results": results, "recorded": recorded}
@@ -0,0 +1,129 @@
+"""Immutable snapshots of the data read from the Sonnenbatterie.
+
+Every poll cycle (and every light refresh after a write) builds a NEW snapshot
+and publishes it with a single attribute assignment. Entities and services
+reading while a cycle is still awaiting the battery therefore always see one
+consistent set of sections, never a torn mix of old and new ones - and they
+don't have to copy anything to get that guarantee.
+
+The sections are held in the compact typed model of model.py; the raw JSON
+payloads are only kept when debug capture is enabled.
+"""
+from dataclasses import dataclass, field, replace
+from time import perf_counter, time
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, NamedTuple
+
+from .model import (
+    EMPTY,
+    PARSERS,
+    ApiConfigurationData,
+    BatteryData,
+    BatteryInfo,
+    BatterySystemData,
+    CommissioningSettingsData,
+    ConfigurationsData,
+    InverterData,
+    LatestData,
+    PowermeterKey,
+    PowermeterReading,
+    StatusData,
+    SystemData,
+    V2StatusData,
+)
+
+SECTION_PENDING = "pending"
+SECTION_OK = "ok"
+SECTION_ERROR = "error"
+SECTION_UNSUPPORTED = "unsupported"
+
+_EMPTY = MappingProxyType({})
+
+
+class SectionMeta(NamedTuple):
+    # time of the last SUCCESSFUL fetch of the section
+    fetched_at: float | None = None
+    # outcome of the last attempt (SECTION_*)
+    status: str = SECTION_PENDING
+    # error message of the last failed attempt
+    error: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """One consistent view of all sections. Never modified once published."""
+    status: StatusData = EMPTY["status"]
+    inverter: InverterData = EMPTY["inverter"]
+    battery: BatteryData = EMPTY["battery"]
+    battery_system: BatterySystemData = EMPTY["battery_system"]
+    system_data: SystemData = EMPTY["system_data"]
+    configurations: ConfigurationsData = EMPTY["configurations"]
+    api_configuration: ApiConfigurationData = EMPTY["api_configuration"]
+    latestdata: LatestData = EMPTY["latestdata"]
+    commissioning_settings: CommissioningSettingsData = EMPTY["commissioning_settings"]
+    v2_status: V2StatusData = EMPTY["v2_status"]
+    powermeter: Mapping[PowermeterKey, PowermeterReading] = field(default_factory=lambda: EMPTY["powermeter"])
+    battery_info: BatteryInfo = EMPTY["battery_info"]
+    meta: Mapping[str, SectionMeta] = field(default_factory=lambda: _EMPTY)
+    # the raw payloads, only kept while debug capture is enabled
+    raw: Mapping[str, Any] = field(default_factory=lambda: _EMPTY)
+    # when the snapshot was published
+    built_at: float = 0.0
+    # CPU time (seconds) spent normalizing, parsing, deriving and freezing the data
+    build_cost: float = 0.0
+
+    def has(self, section: str) -> bool:
+        """Whether the section has been fetched successfully at least once."""
+        meta = self.meta.get(section)
+        return meta is not None and meta.fetched_at is not None
+
+
+class SnapshotBuilder:
+    """Collects the sections of one cycle, starting from the current snapshot."""
+
+    __slots__ = ("sections", "meta", "raw", "_normalize", "_cost")
+
+    def __init__(self, base: Snapshot, normalize: Callable[[str, Any], Any], keep_raw: bool = False):
+        self.sections = {name: getattr(base, name) for name in PARSERS}
+        self.meta = dict(base.meta)
+        self.raw = dict(base.raw) if keep_raw else None
+        self._normalize = normalize
+        self._cost = 0.0
+
+    def set(self, section: str, payload: Any, fetched_at: float) -> None:
+        """Normalize and parse a payload - once, at ingest."""
+        started = perf_counter()
+        payload = self._normalize(section, payload)
+        self.sections[section] = PARSERS[section](payload)
+        if self.raw is not None:
+            self.raw[section] = payload
+        self.meta[section] = SectionMeta(fetched_at, SECTION_OK)
+        self._cost += perf_counter() - started
+
+    def patch(self, section: str, **changes) -> None:
+        """Change single values of a section without fetching it, e.g. from
+        the answer to a write. The fetch time is left alone on purpose: the
+        section still gets re-read by the next regular poll."""
+        started = perf_counter()
+        self.sections[section] = replace(self.sections[section], **changes)
+        self._cost += perf_counter() - started
+
+    def failed(self, section: str, error: str) -> None:
+        meta = self.meta.get(section, SectionMeta())
+        self.meta[section] = meta._replace(status=SECTION_ERROR, error=error)
+
+    def build(self, derive: Callable[[Mapping[str, Any]], BatteryInfo]) -> Snapshot:
+        """Freeze the collected sections; `derive` computes battery_info
+        from the collected ones."""
+        started = perf_counter()
+        battery_info = derive(self.sections)
+        meta = MappingProxyType(self.meta)
+        raw = MappingProxyType(self.raw) if self.raw is not None else _EMPTY
+        return Snapshot(
+            **self.sections,
+            battery_info=battery_info,
+            meta=meta,
+            raw=raw,
+            built_at=time(),
+            build_cost=self._cost + perf_counter() - started,
+        )
@@ -0,0 +1,111 @@
+"""Time-of-use schedule as objects.
+
+The battery stores its schedule as a JSON string (EM_ToU_Schedule). It's
+parsed ONCE per distinct string into an immutable TouSchedule; edits create
+new schedules, which compile back to the string the battery expects. Two
+schedules compare equal if they hold the same windows, however the strings
+they came from were formatted.
+"""
+import json
+from dataclasses import dataclass, replace
+from datetime import datetime, time
+
+from timeofuse import TimeofUseSchedule
+
+TIME_FORMAT = "%H:%M"
+
+
+def _format_time(value: str | time) -> str:
+    """Normalize "7:5", "07:05" and time objects to "07:05"."""
+    if isinstance(value, str):
+        value = datetime.strptime(value, TIME_FORMAT).time()
+    return value.strftime(TIME_FORMAT)
+
+
+@dataclass(frozen=True, slots=True)
+class TouWindow:
+    """One window in which the battery may charge from the grid"""
+    start: str
+    stop: str
+    threshold_p_max: int
+
+    @classmethod
+    def create(cls, start: str | time, stop: str | time, threshold_p_max) -> "TouWindow":
+        return cls(_format_time(start), _format_time(stop), int(threshold_p_max))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TouWindow":
+        return cls.create(data["start"], data["stop"], data["threshold_p_max"])
+
+    def as_dict(self) -> dict:
+        return {"start": self.start, "stop": self.stop, "threshold_p_max": self.threshold_p_max}
+
+
+@dataclass(frozen=True, slots=True)
+class TouSchedule:
+    """The windows of a schedule, ordered by their start"""
+    windows: tuple[TouWindow, ...] = ()
+
+    @classmethod
+    def parse(cls, text: str | None) -> "TouSchedule":
+        """Raises ValueError if `text` isn't a list of windows."""
+        if not text:
+            return cls()
+        try:
+            windows = [TouWindow.from_dict(window) for window in json.loads(text)]
+        except (TypeError, KeyError) as e:
+            raise ValueError(f"not a valid schedule: {text!r}") from e
+        return cls.from_windows(windows)
+
+    @classmethod
+    def from_windows(cls, windows) -> "TouSchedule":
+        """A schedule of the given windows, in any order."""
+        return cls(tuple(sorted(windows, key=lambda window: window.start)))
+
+    def compile(self) -> str:
+        """The string to write to EM_ToU_Schedule."""
+        return json.dumps(self.as_list())
+
+    def as_list(self) -> list[dict]:
+        return [window.as_dict() for window in self.windows]
+
+    def _index(self, start: str | time) -> int:
+        start = _format_time(start)
+        for index, window in enumerate(self.windows):
+            if window.start == start:
+                return index
+        raise ValueError(f"no window starts at {start}")
+
+    def add(self, window: TouWindow) -> "TouSchedule":
+        return self.from_windows(self.windows + (window,))
+
+    def remove(self, start: str | time) -> "TouSchedule":
+        index = self._index(start)
+        return TouSchedule(self.windows[:index] + self.windows[index + 1:])
+
+    def modify(self, start: str | time, /, **changes) -> "TouSchedule":
+        """Change start, stop and/or threshold_p_max of the window starting at `start`."""
+        index = self._index(start)
+        window = self.windows[index]
+        changed = TouWindow.create(**{
+            name: value if (value := changes.get(name)) is not None else getattr(window, name)
+            for name in ("start", "stop", "threshold_p_max")
+        })
+        return self.from_windows(self.windows[:index] + (changed,) + self.windows[index + 1:])
+
+    def capped(self, max_power: int) -> "TouSchedule":
+        """The schedule with no window exceeding `max_power`."""
+        if all(window.threshold_p_max <= max_power for window in self.windows):
+            return self
+        return TouSchedule(tuple(
+            replace(window, threshold_p_max=min(window.threshold_p_max, max_power))
+            for window in self.windows
+        ))
+
+    def validate(self) -> None:
+        """Check the windows the way the battery's client library does
+        (no overlaps, windows spanning midnight get split). Raises ValueError."""
+        try:
+            TimeofUseSchedule().load_tou_schedule_from_json(self.as_list())
+        except Exception as e:
+            raise ValueError(str(e)) from e
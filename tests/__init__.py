@@ -0,0 +1 @@
+"""Tests of the Sonnenbatterie integration."""
@@ -0,0 +1,139 @@
+"""Fakes of the battery the tests run against."""
+import copy
+
+SERIAL = "123456"
+
+# a battery in automatic mode, charging 1000 W from 2500 W of PV
+PAYLOADS = {
+    "status": {
+        "Consumption_W": 500,
+        "Production_W": 2500,
+        "GridFeedIn_W": 1000,
+        "Pac_total_W": -1000,
+        "RSOC": 60,
+        "USOC": 55,
+        "OperatingMode": "2",
+        "BatteryCharging": True,
+        "BatteryDischarging": False,
+    },
+    "v2_status": {"dischargeNotAllowed": False, "BackupBuffer": "10"},
+    "battery": {"measurements": {"battery_status": {"cyclecount": 100, "stateofhealth": 99.0}}},
+    "inverter": {"status": {"fac": 50.0}},
+    "powermeter": [
+        {"direction": "production", "deviceid": 4, "channel": 1, "w_total": 2500.0},
+        {"direction": "consumption", "deviceid": 4, "channel": 2, "w_total": 500.0},
+    ],
+    "battery_system": {
+        "modules": 2,
+        "battery_system": {
+            "system": {"storage_capacity_per_module": 5000, "inverter_capacity": 3300},
+            "software": {"software_version": "1.14.5", "firmware_version": "42"},
+        },
+    },
+    "system_data": {"ERP_ArticleName": "sonnenBatterie 10", "software_version": "1.14.5"},
+    "configurations": {"EM_OperatingMode": "2", "EM_USOC": "10", "EM_ToU_Schedule": "[]"},
+    "api_configuration": {"IN_LocalAPIReadActive": "1", "IN_LocalAPIWriteActive": "1"},
+    "latestdata": {"ic_status": {}},
+    "commissioning_settings": {"data": {"attributes": {"tou_max_power_limit": 4000}}},
+}
+
+
+class HttpError(Exception):
+    """An error answer of the battery; the client library's errors carry the
+    HTTP status the same way."""
+
+    def __init__(self, status: int) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class FakeBattery:
+    """Stands in for AsyncSonnenBatterie: answers with PAYLOADS (or the
+    errors set for a section) and records the writes."""
+
+    def __init__(self) -> None:
+        self.payloads = copy.deepcopy(PAYLOADS)
+        # section -> exception raised instead of answering
+        self.errors: dict[str, Exception] = {}
+        # command -> exceptions raised by its next calls, one per call
+        self.write_errors: dict[str, list[Exception]] = {}
+        # section -> times it was read
+        self.reads: dict[str, int] = {}
+        # (command, arguments) in the order they arrived
+        self.writes: list[tuple] = []
+        self.logins = 0
+        self.sb2 = None
+
+    async def login(self) -> None:
+        self.logins += 1
+        self.sb2 = FakeBatteryV2(self)
+
+    async def logout(self) -> None:
+        self.sb2 = None
+
+    async def answer(self, section: str):
+        self.reads[section] = self.reads.get(section, 0) + 1
+        if (error := self.errors.get(section)) is not None:
+            raise error
+        return copy.deepcopy(self.payloads[section])
+
+    async def write(self, command: str, *args, answer=None):
+        if errors := self.write_errors.get(command):
+            raise errors.pop(0)
+        self.writes.append((command, *args))
+        return answer
+
+    async def get_status(self):
+        return await self.answer("status")
+
+    async def get_battery(self):
+        return await self.answer("battery")
+
+    async def get_inverter(self):
+        return await self.answer("inverter")
+
+    async def get_powermeter(self):
+        return await self.answer("powermeter")
+
+    async def get_batterysystem(self):
+        return await self.answer("battery_system")
+
+    async def get_systemdata(self):
+        return await self.answer("system_data")
+
+    async def get_api_configuration(self):
+        return await self.answer("api_configuration")
+
+    async def get_commissioning_settings(self):
+        return await self.answer("commissioning_settings")
+
+
+class FakeBatteryV2:
+    """The v2 client (sbconn.sb2) of a FakeBattery session"""
+
+    def __init__(self, battery: FakeBattery) -> None:
+        self._battery = battery
+
+    async def get_status(self):
+        return await self._battery.answer("v2_status")
+
+    async def get_configurations(self):
+        return await self._battery.answer("configurations")
+
+    async def get_latest_data(self):
+        return await self._battery.answer("latestdata")
+
+    async def charge_battery(self, watts: int):
+        return await self._battery.write("charge", watts, answer=True)
+
+    async def discharge_battery(self, watts: int):
+        return await self._battery.write("discharge", watts, answer=True)
+
+    async def set_battery_reserve(self, percent: int):
+        return await self._battery.write("battery_reserve", percent, answer={"EM_USOC": str(percent)})
+
+    async def set_config_item(self, item: str, value):
+        return await self._battery.write("config_item", item, value, answer={item: str(value)})
+
+    async def set_tou_schedule_string(self, schedule: str):
+        return await self._battery.write("tou_schedule", schedule, answer={"EM_ToU_Schedule": schedule})
@@ -0,0 +1,49 @@
+"""Fixtures running the coordinator in Home Assistant against a fake battery."""
+from unittest.mock import patch
+
+import pytest
+from homeassistant.const import CONF_IP_ADDRESS, CONF_PASSWORD, CONF_USERNAME
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.sonnenbatterie.const import CONF_COORDINATOR, CONF_TOU_MAX, DOMAIN
+from custom_components.sonnenbatterie.coordinator import SonnenbatterieCoordinator
+from custom_components.sonnenbatterie.service import SonnenbatterieService
+
+from .common import SERIAL, FakeBattery
+
+
+@pytest.fixture
+def battery() -> FakeBattery:
+    return FakeBattery()
+
+
+@pytest.fixture
+def config_entry(hass) -> MockConfigEntry:
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title=f"{DOMAIN} {SERIAL}",
+        unique_id=SERIAL,
+        data={CONF_USERNAME: "User", CONF_PASSWORD: "secret", CONF_IP_ADDRESS: "192.0.2.1"},
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+@pytest.fixture
+async def coordinator(hass, config_entry, battery):
+    with patch("custom_components.sonnenbatterie.coordinator.AsyncSonnenBatterie", return_value=battery):
+        coordinator = SonnenbatterieCoordinator(hass, config_entry, SERIAL)
+    yield coordinator
+    # no read-back left pending after the test
+    coordinator._cancel_verification()
+
+
+@pytest.fixture
+async def service(hass, config_entry, coordinator) -> SonnenbatterieService:
+    """The services of a set-up battery, after its first poll."""
+    await coordinator._async_update_data()
+    hass.data.setdefault(DOMAIN, {})[config_entry.entry_id] = {
+        CONF_COORDINATOR: coordinator,
+        CONF_TOU_MAX: 4000,
+    }
+    return SonnenbatterieService(hass, config_entry, coordinator)
@@ -0,0 +1,37 @@
+"""Capability probe results and payload normalization."""
+from custom_components.sonnenbatterie.capabilities import (
+    Capabilities,
+    is_auth_error,
+    is_unsupported_error,
+    normalize,
+)
+
+from .common import HttpError
+
+METERS = [{"direction": "production", "deviceid": 4, "channel": 1}, {"direction": "consumption", "deviceid": 4, "channel": 2}]
+
+
+def test_dict_powermeter_becomes_a_list():
+    assert list(normalize("powermeter", {"0": METERS[0], "1": METERS[1]})) == METERS
+    assert normalize("powermeter", METERS) is METERS
+    assert normalize("status", {"0": 1}) == {"0": 1}
+
+
+def test_error_classes():
+    assert is_unsupported_error(HttpError(404))
+    assert not is_unsupported_error(HttpError(503))
+    assert not is_unsupported_error(TimeoutError())
+    assert is_auth_error(HttpError(401))
+    assert not is_auth_error(HttpError(500))
+
+
+def test_stored_capabilities():
+    capabilities = Capabilities("1.14.5 (42)", ("latestdata",))
+    assert not capabilities.supports("latestdata")
+    assert capabilities.supports("status")
+    restored = Capabilities.from_dict(capabilities.as_dict())
+    assert restored.firmware == capabilities.firmware
+    assert restored.unsupported == capabilities.unsupported
+    # stored by an older version
+    assert Capabilities.from_dict({"firmware": "x", "unsupported": [], "powermeter_shape": "dict"}).firmware == "x"
+    assert Capabilities.from_dict(None) is None
@@ -0,0 +1,47 @@
+"""The command pipeline every write goes through."""
+import pytest
+
+from .common import HttpError
+
+
+async def test_write_is_patched_in_and_read_back_later(coordinator, battery):
+    await coordinator._async_update_data()
+    response = await coordinator.async_execute("battery_reserve", 20)
+    assert response == {"EM_USOC": "20"}
+    assert battery.writes == [("battery_reserve", 20)]
+    # the answer is in the snapshot right away, without reading it again
+    assert coordinator.snapshot.configurations.usoc == "20"
+    assert battery.reads["configurations"] == 1
+    assert coordinator._unverified == {"configurations"}
+
+
+async def test_writes_share_one_read_back(coordinator, battery):
+    await coordinator._async_update_data()
+    await coordinator.async_execute("battery_reserve", 20)
+    await coordinator.async_execute("operating_mode", "1")
+    await coordinator._async_verify()
+    assert battery.reads["configurations"] == 2
+    assert battery.reads["status"] == 2
+    assert not coordinator._unverified
+
+
+async def test_failed_write_is_retried_on_a_new_session(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.write_errors["charge"] = [HttpError(401)]
+    await coordinator.async_execute("charge", 1500)
+    assert battery.writes == [("charge", 1500)]
+    assert battery.logins == 2
+    metrics = coordinator.command_metrics["charge"]
+    assert (metrics["count"], metrics["retries"], metrics["failed"]) == (1, 1, 0)
+    assert coordinator.setpoints.commanded == 1500
+
+
+async def test_write_fails_after_the_retry(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.write_errors["discharge"] = [TimeoutError(), TimeoutError()]
+    with pytest.raises(TimeoutError):
+        await coordinator.async_execute("discharge", 1500)
+    assert battery.writes == []
+    assert coordinator.command_metrics["discharge"]["failed"] == 1
+    assert coordinator.setpoints.commanded is None
+    assert not coordinator._unverified
@@ -0,0 +1,48 @@
+"""The PI grid controller."""
+from custom_components.sonnenbatterie.controller import ControllerSettings, PiController
+
+
+def _controller(**settings) -> PiController:
+    return PiController(ControllerSettings(enabled=True, **settings))
+
+
+def test_deadband():
+    controller = _controller()
+    assert controller.update(50, None, 3000) is None
+    assert controller.update(-50, None, 3000) is None
+    assert controller.output == 0
+
+
+def test_step_limit_and_saturation_without_windup():
+    controller = _controller()
+    # ki * 5000 W exported = 3500 W, limited to max_step
+    assert controller.update(5000, None, 2000) == 1000
+    controller.written = 1000
+    assert controller.update(5000, 1000, 2000) == 2000
+    controller.written = 2000
+    # held at the inverter limit, the setpoint doesn't wind up beyond it
+    assert controller.update(5000, 2000, 2000) is None
+    assert controller.output == 2000
+    # importing now: 0.7 * -1000 + 0.3 * (-1000 - 5000) = -2500 -> -1000
+    assert controller.update(-1000, 2000, 2000) == 1000
+
+
+def test_saturated_battery_restarts_from_measured_power():
+    controller = _controller()
+    controller.output = 2000.0
+    # the battery (full) charges with 0 W instead of 2000 W
+    assert controller.update(100, 0, 3000) == 70
+
+
+def test_export_target():
+    controller = _controller(target=500)
+    assert controller.update(500, None, 3000) is None
+    # 200 W short of the export target -> discharge: 0.7 * -200 + 0.3 * (-200 - 0)
+    assert controller.update(300, None, 3000) == -200
+
+
+def test_settings_from_dict():
+    settings = ControllerSettings.from_dict({"enabled": True, "target": 100, "unknown": 1})
+    assert settings.enabled and settings.target == 100
+    assert ControllerSettings.from_dict(settings.as_dict()) == settings
+    assert ControllerSettings.from_dict(None) == ControllerSettings()
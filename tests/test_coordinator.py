@@ -0,0 +1,125 @@
+"""The coordinator's poll cycle against a fake battery."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.sonnenbatterie.const import DOMAIN
+from custom_components.sonnenbatterie.snapshot import SECTION_ERROR, SECTION_OK
+
+from .common import HttpError
+
+
+async def test_dict_powermeter_before_the_capability_probe(coordinator, battery):
+    # older firmware: the powermeter keyed by position
+    battery.payloads["powermeter"] = {str(index): meter for index, meter in enumerate(battery.payloads["powermeter"])}
+    # the battery is busy, the capability probe fails
+    battery.errors["latestdata"] = HttpError(503)
+    snapshot = await coordinator._async_update_data()
+    assert coordinator._capabilities is None
+    assert set(snapshot.powermeter) == {("production", 4, 1), ("consumption", 4, 2)}
+    assert snapshot.powermeter["production", 4, 1].w_total == 2500.0
+
+
+async def test_malformed_section_fails_alone(coordinator, battery):
+    battery.payloads["v2_status"] = ["not", "an", "object"]
+    snapshot = await coordinator._async_update_data()
+    assert snapshot.meta["v2_status"].status == SECTION_ERROR
+    assert snapshot.meta["status"].status == SECTION_OK
+    assert snapshot.status.usoc == 55
+    # a single failing section says nothing about the session
+    await coordinator._async_update_data()
+    assert battery.logins == 1
+
+
+async def test_all_sections_failing_renews_the_session(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.errors = dict.fromkeys(battery.payloads, TimeoutError())
+    await coordinator._async_update_data()
+    battery.errors = {}
+    await coordinator._async_update_data()
+    assert battery.logins == 2
+
+
+async def test_auth_error_renews_the_session(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.errors["status"] = HttpError(401)
+    await coordinator._async_update_data()
+    del battery.errors["status"]
+    snapshot = await coordinator._async_update_data()
+    assert battery.logins == 2
+    assert snapshot.meta["status"].status == SECTION_OK
+
+
+async def test_read_back_keeps_the_session_on_a_busy_section(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.errors["configurations"] = HttpError(503)
+    coordinator._unverified = {"configurations", "v2_status"}
+    await coordinator._async_verify()
+    assert coordinator._unverified == {"configurations"}
+    del battery.errors["configurations"]
+    await coordinator._async_update_data()
+    assert battery.logins == 1
+
+
+async def test_read_back_renews_the_session_on_an_auth_error(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.errors["configurations"] = HttpError(403)
+    coordinator._unverified = {"configurations", "v2_status"}
+    await coordinator._async_verify()
+    del battery.errors["configurations"]
+    await coordinator._async_update_data()
+    assert battery.logins == 2
+
+
+async def test_failed_read_renews_the_session_only_on_an_auth_error(coordinator, battery):
+    await coordinator._async_update_data()
+    battery.errors["status"] = HttpError(503)
+    with pytest.raises(HomeAssistantError):
+        await coordinator.async_read_section("status")
+    battery.errors["status"] = HttpError(401)
+    with pytest.raises(HomeAssistantError):
+        await coordinator.async_read_section("status")
+    del battery.errors["status"]
+    await coordinator.async_read_section("status")
+    assert battery.logins == 2
+
+
+async def test_concurrent_reads_share_one_request(coordinator, battery):
+    await coordinator._async_update_data()
+    # the poll holds the lock: both readers queue behind it
+    async with coordinator.io_lock:
+        first = asyncio.ensure_future(coordinator.async_read_section("configurations"))
+        second = asyncio.ensure_future(coordinator.async_read_section("configurations"))
+        await asyncio.sleep(0)
+    assert await first is await second
+    assert battery.reads["configurations"] == 2
+
+
+async def test_read_after_a_finished_one_asks_again(coordinator, battery):
+    await coordinator._async_update_data()
+    await coordinator.async_read_section("configurations")
+    await coordinator.async_read_section("configurations")
+    assert battery.reads["configurations"] == 3
+    # unless the snapshot is recent enough
+    await coordinator.async_read_section("configurations", max_age=60)
+    assert battery.reads["configurations"] == 3
+
+
+async def test_unload_saves_the_energy_counters(hass, hass_storage, config_entry, coordinator):
+    unload = coordinator.async_listen_stop()
+    await coordinator._async_update_data()
+    await unload()
+    stored = hass_storage[f"{DOMAIN}.{config_entry.entry_id}.energy"]["data"]
+    assert stored["totals"] == dict(coordinator.energy.totals)
+
+
+async def test_stop_saves_the_energy_counters_once(hass, coordinator):
+    unload = coordinator.async_listen_stop()
+    with patch.object(coordinator, "async_save_energy") as save:
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+        await unload()
+    save.assert_awaited_once_with()
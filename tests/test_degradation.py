@@ -0,0 +1,79 @@
+"""Rainflow cycle counting and the capacity estimate."""
+import pytest
+
+from custom_components.sonnenbatterie.degradation import Degradation
+
+
+def _feed(degradation: Degradation, socs, net=0.0, installed=None):
+    for soc in socs:
+        degradation.sample(soc, net, True, installed)
+
+
+def test_rainflow_full_and_half_cycle():
+    degradation = Degradation()
+    # 80 -> 60 is closed by the larger 60 -> 90: one full cycle of 20 %
+    _feed(degradation, (50, 80, 60, 90, 50))
+    assert degradation.histogram[2] == 1.0
+    assert degradation.cycles == pytest.approx(0.2)
+    assert degradation._reversals == [50, 90]
+
+    # 50 -> 90 -> 50 at the bottom of the stack: half a cycle of 40 %
+    _feed(degradation, (70,))
+    assert degradation.histogram[4] == 0.5
+    assert degradation.cycles == pytest.approx(0.4)
+    assert degradation._reversals == [90, 50]
+    assert sum(degradation.histogram) == 1.5
+
+
+def test_rainflow_ignores_jitter():
+    degradation = Degradation()
+    _feed(degradation, (50, 51, 50, 51, 50.5, 51))
+    assert degradation.cycles == 0
+    assert degradation.as_dict()["open_cycles"] == 1
+
+
+def _swing(degradation: Degradation, start, stop, wh_per_percent, net, installed, gap_at=None):
+    step = 1 if stop > start else -1
+    for soc in range(start, stop + step, step):
+        degradation.sample(soc, net, soc != gap_at, installed)
+        net += wh_per_percent * step
+    return net - wh_per_percent * step
+
+
+def test_capacity_from_charge_and_discharge_swings():
+    degradation = Degradation()
+    net = _swing(degradation, 20, 60, 100.0, 0.0, 10000)
+    # the charge swing closes as the SoC turns
+    net = _swing(degradation, 59, 30, 90.0, net - 90.0, 10000)
+    assert degradation.estimates == {"charge": pytest.approx(10000)}
+    degradation.sample(31, net + 90.0, True, 10000)
+    assert degradation.estimates["discharge"] == pytest.approx(9000)
+    assert degradation.capacity == pytest.approx(9500)
+    assert degradation.state_of_health(10000) == 95.0
+    assert degradation.swings == 2
+
+
+def test_capacity_gap_drops_the_swing():
+    degradation = Degradation()
+    # after the gap at 40 % only 19 % of the swing are left
+    net = _swing(degradation, 20, 60, 100.0, 0.0, 10000, gap_at=40)
+    degradation.sample(59, net - 100.0, True, 10000)
+    assert degradation.estimates == {}
+    assert degradation.capacity is None
+
+
+def test_capacity_implausible_estimate_is_dropped():
+    degradation = Degradation()
+    net = _swing(degradation, 20, 60, 100.0, 0.0, 5000)
+    degradation.sample(59, net - 100.0, True, 5000)
+    assert degradation.estimates == {}
+
+
+def test_stored_state_round_trip():
+    degradation = Degradation()
+    _feed(degradation, (50, 80, 60, 90, 50, 70))
+    restored = Degradation()
+    restored.restore(degradation.as_stored())
+    assert restored.histogram == degradation.histogram
+    assert restored.cycles == degradation.cycles
+    assert restored.as_dict() == degradation.as_dict()
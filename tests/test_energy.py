@@ -0,0 +1,49 @@
+"""Energy counters integrated from the power samples."""
+import pytest
+
+from custom_components.sonnenbatterie.energy import EnergyCounters, Outcome
+from custom_components.sonnenbatterie.model import StatusData
+
+
+def _status(pac=0, grid=0, production=0, consumption=0) -> StatusData:
+    return StatusData.from_payload(
+        {"Pac_total_W": pac, "GridFeedIn_W": grid, "Production_W": production, "Consumption_W": consumption}
+    )
+
+
+def test_trapezoid_over_an_hour():
+    counters = EnergyCounters(max_gap=7200)
+    assert counters.sample(_status(pac=-1000, production=2000, consumption=500), 0) == Outcome(False, True)
+    assert counters.sample(_status(pac=-3000, production=4000, consumption=1500), 3600) == Outcome(True, False)
+    assert counters.totals["battery_charge"] == pytest.approx(2000)
+    assert counters.totals["battery_discharge"] == 0
+    assert counters.totals["production"] == pytest.approx(3000)
+    assert counters.totals["consumption"] == pytest.approx(1000)
+    assert counters.kwh("production") == 3.0
+
+
+def test_sign_change_is_split_at_the_zero_crossing():
+    counters = EnergyCounters(max_gap=7200)
+    counters.sample(_status(grid=1000, production=-20), 0)
+    counters.sample(_status(grid=-3000), 3600)
+    # exporting for the first quarter of the hour, importing for the rest
+    assert counters.totals["grid_export"] == pytest.approx(125)
+    assert counters.totals["grid_import"] == pytest.approx(1125)
+    # production below 0 at night counts as 0
+    assert counters.totals["production"] == 0
+
+
+def test_repeated_sample_and_gap():
+    counters = EnergyCounters(max_gap=60)
+    counters.sample(_status(consumption=1000), 0)
+    # the same sample again is no gap
+    assert counters.sample(_status(consumption=1000), 0) == Outcome(False, False)
+    assert counters.sample(_status(consumption=1000), 30) == Outcome(True, False)
+    assert counters.sample(_status(consumption=1000), 120) == Outcome(False, True)
+    assert counters.sample(_status(consumption=1000), 150) == Outcome(True, False)
+    assert counters.totals["consumption"] == pytest.approx(1000 * 60 / 3600)
+
+
+def test_incomplete_sample():
+    counters = EnergyCounters(max_gap=60)
+    assert counters.sample(StatusData.from_payload({}), 0) == Outcome(False, False)
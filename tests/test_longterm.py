@@ -0,0 +1,30 @@
+"""The hour in progress of the statistics import on stop and unload."""
+from unittest.mock import patch
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+
+from custom_components.sonnenbatterie.longterm import StatisticsImporter
+
+
+async def test_stop_keeps_the_hour_once(hass, config_entry, coordinator):
+    importer = StatisticsImporter(hass, coordinator, config_entry)
+    with patch.object(importer, "async_shutdown") as shutdown:
+        unload = importer.async_listen_stop()
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+        unload()
+    shutdown.assert_called_once_with()
+
+
+async def test_unload_keeps_the_hour_and_drops_the_stop_listener(hass, config_entry, coordinator):
+    importer = StatisticsImporter(hass, coordinator, config_entry)
+    listeners = hass.bus.async_listeners().get(EVENT_HOMEASSISTANT_STOP, 0)
+    with patch.object(importer, "async_shutdown") as shutdown:
+        unload = importer.async_listen_stop()
+        unload()
+        assert hass.bus.async_listeners().get(EVENT_HOMEASSISTANT_STOP, 0) == listeners
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+    shutdown.assert_called_once_with()
@@ -0,0 +1,52 @@
+"""The TOU schedule optimizer."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from custom_components.sonnenbatterie.optimizer import BatteryParams, Plan, optimize
+from custom_components.sonnenbatterie.tou import TouWindow
+
+START = datetime(2026, 1, 1)
+HOUR = timedelta(hours=1)
+# 1 kWh, empty, no losses; charges or discharges it completely in an hour
+PARAMS = BatteryParams(capacity=1000, usoc=0, reserve=0, max_power=1000, grid_limit=1000, efficiency=1.0)
+
+
+def test_charges_in_the_cheap_slot():
+    plan = optimize([0.10, 0.30], PARAMS, START, HOUR, load=[0, 1000])
+    assert plan.charge.tolist() == [True, False]
+    assert plan.usoc.tolist() == pytest.approx([100, 0])
+    assert plan.grid.tolist() == pytest.approx([1000, 0])
+    assert plan.cost == pytest.approx(0.10)
+    assert plan.baseline_cost == pytest.approx(0.30)
+    assert plan.windows() == [(START, START + HOUR)]
+
+
+def test_no_charging_ahead_of_a_cheaper_slot():
+    plan = optimize([0.30, 0.10], PARAMS, START, HOUR, load=[0, 1000])
+    assert not plan.charge[0]
+    assert plan.cost == pytest.approx(0.10)
+    assert plan.baseline_cost == pytest.approx(0.10)
+
+
+def test_no_charging_for_the_battery_alone():
+    # what's left at the end isn't worth buying
+    plan = optimize([0.10, 0.30], PARAMS, START, HOUR)
+    assert not plan.charge.any()
+    assert plan.cost == plan.baseline_cost == 0
+
+
+def test_horizon_is_capped_at_a_day():
+    plan = optimize([0.2] * 30, PARAMS, START, HOUR)
+    assert len(plan.charge) == 24
+    with pytest.raises(ValueError):
+        optimize([], PARAMS, START, HOUR)
+
+
+def test_schedule_across_midnight():
+    start = datetime(2026, 1, 1, 22)
+    charge = np.array([False, True, True, True, False])
+    plan = Plan(start, HOUR, charge, np.zeros(5), np.zeros(5), 0.0, 0.0)
+    assert plan.windows() == [(start + HOUR, start + 4 * HOUR)]
+    assert plan.schedule(2000).windows == (TouWindow("23:00", "02:00", 2000),)
@@ -0,0 +1,37 @@
+"""Time until full or empty."""
+import pytest
+
+from custom_components.sonnenbatterie.predictor import SocPredictor
+
+
+def test_regression():
+    predictor = SocPredictor()
+    # 1 % a minute
+    for minute in range(11):
+        predictor.sample(50 + minute, -1000, 1000.0 + minute * 60)
+    rate, method = predictor.rate(None)
+    assert method == "regression"
+    assert rate == pytest.approx(60)
+    assert predictor.minutes_to(100, None) == pytest.approx(40)
+    # not heading there
+    assert predictor.minutes_to(10, None) is None
+
+
+def test_power_fallback():
+    predictor = SocPredictor()
+    # the SoC hasn't moved; charging 1000 W at 100 Wh per %
+    for minute in range(3):
+        predictor.sample(50, -1000, 1000.0 + minute * 60)
+    assert predictor.rate(100) == (pytest.approx(10), "power")
+    assert predictor.minutes_to(60, 100) == pytest.approx(60)
+    assert predictor.rate(None) is None
+    assert predictor.minutes_to(50, None) == 0
+
+
+def test_old_samples_leave_the_window():
+    predictor = SocPredictor()
+    predictor.sample(20, 1000, 0.0)
+    predictor.sample(30, -1000, 1000.0)
+    predictor.sample(30, -1000, 1060.0)
+    # only the two charging samples are left
+    assert predictor.rate(100) == (pytest.approx(10), "power")
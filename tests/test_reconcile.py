@@ -0,0 +1,43 @@
+"""The setpoint reconciliation on plain status samples."""
+from custom_components.sonnenbatterie.model import StatusData, V2StatusData
+from custom_components.sonnenbatterie.reconcile import SampleContext, SetpointTracker
+
+MANUAL = "1"
+AUTOMATIC = "2"
+
+
+def context(mode: str, pac: float = 0.0, usoc: float = 50) -> SampleContext:
+    return SampleContext(
+        StatusData.from_payload({"OperatingMode": mode, "Pac_total_W": pac, "USOC": usoc}),
+        V2StatusData.from_payload({"dischargeNotAllowed": False}),
+        10,
+    )
+
+
+def test_back_in_manual_mode_resends_a_recent_setpoint():
+    tracker = SetpointTracker()
+    tracker.command(2000, 0.0)
+    assert tracker.sample(context(MANUAL, -2000), 10.0) is None
+    assert tracker.sample(context(AUTOMATIC), 20.0) is None
+    assert tracker.sample(context(MANUAL), 30.0) == 2000
+
+
+def test_back_in_manual_mode_drops_a_stale_setpoint():
+    tracker = SetpointTracker()
+    tracker.command(2000, 0.0)
+    assert tracker.sample(context(AUTOMATIC), 10.0) is None
+    assert tracker.sample(context(MANUAL), SetpointTracker.RESEND_WINDOW + 10.0) is None
+    assert tracker.commanded is None
+    # and it isn't resent as a dropped command either
+    for at in range(1000, 1000 + 10 * SetpointTracker.DROPPED_AFTER, 10):
+        assert tracker.sample(context(MANUAL), float(at)) is None
+
+
+def test_idle_battery_gets_the_setpoint_once_more():
+    tracker = SetpointTracker()
+    tracker.command(2000, 0.0)
+    answers = [tracker.sample(context(MANUAL), float(at)) for at in range(10, 10 + 10 * SetpointTracker.DROPPED_AFTER, 10)]
+    assert answers[-1] == 2000
+    tracker.command(2000, 40.0, resend=True)
+    assert tracker.resends == 1
+    assert tracker.sample(context(MANUAL), 50.0) is None
@@ -0,0 +1,117 @@
+"""The services against a fake battery."""
+import json
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import ServiceCall
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import device_registry as dr
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.sonnenbatterie.const import CONF_COORDINATOR, CONF_TOU_MAX, DOMAIN
+from custom_components.sonnenbatterie.coordinator import SonnenbatterieCoordinator
+
+from .common import FakeBattery
+
+WINDOW = {"start": "10:00", "stop": "14:00", "threshold_p_max": 3000}
+
+
+def service_call(hass, service: str, **data) -> ServiceCall:
+    return ServiceCall(hass, DOMAIN, service, data)
+
+
+async def test_set_tou_schedule_answers_the_schedule_string(hass, service, battery):
+    response = await service.set_tou_schedule(service_call(hass, "set_tou_schedule", schedule=json.dumps([WINDOW])))
+    assert response == {
+        "schedule": json.dumps([WINDOW]),
+        "windows": [WINDOW],
+        "changed": True,
+        "written": True,
+    }
+    assert battery.writes == [("tou_schedule", json.dumps([WINDOW]))]
+
+
+async def test_dry_run_doesnt_write(hass, service, battery):
+    response = await service.add_tou_window(service_call(hass, "add_tou_window", dry_run=True, **WINDOW))
+    assert response["windows"] == [WINDOW]
+    assert (response["changed"], response["written"]) == (True, False)
+    assert battery.writes == []
+
+
+async def test_unchanged_schedule_isnt_written_again(hass, service, battery):
+    response = await service.set_tou_schedule(service_call(hass, "set_tou_schedule", schedule="[]"))
+    assert response == {"schedule": "[]", "windows": [], "changed": False, "written": False}
+    assert battery.writes == []
+
+
+async def test_timed_setpoints_need_the_write_api(hass, service, coordinator):
+    with pytest.raises(ServiceValidationError, match=coordinator.serial):
+        await service.set_setpoint_schedule(service_call(hass, "set_setpoint_schedule"))
+
+
+async def test_apply_runs_the_operations_in_order(hass, service, coordinator, battery):
+    operations = [{"operating_mode": "manual"}, {"battery_reserve": 20}, {"charge": 1000}]
+    response = await service.apply(service_call(hass, "apply", operations=operations))
+    assert response["success"]
+    assert [result["status"] for result in response["results"]] == ["ok", "ok", "ok"]
+    assert battery.writes == [("config_item", "EM_OperatingMode", 1), ("battery_reserve", 20), ("charge", 1000)]
+    assert (coordinator.snapshot.configurations.operating_mode, coordinator.snapshot.configurations.usoc) == ("1", "20")
+    # one read-back of everything touched
+    assert coordinator._unverified == {"configurations", "status"}
+
+
+async def test_apply_stops_at_the_first_failure(hass, service, coordinator, battery):
+    battery.write_errors["battery_reserve"] = [TimeoutError(), TimeoutError()]
+    operations = [{"operating_mode": "manual"}, {"battery_reserve": 20}, {"charge": 1000}]
+    response = await service.apply(service_call(hass, "apply", operations=operations))
+    assert not response["success"]
+    assert [result["status"] for result in response["results"]] == ["ok", "failed", "skipped"]
+    assert battery.writes == [("config_item", "EM_OperatingMode", 1)]
+    assert coordinator.snapshot.configurations.usoc == "10"
+
+
+async def _second_battery(hass, config_entry) -> tuple[SonnenbatterieCoordinator, FakeBattery]:
+    battery = FakeBattery()
+    entry = MockConfigEntry(domain=DOMAIN, title=f"{DOMAIN} 654321", unique_id="654321", data=dict(config_entry.data))
+    entry.add_to_hass(hass)
+    with patch("custom_components.sonnenbatterie.coordinator.AsyncSonnenBatterie", return_value=battery):
+        coordinator = SonnenbatterieCoordinator(hass, entry, "654321")
+    await coordinator._async_update_data()
+    hass.data[DOMAIN][entry.entry_id] = {CONF_COORDINATOR: coordinator, CONF_TOU_MAX: 4000}
+    return coordinator, battery
+
+
+def _device_id(hass, coordinator: SonnenbatterieCoordinator) -> str:
+    """The device as the entities register it"""
+    registry = dr.async_get(hass)
+    return registry.async_get_or_create(config_entry_id=coordinator._config_entry.entry_id, **coordinator.device_info).id
+
+
+async def test_fan_out_answers_per_device(hass, service, config_entry, coordinator, battery):
+    second, second_battery = await _second_battery(hass, config_entry)
+    second_battery.write_errors["charge"] = [TimeoutError(), TimeoutError()]
+    first_id = _device_id(hass, coordinator)
+    second_id = _device_id(hass, second)
+    response = await service.charge_battery(service_call(hass, "charge_battery", device_id=[first_id, second_id], power=1000))
+    assert response[first_id] == {"charge": True}
+    assert "error" in response[second_id]
+    assert battery.writes == [("charge", 1000)]
+
+
+async def test_fan_out_fails_if_all_devices_fail(hass, service, config_entry, coordinator, battery):
+    second, second_battery = await _second_battery(hass, config_entry)
+    for fake in (battery, second_battery):
+        fake.write_errors["charge"] = [TimeoutError(), TimeoutError()]
+    device_ids = [_device_id(hass, coordinator), _device_id(hass, second)]
+    with pytest.raises(HomeAssistantError, match="failed for all devices"):
+        await service.charge_battery(service_call(hass, "charge_battery", device_id=device_ids, power=1000))
+
+
+async def test_get_services_read_the_battery_unless_recent_enough(hass, service, battery):
+    response = await service.get_battery_reserve(service_call(hass, "get_battery_reserve", max_age=60))
+    assert response == {"backup_reserve": 10}
+    assert battery.reads["configurations"] == 1
+    battery.payloads["configurations"]["EM_USOC"] = "15"
+    response = await service.get_battery_reserve(service_call(hass, "get_battery_reserve"))
+    assert response == {"backup_reserve": 15}
+    assert battery.reads["configurations"] == 2
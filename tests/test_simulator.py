@@ -0,0 +1,88 @@
+"""Backtesting of reserves and TOU schedules."""
+import numpy as np
+import pytest
+
+from custom_components.sonnenbatterie.simulator import (
+    BatteryUnit,
+    Candidate,
+    Telemetry,
+    _grid_limits,
+    simulate,
+)
+from custom_components.sonnenbatterie.tou import TouSchedule, TouWindow
+
+# 1 kWh, empty, no losses
+UNIT = BatteryUnit(capacity=1000, max_power=1000, usoc=0, efficiency=1.0)
+
+
+def _telemetry(production, consumption, minutes=None, **kwargs) -> Telemetry:
+    steps = len(production)
+    return Telemetry(
+        hours=1.0,
+        minutes=np.asarray(minutes if minutes is not None else np.arange(steps) * 60),
+        production=np.asarray(production, dtype=float),
+        consumption=np.asarray(consumption, dtype=float),
+        grid_feed_in=np.full(steps, np.nan),
+        **kwargs,
+    )
+
+
+def test_window_across_midnight():
+    limits = _grid_limits(TouSchedule((TouWindow("22:00", "02:00", 1000),)))
+    assert np.isnan(limits[120:1320]).all()
+    assert (limits[1320:] == 1000).all()
+    assert (limits[:120] == 1000).all()
+
+
+def test_window_ending_at_midnight():
+    limits = _grid_limits(TouSchedule((TouWindow("23:00", "00:00", 500),)))
+    assert (limits[1380:] == 500).all()
+    assert np.isnan(limits[:1380]).all()
+
+
+def test_reserve_keeps_the_energy_in_the_battery():
+    # the PV surplus of the first hour covers the demand of the second
+    telemetry = _telemetry([1000, 0], [0, 1000])
+    result = simulate(telemetry, UNIT, [Candidate(0), Candidate(100)], 0.30)
+    free, reserved = result["results"]
+    assert free["import_kwh"] == 0 and free["export_kwh"] == 0
+    assert free["cycles"] == 1.0
+    assert reserved["import_kwh"] == 1.0 and reserved["cost"] == 0.3
+    assert result["recorded"] is None
+
+
+def test_tou_window_charges_from_the_grid():
+    telemetry = _telemetry([0, 0], [0, 1000])
+    schedule = TouSchedule((TouWindow("00:00", "01:00", 1000),))
+    prices = [0.10] + [0.30] * 23
+    automatic, timeofuse = simulate(telemetry, UNIT, [Candidate(0), Candidate(0, schedule)], prices)["results"]
+    assert automatic["import_kwh"] == 1.0 and automatic["cost"] == 0.3
+    assert timeofuse["import_kwh"] == 1.0 and timeofuse["cost"] == 0.1
+
+
+def test_run_restarts_after_a_gap():
+    telemetry = _telemetry([1000, 0], [0, 1000], breaks=np.array([False, True]), expected=4)
+    result = simulate(telemetry, UNIT, [Candidate(0)], 0.30)
+    # the charge of the first run isn't carried over into the second
+    assert result["results"][0]["import_kwh"] == 1.0
+    assert result["coverage"] == {"steps": 2, "expected": 4, "share": 0.5, "runs": 2}
+
+
+def test_recorded_grid():
+    telemetry = Telemetry(
+        hours=1.0,
+        minutes=np.array([0, 60, 120]),
+        production=np.zeros(3),
+        consumption=np.zeros(3),
+        grid_feed_in=np.array([-2000.0, np.nan, 500.0]),
+    )
+    recorded = simulate(telemetry, UNIT, [Candidate(0)], 0.25, feed_in_price=0.1)["recorded"]
+    assert recorded == {"import_kwh": 2.0, "export_kwh": 0.5, "cost": pytest.approx(0.45)}
+
+
+def test_prices():
+    telemetry = _telemetry([0], [0])
+    with pytest.raises(ValueError):
+        simulate(telemetry, UNIT, [Candidate(0)], [0.1, 0.2])
+    with pytest.raises(ValueError):
+        simulate(_telemetry([], []), UNIT, [Candidate(0)], 0.1)
@@ -0,0 +1,56 @@
+"""Time-of-use schedules."""
+import pytest
+
+from custom_components.sonnenbatterie.tou import TouSchedule, TouWindow
+
+SCHEDULE = '[{"start": "22:00", "stop": "2:00", "threshold_p_max": 3000}, {"start": "10:00", "stop": "11:30", "threshold_p_max": 1000}]'
+
+
+def test_parse_normalizes_and_sorts():
+    schedule = TouSchedule.parse(SCHEDULE)
+    assert schedule.windows == (
+        TouWindow("10:00", "11:30", 1000),
+        TouWindow("22:00", "02:00", 3000),
+    )
+    assert TouSchedule.parse(schedule.compile()) == schedule
+    assert TouSchedule.parse(None) == TouSchedule.parse("") == TouSchedule()
+
+
+@pytest.mark.parametrize("text", ('{"start": "10:00"}', '[{"start": "10:00"}]', "[1]", "not json", '[{"start": "25:00", "stop": "01:00", "threshold_p_max": 1}]'))
+def test_parse_invalid(text):
+    with pytest.raises(ValueError):
+        TouSchedule.parse(text)
+
+
+def test_add_remove_modify():
+    schedule = TouSchedule.parse(SCHEDULE)
+    added = schedule.add(TouWindow.create("4:0", "5:00", 500))
+    assert [window.start for window in added.windows] == ["04:00", "10:00", "22:00"]
+
+    assert added.remove("04:00") == schedule
+    with pytest.raises(ValueError):
+        schedule.remove("04:00")
+
+    modified = schedule.modify("10:00", start="23:30", threshold_p_max=2000)
+    assert modified.windows == (
+        TouWindow("22:00", "02:00", 3000),
+        TouWindow("23:30", "11:30", 2000),
+    )
+    # the original is untouched
+    assert schedule.windows[0] == TouWindow("10:00", "11:30", 1000)
+
+
+def test_capped():
+    schedule = TouSchedule.parse(SCHEDULE)
+    assert schedule.capped(3000) is schedule
+    assert [window.threshold_p_max for window in schedule.capped(2000).windows] == [1000, 2000]
+
+
+def test_window_across_midnight_is_valid():
+    TouSchedule.parse(SCHEDULE).validate()
+
+
+def test_overlapping_windows_are_invalid():
+    schedule = TouSchedule.parse(SCHEDULE).add(TouWindow.create("11:00", "12:00", 1000))
+    with pytest.raises(ValueError):
+        schedule.validate()